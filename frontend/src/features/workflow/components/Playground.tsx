@@ -62,7 +62,7 @@ const PlaygroundModal: React.FC<PlaygroundModalProps> = ({
     try {
       console.log("Sending workflow execution request...");
 
-      const response = await axiosInstance.post(
+      let response = await axiosInstance.post(
         `/workflows/${workflowId}/execute`,
         { input: userMessage.content },
         {
@@ -70,6 +70,14 @@ const PlaygroundModal: React.FC<PlaygroundModalProps> = ({
         }
       );
 
+      // Long runs answer 202 with a jobId: keep waiting for the result
+      while (response.status === 202 && response.data?.jobId) {
+        response = await axiosInstance.get(
+          `/workflows/${workflowId}/jobs/${response.data.jobId}`,
+          { timeout: 60000 }
+        );
+      }
+
       console.log("Received response:", response.data);
 
       // Handle different response structures more robustly
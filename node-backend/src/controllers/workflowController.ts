@@ -3,6 +3,54 @@ import { WorkflowModel } from "../modals/Workflow";
 import axios from "axios";
 import { config } from "../config/env";
 
+// How long one request waits for a workflow job before answering 202 with
+// its jobId (kept under the frontend's 60s request timeout)
+const JOB_WAIT_MS = 50000;
+// Longest single long-poll on the agent API (its JOB_MAX_WAIT_SECONDS caps it too)
+const JOB_POLL_SECONDS = 25;
+
+// Waits for a job on the agent API until it finishes or waitMs has passed,
+// long-polling so no request is held longer than JOB_POLL_SECONDS
+async function waitForJob(id: string, jobId: string, waitMs: number) {
+  const deadline = Date.now() + waitMs;
+  let job: any;
+  do {
+    const wait = Math.max(0, Math.min(JOB_POLL_SECONDS, (deadline - Date.now()) / 1000));
+    const poll = await axios.get(
+      `${config.agenticBuilderApi}/workflows/${id}/jobs/${jobId}`,
+      { params: { wait }, timeout: (wait + 10) * 1000 }
+    );
+    job = poll.data;
+  } while (["queued", "running"].includes(job.status) && Date.now() < deadline);
+  return job;
+}
+
+// Sends a job's state the same way a direct execution is answered: the
+// result when it succeeded, a 202 with the jobId while it is still going
+function sendJob(res: Response, job: any): void {
+  if (job.status === "succeeded") {
+    res.status(200).json({
+      success: true,
+      data: job.result?.response ?? job.result,
+      message: "Workflow executed successfully",
+    });
+  } else if (job.status === "queued" || job.status === "running") {
+    res.status(202).json({
+      success: true,
+      jobId: job.job_id,
+      status: job.status,
+      message: "Workflow is still running",
+    });
+  } else {
+    res.status(500).json({
+      success: false,
+      message: "Error executing workflow",
+      error: job.error || `Job ${job.status}`,
+      jobId: job.job_id,
+    });
+  }
+}
+
 export class WorkflowController {
   // Create a new workflow
   public static async createWorkflow(
@@ -197,34 +245,22 @@ export class WorkflowController {
 
       console.log(`Executing workflow ${id} with input:`, input);
 
-      // Add timeout to axios request (60 seconds)
-      const generate = await axios.post(
-        `${config.agenticBuilderApi}/workflows/${id}/execute`,
+      // Run it as a background job: a long run keeps going (and keeps its
+      // result) even when this request gives up waiting
+      const submitted = await axios.post(
+        `${config.agenticBuilderApi}/workflows/${id}/jobs`,
         {
           message: input,
         },
         {
-          timeout: 60000, // 60 seconds timeout
+          timeout: 10000,
         }
       );
+      const job = await waitForJob(id, submitted.data.job_id, JOB_WAIT_MS);
 
-      console.log("Workflow execution response:", generate.data);
+      console.log("Workflow execution job:", job.job_id, job.status);
 
-      // Handle different response structures
-      let responseData;
-      if (generate.data?.response) {
-        responseData = generate.data.response;
-      } else if (generate.data?.data) {
-        responseData = generate.data.data;
-      } else {
-        responseData = generate.data;
-      }
-
-      res.status(200).json({
-        success: true,
-        data: responseData,
-        message: "Workflow executed successfully",
-      });
+      sendJob(res, job);
     } catch (error: any) {
       console.error("Workflow execution error:", error);
 
@@ -248,4 +284,30 @@ export class WorkflowController {
       }
     }
   }
+
+  // Get the state (or result) of a workflow execution that answered 202
+  public static async getWorkflowJob(
+    req: Request,
+    res: Response
+  ): Promise<void> {
+    try {
+      const { id, jobId } = req.params;
+      const job = await waitForJob(id, jobId, JOB_WAIT_MS);
+      sendJob(res, job);
+    } catch (error: any) {
+      if (axios.isAxiosError(error)) {
+        res.status(error.response?.status || 500).json({
+          success: false,
+          message: "Error fetching workflow job",
+          error: error.response?.data?.detail || error.message,
+        });
+      } else {
+        res.status(500).json({
+          success: false,
+          message: "Error fetching workflow job",
+          error: error instanceof Error ? error.message : "Unknown error",
+        });
+      }
+    }
+  }
 }
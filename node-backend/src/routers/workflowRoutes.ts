@@ -21,4 +21,7 @@ router.delete("/workflows/:id", WorkflowController.deleteWorkflow);
 //Excecute
 router.post("/workflows/:id/execute", WorkflowController.executeWorkflow);
 
+// Result of an execution still running when /execute answered (202 + jobId)
+router.get("/workflows/:id/jobs/:jobId", WorkflowController.getWorkflowJob);
+
 export default router;
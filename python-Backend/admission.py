@@ -0,0 +1,226 @@
+import asyncio
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+# Runs executing at once, over all flows and per flow (0 = no limit)
+MAX_CONCURRENT_RUNS = int(os.environ.get("MAX_CONCURRENT_RUNS", "0"))
+MAX_CONCURRENT_RUNS_PER_FLOW = int(os.environ.get("MAX_CONCURRENT_RUNS_PER_FLOW", "0"))
+# Per-flow overrides of MAX_CONCURRENT_RUNS_PER_FLOW, as JSON: {"flow_id": 2}
+FLOW_CONCURRENCY_LIMITS = os.environ.get("FLOW_CONCURRENCY_LIMITS", "")
+# Runs that may wait for a slot, and for how long, before getting a 429
+ADMISSION_QUEUE_SIZE = int(os.environ.get("ADMISSION_QUEUE_SIZE", "100"))
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get("ADMISSION_QUEUE_TIMEOUT", "10"))
+
+
+class AdmissionRejected(Exception):
+    """A run was turned away: the wait queue is full or its wait timed out."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_flow_limits(value: str) -> Dict[str, int]:
+    if not value:
+        return {}
+    try:
+        limits = json.loads(value)
+        return {str(flow_id): int(limit) for flow_id, limit in limits.items()}
+    except (ValueError, TypeError, AttributeError):
+        print(f"⚠️  Warning: Ignoring FLOW_CONCURRENCY_LIMITS={value!r}: expected a JSON object of flow_id -> limit.")
+        return {}
+
+
+class _Waiter:
+    __slots__ = ("flow_id", "event", "loop", "future", "granted")
+
+    def __init__(self, flow_id: str, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.flow_id = flow_id
+        self.loop = loop
+        self.event = None if loop else threading.Event()
+        self.future = loop.create_future() if loop else None
+        self.granted = False
+
+    def wake(self) -> None:
+        if self.event is not None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(lambda: self.future.done() or self.future.set_result(None))
+
+
+class AdmissionController:
+    """
+    Admits agent runs under a global and a per-flow concurrency limit.
+
+    A run that finds no free slot waits in one FIFO queue shared by sync
+    endpoints (threads) and async ones (event loops); a freed slot is handed
+    to the oldest waiter that may use it, so a busy flow cannot starve the
+    others. When the queue is full, or a wait exceeds the queue timeout,
+    the run is rejected at once with a Retry-After estimate instead of
+    adding to everyone's latency.
+    """
+
+    def __init__(self, max_runs: int = MAX_CONCURRENT_RUNS, max_runs_per_flow: int = MAX_CONCURRENT_RUNS_PER_FLOW,
+                 flow_limits: Optional[Dict[str, int]] = None, max_queued: int = ADMISSION_QUEUE_SIZE,
+                 queue_timeout: float = ADMISSION_QUEUE_TIMEOUT):
+        self.max_runs = max_runs
+        self.max_runs_per_flow = max_runs_per_flow
+        self.flow_limits = parse_flow_limits(FLOW_CONCURRENCY_LIMITS) if flow_limits is None else flow_limits
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self._lock = threading.Lock()
+        self._queue: deque = deque()
+        self._running = 0
+        self._running_per_flow: Dict[str, int] = {}
+        self._admitted = 0
+        self._queued = 0
+        self._rejected = 0
+        # Moving average of run durations, for Retry-After
+        self._avg_run_seconds = 1.0
+
+    def flow_limit(self, flow_id: str) -> int:
+        """The flow's concurrency limit (0 = none)."""
+        return self.flow_limits.get(flow_id, self.max_runs_per_flow)
+
+    # --- Slots (called with the lock held) ---
+
+    def _has_slot(self, flow_id: str) -> bool:
+        flow_limit = self.flow_limit(flow_id)
+        return ((not self.max_runs or self._running < self.max_runs)
+                and (not flow_limit or self._running_per_flow.get(flow_id, 0) < flow_limit))
+
+    def _take(self, flow_id: str) -> None:
+        self._running += 1
+        self._running_per_flow[flow_id] = self._running_per_flow.get(flow_id, 0) + 1
+        self._admitted += 1
+
+    def _grant_waiters(self) -> None:
+        for waiter in list(self._queue):
+            if self._has_slot(waiter.flow_id):
+                self._queue.remove(waiter)
+                self._take(waiter.flow_id)
+                waiter.granted = True
+                waiter.wake()
+
+    def _retry_after(self) -> int:
+        # Roughly when the runs ahead will have drained through the slots
+        capacity = self.max_runs or self.max_runs_per_flow or 1
+        return max(1, math.ceil(self._avg_run_seconds * (len(self._queue) + 1) / capacity))
+
+    def _reject(self, message: str) -> AdmissionRejected:
+        self._rejected += 1
+        return AdmissionRejected(message, self._retry_after())
+
+    def _enqueue(self, flow_id: str, bounded: bool, loop=None) -> Optional[_Waiter]:
+        """Takes a slot right away (None), or queues a waiter; raises when the queue is full."""
+        waiter = _Waiter(flow_id, loop)
+        self._queue.append(waiter)
+        # Granted now unless an older waiter of the same flow (or the global limit) is in the way
+        self._grant_waiters()
+        if waiter.granted:
+            return None
+        if bounded and len(self._queue) > self.max_queued:
+            self._queue.remove(waiter)
+            raise self._reject(f"Too many runs waiting ({self.max_queued}); try again later.")
+        self._queued += 1
+        return waiter
+
+    def _release(self, flow_id: str, started: float) -> None:
+        with self._lock:
+            self._running -= 1
+            remaining = self._running_per_flow[flow_id] - 1
+            if remaining:
+                self._running_per_flow[flow_id] = remaining
+            else:
+                del self._running_per_flow[flow_id]
+            self._avg_run_seconds = 0.9 * self._avg_run_seconds + 0.1 * (time.monotonic() - started)
+            self._grant_waiters()
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        """A waiter gave up (timeout, cancellation). Returns True if it had been granted a slot meanwhile."""
+        with self._lock:
+            if waiter.granted:
+                return True
+            self._queue.remove(waiter)
+            # Waiters behind it may be able to run now (e.g. another flow)
+            self._grant_waiters()
+            return False
+
+    # --- Admission ---
+
+    def acquire(self, flow_id: str, bounded: bool = True) -> "AdmissionSlot":
+        """
+        Takes a run slot for flow_id, blocking the calling thread while
+        queued. Raises AdmissionRejected when the run cannot be admitted.
+        'bounded=False' waits as long as it takes, outside the queue limit.
+        """
+        with self._lock:
+            waiter = self._enqueue(flow_id, bounded)
+        if waiter is not None:
+            granted = waiter.event.wait(self.queue_timeout if bounded else None)
+            if not granted and not self._abandon(waiter):
+                with self._lock:
+                    raise self._reject(f"No run slot for flow {flow_id} within {self.queue_timeout:g}s.")
+        return AdmissionSlot(self, flow_id)
+
+    async def aacquire(self, flow_id: str, bounded: bool = True) -> "AdmissionSlot":
+        """Async version of acquire: waits for a slot without blocking the event loop."""
+        with self._lock:
+            waiter = self._enqueue(flow_id, bounded, asyncio.get_running_loop())
+        if waiter is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter.future), self.queue_timeout if bounded else None)
+            except asyncio.TimeoutError:
+                if not self._abandon(waiter):
+                    with self._lock:
+                        raise self._reject(f"No run slot for flow {flow_id} within {self.queue_timeout:g}s.")
+            except asyncio.CancelledError:
+                # The caller went away while queued: give back a slot it may have just been granted
+                if self._abandon(waiter):
+                    self._release(flow_id, time.monotonic())
+                raise
+        return AdmissionSlot(self, flow_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_runs": self.max_runs,
+                "max_runs_per_flow": self.max_runs_per_flow,
+                "max_queued": self.max_queued,
+                "running": self._running,
+                "running_per_flow": dict(self._running_per_flow),
+                "waiting": len(self._queue),
+                "admitted": self._admitted,
+                "queued": self._queued,
+                "rejected": self._rejected,
+                "avg_run_seconds": round(self._avg_run_seconds, 3),
+            }
+
+
+class AdmissionSlot:
+    """
+    One admitted run. Use it as a context manager, or call release() when
+    the run is over (releasing twice is harmless).
+    """
+
+    def __init__(self, controller: AdmissionController, flow_id: str):
+        self._controller = controller
+        self.flow_id = flow_id
+        self._started = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        released, self._released = self._released, True
+        if not released:
+            self._controller._release(self.flow_id, self._started)
+
+    def __enter__(self) -> "AdmissionSlot":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
@@ -0,0 +1,35 @@
+from typing import Any, Dict, List, Sequence
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+
+def branch_input(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The input of one agent branch: the conversation so far (the user's
+    messages and the answers of the agents it depends on). Each branch runs
+    its tool loop on its own copy, so parallel branches never see each
+    other's tool calls.
+    """
+    return {"messages": list(state["messages"])}
+
+
+def branch_output(agent_id: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    """Only the branch's final answer goes back to the shared state, tagged with the agent."""
+    final = result["messages"][-1]
+    return {"messages": [AIMessage(content=final.content, name=agent_id)]}
+
+
+def merge_branches(state: Dict[str, Any], agent_ids: Sequence[str]) -> Dict[str, Any]:
+    """
+    Joins parallel branches that have no agent after them: one final answer
+    made of each agent's answer from this turn, in graph order.
+    """
+    answers: Dict[str, str] = {}
+    for message in reversed(state["messages"]):
+        if isinstance(message, HumanMessage):
+            break
+        name = getattr(message, "name", None)
+        if name in agent_ids and name not in answers:
+            answers[name] = message.content
+    parts: List[str] = [f"[{agent_id}]\n{answers[agent_id]}" for agent_id in agent_ids if agent_id in answers]
+    return {"messages": [AIMessage(content="\n\n".join(parts), name="merge_branches")]}
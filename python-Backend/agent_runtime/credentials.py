@@ -0,0 +1,61 @@
+import os
+from typing import Dict, Iterator, Mapping, Optional
+
+from dotenv import dotenv_values
+
+# Set to 0 to stop flows from falling back to the server's own environment
+# (e.g. so one tenant's flow can never pick up the operator's keys)
+CREDENTIALS_FROM_ENVIRON = os.environ.get("CREDENTIALS_FROM_ENVIRON", "1").lower() not in ("0", "false", "no")
+
+
+class CredentialContext(Mapping[str, str]):
+    """
+    Read-only secrets of one flow, passed to its chat model and tools.
+
+    Lookups go through, in order: the keys from the workflow JSON, the
+    agent's own .env file and (unless CREDENTIALS_FROM_ENVIRON=0) the
+    process environment. Nothing is ever written to os.environ, so flows
+    with different keys can run side by side in one process.
+    """
+
+    def __init__(self, values: Optional[Mapping[str, Optional[str]]] = None,
+                 env_file: Optional[str] = None,
+                 from_environ: Optional[bool] = None):
+        self._values: Dict[str, str] = {}
+        if env_file and os.path.isfile(env_file):
+            self._values.update({k: v for k, v in dotenv_values(env_file).items() if v is not None})
+        # Keys set on the workflow's nodes win over the .env file
+        self._values.update({k: v for k, v in (values or {}).items() if v})
+        self._from_environ = CREDENTIALS_FROM_ENVIRON if from_environ is None else from_environ
+
+    def get(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        value = self._values.get(name)
+        if value is None and self._from_environ:
+            value = os.environ.get(name)
+        return default if value is None else value
+
+    def __getitem__(self, name: str) -> str:
+        value = self.get(name)
+        if value is None:
+            raise KeyError(name)
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._values)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __repr__(self) -> str:
+        # Never print secret values
+        return f"CredentialContext(keys={sorted(self._values)})"
+
+
+def agent_env_file(agent_file: str) -> Optional[str]:
+    """
+    Returns the .env next to an exported agent.py, or None for agents
+    compiled in memory (whose __file__ is a placeholder like '<agent_x>').
+    """
+    if not os.path.isfile(agent_file):
+        return None
+    return os.path.join(os.path.dirname(os.path.abspath(agent_file)), ".env")
@@ -0,0 +1,105 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Optional
+
+# Monotonic time by which the current run must finish (None: no deadline).
+# LangGraph copies the context into every node, tool call and worker thread.
+_deadline: ContextVar[Optional[float]] = ContextVar("agent_run_deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """The run's time budget is spent; raised instead of starting more LLM or tool calls."""
+
+
+@contextmanager
+def run_deadline(seconds: Optional[float]):
+    """
+    Gives everything run inside the block (graph, LLM and tool calls) at most
+    'seconds' to finish. Nested deadlines can only shorten the outer one.
+    """
+    if seconds is None:
+        yield
+        return
+    deadline = time.monotonic() + seconds
+    outer = _deadline.get()
+    token = _deadline.set(deadline if outer is None else min(outer, deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current run's budget, or None without a deadline."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def check_deadline() -> None:
+    """Raises DeadlineExceeded if the current run is out of time."""
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded("The run exceeded its deadline.")
+
+
+def tool_timeout(timeout: float) -> float:
+    """A tool's own timeout, shrunk to what is left of the run's budget."""
+    check_deadline()
+    left = remaining()
+    return timeout if left is None else min(timeout, left)
+
+
+async def with_deadline(awaitable: Awaitable[Any]) -> Any:
+    """Awaits an LLM call or a whole run, cancelling it when the budget runs out."""
+    check_deadline()
+    left = remaining()
+    if left is None:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, left)
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded("The run exceeded its deadline.") from None
+
+
+def start_call(func: Callable[[], Any], name: str = "tool-timeout") -> Future:
+    """
+    Runs a blocking call on a daemon thread of its own. Unlike a shared pool,
+    calls given up on keep running in the background without queueing the
+    next ones, and a caller's timeout starts when the call does.
+    """
+    future = Future()
+
+    def call():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(func())
+        except BaseException as exc:
+            future.set_exception(exc)
+
+    threading.Thread(target=call, name=name, daemon=True).start()
+    return future
+
+
+def run_with_timeout(func: Callable[[], Any], timeout: float) -> Any:
+    """
+    Calls a blocking function that has no timeout of its own, giving up
+    after 'timeout' seconds (raising TimeoutError). The call itself cannot
+    be interrupted: it finishes in the background and its result is dropped.
+    """
+    try:
+        return start_call(func).result(timeout=timeout)
+    except FutureTimeoutError:
+        raise TimeoutError(f"Timed out after {timeout:g}s.") from None
+
+
+async def arun_with_timeout(func: Callable[[], Any], timeout: float) -> Any:
+    """Async version of run_with_timeout: waits for the call without blocking the event loop."""
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(start_call(func)), timeout)
+    except asyncio.TimeoutError:
+        raise TimeoutError(f"Timed out after {timeout:g}s.") from None
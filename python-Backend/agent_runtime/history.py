@@ -0,0 +1,43 @@
+import os
+from typing import List, Optional, Sequence
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langchain_core.messages.utils import count_tokens_approximately
+
+# Defaults for agents whose node sets no 'history' policy (0 = no limit).
+# Tokens are estimated (about 4 characters per token), not counted exactly.
+HISTORY_MAX_MESSAGES = int(os.environ.get("HISTORY_MAX_MESSAGES", "0"))
+HISTORY_MAX_TOKENS = int(os.environ.get("HISTORY_MAX_TOKENS", "16000"))
+
+
+def trim_history(messages: Sequence[BaseMessage], max_messages: Optional[int] = None,
+                 max_tokens: Optional[int] = None) -> List[BaseMessage]:
+    """
+    The most recent messages of a conversation that fit the budget, for the
+    agent's prompt. The window always starts at a user message, so a tool
+    call is never separated from its result, and the current turn is kept
+    even if it alone is over budget. Leading system messages are always
+    kept (they count against 'max_tokens', not 'max_messages'). The stored
+    thread is not modified.
+    """
+    max_messages = HISTORY_MAX_MESSAGES if max_messages is None else max_messages
+    max_tokens = HISTORY_MAX_TOKENS if max_tokens is None else max_tokens
+    if not max_messages and not max_tokens:
+        return list(messages)
+
+    head = 0
+    while head < len(messages) and isinstance(messages[head], SystemMessage):
+        head += 1
+    system, messages = list(messages[:head]), messages[head:]
+
+    start = None
+    tokens = count_tokens_approximately(system) if system else 0
+    for i in range(len(messages) - 1, -1, -1):
+        tokens += count_tokens_approximately([messages[i]])
+        count = len(messages) - i
+        over_budget = (max_messages and count > max_messages) or (max_tokens and tokens > max_tokens)
+        if over_budget and start is not None:
+            break
+        if isinstance(messages[i], HumanMessage):
+            start = i
+    return system + list(messages[start or 0:])
@@ -0,0 +1,99 @@
+import asyncio
+import os
+import threading
+import weakref
+from typing import Dict, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+# --- Pool configuration (per host) ---
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.environ.get("HTTP_MAX_CONNECTIONS_PER_HOST", "20"))
+HTTP_MAX_KEEPALIVE_PER_HOST = int(os.environ.get("HTTP_MAX_KEEPALIVE_PER_HOST", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.environ.get("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP2_ENABLED = os.environ.get("HTTP2_ENABLED", "0").lower() in ("1", "true", "yes")
+
+if HTTP2_ENABLED:
+    try:
+        import h2  # noqa: F401 - httpx needs it for http2=True
+    except ImportError:
+        print("⚠️  Warning: HTTP2_ENABLED is set but the 'h2' package is not installed. Using HTTP/1.1.")
+        HTTP2_ENABLED = False
+
+_lock = threading.Lock()
+_sync_clients: Dict[Tuple[str, str, int], httpx.Client] = {}
+# Async clients are bound to the event loop that created them
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[str, str, int], httpx.AsyncClient]]" = weakref.WeakKeyDictionary()
+
+
+def _host_key(url: str) -> Tuple[str, str, int]:
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower() or "http"
+    port = parts.port or (443 if scheme == "https" else 80)
+    return scheme, (parts.hostname or "").lower(), port
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS_PER_HOST,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE_PER_HOST,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+def get_client(url: str) -> httpx.Client:
+    """
+    Returns the process-wide sync client for the URL's host.
+    Connections (and TLS sessions) are kept alive and reused across tool
+    calls and across flows. Pass the timeout per request.
+    """
+    key = _host_key(url)
+    client = _sync_clients.get(key)
+    if client is None:
+        with _lock:
+            client = _sync_clients.get(key)
+            if client is None:
+                client = httpx.Client(limits=_limits(), http2=HTTP2_ENABLED)
+                _sync_clients[key] = client
+    return client
+
+
+def get_async_client(url: str) -> httpx.AsyncClient:
+    """
+    Returns the shared async client for the URL's host on the running event loop.
+    """
+    loop = asyncio.get_running_loop()
+    key = _host_key(url)
+    with _lock:
+        clients = _async_clients.setdefault(loop, {})
+        client = clients.get(key)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(limits=_limits(), http2=HTTP2_ENABLED)
+            clients[key] = client
+    return client
+
+
+def close_clients() -> None:
+    """Closes every pooled sync client."""
+    with _lock:
+        clients = list(_sync_clients.values())
+        _sync_clients.clear()
+    for client in clients:
+        client.close()
+
+
+async def aclose_clients() -> None:
+    """Closes the pooled async clients of the running event loop."""
+    with _lock:
+        clients = list(_async_clients.pop(asyncio.get_running_loop(), {}).values())
+    for client in clients:
+        await client.aclose()
+
+
+def pool_stats() -> Dict[str, int]:
+    """Number of pooled clients (one per host, per event loop for async)."""
+    with _lock:
+        return {
+            "sync_clients": len(_sync_clients),
+            "async_clients": sum(len(clients) for clients in _async_clients.values()),
+        }
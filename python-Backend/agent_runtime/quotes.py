@@ -0,0 +1,95 @@
+import asyncio
+import os
+from concurrent.futures import Future, wait
+from typing import Any, Dict, List
+
+import yfinance as yf
+
+from agent_runtime.deadlines import start_call
+from agent_runtime.tool_cache import MISSING, MemoryStore
+
+# Quotes are reused for this many seconds across tool calls, agents and flows (0 = off)
+QUOTE_CACHE_TTL = float(os.environ.get("QUOTE_CACHE_TTL", "0"))
+QUOTE_CACHE_MAX_ENTRIES = int(os.environ.get("QUOTE_CACHE_MAX_ENTRIES", "1024"))
+# The most symbols one batched stock tool call fetches (each on a thread of its own)
+MAX_BATCH_SYMBOLS = int(os.environ.get("MAX_BATCH_SYMBOLS", "25"))
+
+# The fields kept per symbol: enough to compare stocks, small enough for a prompt
+QUOTE_FIELDS = (
+    "longName", "currency", "regularMarketPrice", "regularMarketOpen", "regularMarketDayHigh",
+    "regularMarketDayLow", "regularMarketPreviousClose", "marketCap", "forwardPE", "dividendYield",
+)
+
+_cache = MemoryStore(QUOTE_CACHE_MAX_ENTRIES)
+
+
+def normalize_symbols(symbols: List[str]) -> List[str]:
+    """Upper-cased, de-duplicated symbols in the order given."""
+    seen = []
+    for symbol in symbols:
+        symbol = str(symbol).strip().upper()
+        if symbol and symbol not in seen:
+            seen.append(symbol)
+    return seen
+
+
+def _fetch(symbol: str) -> Dict[str, Any]:
+    # yfinance only has a blocking, one-symbol-at-a-time API for quote fields
+    info = yf.Ticker(symbol).info
+    if not info or info.get("regularMarketPrice") is None:
+        return {"error": f"Could not find valid data for ticker symbol: {symbol}"}
+    # Missing fields are left out rather than sent as nulls
+    quote = {field: info[field] for field in QUOTE_FIELDS if info.get(field) is not None}
+    if QUOTE_CACHE_TTL > 0:
+        _cache.set(symbol, quote, QUOTE_CACHE_TTL)
+    return quote
+
+
+def _start(symbols: List[str]):
+    """
+    Cached quotes, and a running fetch for each symbol that has none. Symbols
+    past MAX_BATCH_SYMBOLS get an error entry, so the agent can ask for them again.
+    """
+    quotes, futures = {}, {}
+    for symbol in symbols[MAX_BATCH_SYMBOLS:]:
+        quotes[symbol] = {"error": f"Not fetched: at most {MAX_BATCH_SYMBOLS} symbols per call. Ask for {symbol} in another call."}
+    for symbol in symbols[:MAX_BATCH_SYMBOLS]:
+        cached = _cache.get(symbol) if QUOTE_CACHE_TTL > 0 else MISSING
+        if cached is MISSING:
+            # A thread per symbol: fetches hung in earlier calls cannot delay this one
+            futures[symbol] = start_call(lambda symbol=symbol: _fetch(symbol), name="quotes")
+        else:
+            quotes[symbol] = cached
+    return quotes, futures
+
+
+def _collect(symbols: List[str], quotes: Dict[str, Any], futures: Dict[str, Future], timeout: float) -> Dict[str, Any]:
+    for symbol, future in futures.items():
+        if not future.done():
+            # Still running: it finishes in the background (and fills the cache)
+            quotes[symbol] = {"error": f"Timed out fetching data for {symbol} ({timeout:g}s)."}
+        elif future.exception() is not None:
+            quotes[symbol] = {"error": f"An error occurred while fetching data for {symbol}: {future.exception()}"}
+        else:
+            quotes[symbol] = future.result()
+    return {symbol: quotes[symbol] for symbol in symbols}
+
+
+def fetch_quotes(symbols: List[str], timeout: float) -> Dict[str, Any]:
+    """
+    Quotes for several symbols, fetched concurrently: one table of
+    QUOTE_FIELDS (or an 'error') per symbol, in the order given. Symbols
+    not fetched within 'timeout' seconds, or past MAX_BATCH_SYMBOLS, get an error.
+    """
+    quotes, futures = _start(symbols)
+    if futures:
+        wait(futures.values(), timeout=timeout)
+    return _collect(symbols, quotes, futures, timeout)
+
+
+async def afetch_quotes(symbols: List[str], timeout: float) -> Dict[str, Any]:
+    """Async version of fetch_quotes: waits for the fetch threads without blocking the event loop."""
+    quotes, futures = _start(symbols)
+    if futures:
+        await asyncio.wait([asyncio.wrap_future(future) for future in futures.values()], timeout=timeout)
+    return _collect(symbols, quotes, futures, timeout)
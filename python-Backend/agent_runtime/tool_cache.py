@@ -0,0 +1,216 @@
+import functools
+import hashlib
+import inspect
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# HTTP methods whose results are safe to reuse. Anything else (POST, PUT,
+# DELETE, ...) bypasses the cache unless the node opts in.
+CACHEABLE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+TOOL_CACHE_PATH = os.environ.get("TOOL_CACHE_PATH", "tool_cache.sqlite3")
+
+# Returned by a store's get() when the key is absent or expired (None is a valid value)
+MISSING = object()
+
+
+class MemoryStore:
+    """LRU store with per-entry expiry, kept in process memory."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return MISSING
+            expires, value = item
+            if expires < time.time():
+                del self._data[key]
+                return MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        with self._lock:
+            self._data[key] = (time.time() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self, prefix: str = "") -> None:
+        """Removes every entry whose key starts with 'prefix' (all of them by default)."""
+        with self._lock:
+            for key in [key for key in self._data if key.startswith(prefix)]:
+                del self._data[key]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+
+class SQLiteStore:
+    """Store backed by a local SQLite file, so results survive restarts."""
+
+    def __init__(self, max_entries: int, path: str = TOOL_CACHE_PATH, table: str = "tool_cache"):
+        self.max_entries = max_entries
+        self.path = path
+        self.table = table
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL, stored REAL NOT NULL)"
+            )
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, expires FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[1] < time.time():
+            return MISSING
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        try:
+            payload = json.dumps(value)
+        except (TypeError, ValueError):
+            return  # Not JSON-serialisable: just don't cache it
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires, stored) VALUES (?, ?, ?, ?)",
+                (key, payload, now + ttl, now),
+            )
+            self._conn.execute(f"DELETE FROM {self.table} WHERE expires < ?", (now,))
+            self._conn.execute(
+                f"DELETE FROM {self.table} WHERE key NOT IN "
+                f"(SELECT key FROM {self.table} ORDER BY stored DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+
+    def clear(self, prefix: str = "") -> None:
+        """Removes every entry whose key starts with 'prefix' (all of them by default)."""
+        with self._lock, self._conn:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+
+_stores: Dict[Tuple[str, str], Any] = {}
+_stats: Dict[str, Dict[str, int]] = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(backend: str, tool_name: str, max_entries: int):
+    """
+    Returns the process-wide store for a tool. Stores are shared by every
+    flow, so the same call made by different users hits the same entry.
+    """
+    if backend not in ("memory", "sqlite"):
+        raise ValueError(f"Unsupported tool cache backend: '{backend}'. Supported: memory, sqlite")
+    # All tools share one SQLite file; memory stores are per tool
+    key = (backend, "" if backend == "sqlite" else tool_name)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = SQLiteStore(max_entries) if backend == "sqlite" else MemoryStore(max_entries)
+            _stores[key] = store
+        else:
+            store.max_entries = max(store.max_entries, max_entries)
+        return store
+
+
+def _record(tool_name: str, outcome: str) -> None:
+    with _stores_lock:
+        counters = _stats.setdefault(tool_name, {"hits": 0, "misses": 0, "bypassed": 0})
+        counters[outcome] += 1
+
+
+def cache_stats() -> Dict[str, Any]:
+    """Hit/miss/bypass counters per tool, and the size of each store."""
+    with _stores_lock:
+        return {
+            "tools": {name: dict(counters) for name, counters in _stats.items()},
+            "stores": {f"{backend}:{name}" if name else backend: len(store)
+                       for (backend, name), store in _stores.items()},
+        }
+
+
+def cached_tool(tool_name: str, ttl: float = 300, max_entries: int = 1024,
+                backend: str = "memory", scope: str = "",
+                cache_unsafe_methods: bool = False) -> Callable:
+    """
+    Decorator adding a TTL result cache to a tool (sync or async).
+
+    The key is the tool name, a 'scope' (set by the generator to tell apart
+    same-named tools with different code, e.g. two API wrappers) and the
+    normalised call arguments. Error results are never cached, and calls
+    with a non-idempotent 'method' argument bypass the cache.
+    """
+    store = get_store(backend, tool_name, max_entries)
+
+    def decorator(func: Callable) -> Callable:
+        signature = inspect.signature(func)
+
+        def make_key(args, kwargs) -> Optional[str]:
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            method = bound.arguments.get("method")
+            if isinstance(method, str) and method.upper() not in CACHEABLE_METHODS and not cache_unsafe_methods:
+                return None
+            normalized = json.dumps(bound.arguments, sort_keys=True, default=str)
+            return hashlib.sha256(f"{tool_name}\0{scope}\0{normalized}".encode()).hexdigest()
+
+        def cacheable(result: Any) -> bool:
+            return not (isinstance(result, dict) and "error" in result)
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                key = make_key(args, kwargs)
+                if key is None:
+                    _record(tool_name, "bypassed")
+                    return await func(*args, **kwargs)
+                value = store.get(key)
+                if value is not MISSING:
+                    _record(tool_name, "hits")
+                    return value
+                _record(tool_name, "misses")
+                result = await func(*args, **kwargs)
+                if cacheable(result):
+                    store.set(key, result, ttl)
+                return result
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = make_key(args, kwargs)
+            if key is None:
+                _record(tool_name, "bypassed")
+                return func(*args, **kwargs)
+            value = store.get(key)
+            if value is not MISSING:
+                _record(tool_name, "hits")
+                return value
+            _record(tool_name, "misses")
+            result = func(*args, **kwargs)
+            if cacheable(result):
+                store.set(key, result, ttl)
+            return result
+        return wrapper
+
+    return decorator
@@ -0,0 +1,134 @@
+import asyncio
+import functools
+import inspect
+import threading
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# The running turn's cap on its parallel tool calls, set by limit_turn's node
+_turn_semaphore: ContextVar[Optional[asyncio.Semaphore]] = ContextVar("tool_turn_semaphore", default=None)
+
+
+class ConcurrencyLimit:
+    """
+    Caps how many calls run at once. Works for tools running in threads
+    (sync ToolNode) and on any event loop (async ToolNode).
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._thread_semaphore = threading.BoundedSemaphore(limit)
+        # asyncio semaphores are bound to the loop they are first used on
+        self._loop_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def hold(self):
+        with self._thread_semaphore:
+            yield
+
+    @asynccontextmanager
+    async def ahold(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphore = self._loop_semaphores.get(loop)
+            if semaphore is None:
+                semaphore = asyncio.Semaphore(self.limit)
+                self._loop_semaphores[loop] = semaphore
+        async with semaphore:
+            yield
+
+
+class TurnLimit:
+    """
+    A slot of the current turn's cap (see limit_turn). Each turn has its
+    own cap, so one conversation's tool calls never throttle another's.
+    Sync tools need no slot: the sync ToolNode's executor is already capped.
+    """
+
+    @contextmanager
+    def hold(self):
+        yield
+
+    @asynccontextmanager
+    async def ahold(self):
+        semaphore = _turn_semaphore.get()
+        if semaphore is None:
+            yield
+            return
+        async with semaphore:
+            yield
+
+
+turn_limit = TurnLimit()
+
+
+def limit_turn(tool_node: Any, limit: int) -> Callable:
+    """
+    Wraps an async agent's ToolNode, which starts all of a turn's tool
+    calls at once, so at most 'limit' of them run at a time. Tools wrapped
+    with turn_limit take their slot from the turn being run.
+    """
+    async def tools(state, config):
+        token = _turn_semaphore.set(asyncio.Semaphore(limit))
+        try:
+            return await tool_node.ainvoke(state, config)
+        finally:
+            _turn_semaphore.reset(token)
+    return tools
+
+
+_tool_limits: Dict[Tuple[str, int], ConcurrencyLimit] = {}
+_tool_limits_lock = threading.Lock()
+
+
+def tool_limit(tool_name: str, limit: Optional[int]) -> Optional[ConcurrencyLimit]:
+    """
+    Returns the process-wide limit for a tool, shared by every flow that
+    uses it (e.g. to stay under one provider's rate limit).
+    """
+    if not limit:
+        return None
+    key = (tool_name, int(limit))
+    with _tool_limits_lock:
+        if key not in _tool_limits:
+            _tool_limits[key] = ConcurrencyLimit(int(limit))
+        return _tool_limits[key]
+
+
+def limit_concurrency(func: Callable, *limits: Optional[ConcurrencyLimit]) -> Callable:
+    """
+    Wraps a tool (sync or async) so each call holds a slot in every given
+    limit, taken in the order given. 'None' limits are ignored; with no
+    limits the tool is returned as is.
+    """
+    limits = tuple(limit for limit in limits if limit is not None)
+    if not limits:
+        return func
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            return await _acall(func, limits, args, kwargs)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return _call(func, limits, args, kwargs)
+    return wrapper
+
+
+def _call(func, limits, args, kwargs):
+    if not limits:
+        return func(*args, **kwargs)
+    with limits[0].hold():
+        return _call(func, limits[1:], args, kwargs)
+
+
+async def _acall(func, limits, args, kwargs):
+    if not limits:
+        return await func(*args, **kwargs)
+    async with limits[0].ahold():
+        return await _acall(func, limits[1:], args, kwargs)
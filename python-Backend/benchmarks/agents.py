@@ -0,0 +1,188 @@
+"""
+End-to-end benchmark of the generator and runtime, fully offline: agents use
+the "Fake" chat model provider and their tools call a local stand-in server.
+For synthetic workflows of increasing size (number of tool nodes) it reports
+p50/p99/mean latency and throughput of:
+
+  generate       POST /generate with new content every time (render + import)
+  cold_load      evict the flow, then load it back from its exported agent.py
+  warm_execute   POST /workflows/{id}/execute/async on a cached graph
+  batch_execute  POST /workflows/{id}/execute/batch (per batch; throughput per item)
+
+    python -m benchmarks.agents --sizes 1 4 16 --iterations 50 --output bench.json
+    python -m benchmarks.agents --baseline bench.json   # adds ratios vs an earlier run
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Dict
+
+from benchmarks.common import start_stub_server, summarize
+
+
+def synthetic_workflow(flow_id: str, tools: int, stub_url: str, latency_ms: float,
+                       tavily: bool = True, salt: str = "") -> Dict[str, Any]:
+    """
+    One Fake agent wired to 'tools' api_request tools (plus Tavily), in the
+    same shape the frontend sends. The agent calls every tool once, in
+    parallel, then answers. 'salt' changes the content hash without
+    changing the work done.
+    """
+    nodes = [{
+        "id": "agent-1", "type": "agent",
+        "data": {"provider": "Fake", "model": "fake", "latency_ms": latency_ms,
+                 "system_message": f"You are a benchmark agent.{salt}"},
+    }]
+    edges = []
+    for i in range(tools):
+        nodes.append({
+            "id": f"api-{i}", "type": "tool_function",
+            "data": {"function_name": f"get_item_{i}", "base_tool": "api_request",
+                     "static_args": {"method": "GET", "url": f"{stub_url}/items/{i}/{{item_id}}"},
+                     "llm_args": ["item_id: str"]},
+        })
+    if tavily:
+        nodes.append({"id": "tavily-1", "type": "tavily", "data": {"API_key": "tvly-bench", "function_name": "tavily"}})
+
+    tool_ids = [node["id"] for node in nodes[1:]]
+    for i, tool_id in enumerate(tool_ids):
+        # Like the editor: the first tool edge carries the condition, the rest are "default"
+        if i == 0:
+            edges.append({"id": f"e-{tool_id}", "source": "agent-1", "target": tool_id,
+                          "type": "conditional", "condition": "should_continue"})
+        else:
+            edges.append({"id": f"e-{tool_id}", "source": "agent-1", "target": tool_id, "type": "default"})
+        edges.append({"id": f"e-{tool_id}-back", "source": tool_id, "target": "agent-1", "type": "simple"})
+
+    return {
+        "id": flow_id,
+        "title": f"Benchmark ({tools} tools)",
+        "metadata": {"state": {"type": "prebuilt", "name": "MessagesState"}, "async_mode": True},
+        "nodes": nodes,
+        "edges": edges,
+    }
+
+
+def _check(response) -> Dict[str, Any]:
+    if response.status_code != 200:
+        raise RuntimeError(f"{response.request.method} {response.request.url}: {response.status_code} {response.text}")
+    body = response.json()
+    if body.get("status") == "error":
+        raise RuntimeError(body.get("message"))
+    return body
+
+
+def _measure(call, iterations: int, items_per_call: int = 1) -> Dict[str, float]:
+    samples = []
+    started = time.perf_counter()
+    for i in range(iterations):
+        start = time.perf_counter()
+        call(i)
+        samples.append((time.perf_counter() - start) * 1000)
+    elapsed = time.perf_counter() - started
+    result = summarize(samples)
+    result["throughput_per_s"] = iterations * items_per_call / elapsed
+    return result
+
+
+def bench_size(client, tools: int, args, stub_url: str) -> Dict[str, Any]:
+    flow_id = f"bench-{tools}"
+    workflow = lambda salt="": synthetic_workflow(flow_id, tools, stub_url, args.latency_ms, salt=salt)
+
+    # Export once so cold loads have an agent.py to read, and warm the runtime
+    _check(client.post("/generate", json=workflow(), params={"export": True}))
+    _check(client.post(f"/workflows/{flow_id}/execute/async", json={"message": "warm up"}))
+
+    results = {}
+    results["generate"] = _measure(
+        lambda i: _check(client.post("/generate", json=workflow(f" #{i}"), params={"export": False})),
+        args.iterations,
+    )
+    # Back to the exported content for the load and run scenarios
+    _check(client.post("/generate", json=workflow(), params={"export": True}))
+
+    def cold_load(_):
+        _check(client.delete(f"/cache/flows/{flow_id}"))
+        _check(client.post(f"/cache/flows/{flow_id}/load"))
+    results["cold_load"] = _measure(cold_load, args.iterations)
+
+    results["warm_execute"] = _measure(
+        lambda i: _check(client.post(f"/workflows/{flow_id}/execute/async", json={"message": f"run {i}"})),
+        args.iterations,
+    )
+
+    batch = {"inputs": [{"message": f"item {j}"} for j in range(args.batch_size)]}
+    def batch_execute(_):
+        body = _check(client.post(f"/workflows/{flow_id}/execute/batch", json=batch))
+        errors = [r["error"] for r in body["results"] if "error" in r]
+        if errors:
+            raise RuntimeError(errors[0])
+    results["batch_execute"] = _measure(batch_execute, max(1, args.iterations // 5), args.batch_size)
+    results["batch_execute"]["batch_size"] = args.batch_size
+    return results
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> Dict[str, Any]:
+    """current/baseline ratios of p50, p99 and throughput for every scenario both runs have."""
+    ratios = {}
+    for size, scenarios in current["results"].items():
+        for name, stats in scenarios.items():
+            base = baseline.get("results", {}).get(size, {}).get(name)
+            if not base:
+                continue
+            ratios.setdefault(size, {})[name] = {
+                key: round(stats[key] / base[key], 3)
+                for key in ("p50_ms", "p99_ms", "throughput_per_s") if base.get(key)
+            }
+    return ratios
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 4, 16], help="Tool nodes per workflow.")
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Simulated LLM latency per call.")
+    parser.add_argument("--output", help="Also write the JSON report to this file.")
+    parser.add_argument("--baseline", help="JSON report of an earlier run to compare against.")
+    args = parser.parse_args()
+
+    server = start_stub_server()
+    stub_url = f"http://127.0.0.1:{server.server_port}"
+    # Point Tavily at the stand-in server; set before the agents are imported
+    os.environ["TAVILY_API_URL"] = f"{stub_url}/search"
+
+    from fastapi.testclient import TestClient
+    import main as app_module
+
+    report: Dict[str, Any] = {
+        "python": sys.version.split()[0],
+        "config": {"sizes": args.sizes, "iterations": args.iterations,
+                   "batch_size": args.batch_size, "latency_ms": args.latency_ms},
+        "results": {},
+    }
+    # Server logs go to stderr so stdout is only the JSON report
+    with tempfile.TemporaryDirectory() as project_dir, contextlib.redirect_stdout(sys.stderr):
+        app_module.BASE_PROJECT_DIR = project_dir
+        with TestClient(app_module.app) as client:
+            for size in args.sizes:
+                report["results"][str(size)] = bench_size(client, size, args, stub_url)
+    server.shutdown()
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["vs_baseline"] = compare(report, json.load(f))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
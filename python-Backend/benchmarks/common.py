@@ -0,0 +1,59 @@
+import json
+import statistics
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Stands in for the APIs that tools call. POST /search answers like Tavily;
+    any other path echoes the method and path back as JSON.
+    """
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True
+
+    def _reply(self, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._reply({"ok": True, "method": "GET", "path": self.path})
+
+    def do_POST(self):
+        length = int(self.headers.get("content-length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if self.path.startswith("/search"):
+            self._reply({
+                "query": request.get("query"),
+                "answer": "Stub answer.",
+                "results": [{"title": "Stub result", "url": "http://stub/1", "content": "Stub content."}],
+            })
+        else:
+            self._reply({"ok": True, "method": "POST", "path": self.path})
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub_server() -> ThreadingHTTPServer:
+    """Starts the stub API server on a free local port, in a daemon thread."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def summarize(samples_ms: List[float]) -> Dict[str, float]:
+    """p50/p99/mean (milliseconds) of a list of latencies."""
+    samples = sorted(samples_ms)
+    n = len(samples)
+    return {
+        "requests": n,
+        "p50_ms": statistics.median(samples),
+        "p99_ms": samples[min(n - 1, int(n * 0.99))],
+        "mean_ms": statistics.fmean(samples),
+    }
@@ -0,0 +1,52 @@
+"""
+Compares a fresh httpx.Client per tool call (the old api_request/tavily
+behaviour) with the shared keep-alive pool from agent_runtime.http_clients,
+against a local stand-in HTTP server. No network access needed.
+
+    python -m benchmarks.http_pool --requests 500
+"""
+import argparse
+import json
+import time
+
+import httpx
+
+from agent_runtime.http_clients import get_client, close_clients
+from benchmarks.common import start_stub_server, summarize
+
+
+def timed(call, n):
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        call()
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=300)
+    args = parser.parse_args()
+
+    server = start_stub_server()
+    url = f"http://127.0.0.1:{server.server_address[1]}/quote"
+
+    def fresh_client():
+        with httpx.Client(timeout=30.0) as client:
+            client.get(url).raise_for_status()
+
+    def pooled_client():
+        get_client(url).get(url, timeout=30.0).raise_for_status()
+
+    results = {
+        "fresh_client": timed(fresh_client, args.requests),
+        "pooled_client": timed(pooled_client, args.requests),
+    }
+    close_clients()
+    server.shutdown()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import asyncio
+import os
+import sqlite3
+import threading
+from typing import Any, AsyncIterator, Optional
+
+from langgraph.checkpoint.base import CheckpointTuple
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+# Conversation threads of every flow, in one local SQLite file
+THREADS_DB_PATH = os.environ.get("THREADS_DB_PATH", "threads.sqlite3")
+
+
+class ThreadSaver(SqliteSaver):
+    """
+    SqliteSaver that also serves async runs. The async methods run the sync
+    ones in a worker thread: SQLite calls are short and already serialised
+    by the saver's lock, and one connection serves every event loop (the
+    server's, and the ones sync endpoints run graphs on).
+    """
+
+    async def aget_tuple(self, config) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path: str = "") -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    async def aget_delta_channel_history(self, *args: Any, **kwargs: Any):
+        return await asyncio.to_thread(self.get_delta_channel_history, *args, **kwargs)
+
+
+_savers = {}
+_savers_lock = threading.Lock()
+
+
+def get_checkpointer(path: str = THREADS_DB_PATH) -> ThreadSaver:
+    """Returns the process-wide checkpointer for a threads database, opening it on first use."""
+    with _savers_lock:
+        saver = _savers.get(path)
+        if saver is None:
+            conn = sqlite3.connect(path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            saver = ThreadSaver(conn)
+            saver.setup()
+            _savers[path] = saver
+        return saver
+
+
+def close_checkpointers() -> None:
+    with _savers_lock:
+        for saver in _savers.values():
+            saver.conn.close()
+        _savers.clear()
+
+
+def thread_key(flow_id: str, thread_id: str) -> str:
+    """Threads are per flow: the same client thread_id on two flows is two conversations."""
+    return f"{flow_id}:{thread_id}"
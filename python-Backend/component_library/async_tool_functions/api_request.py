@@ -0,0 +1,54 @@
+import httpx
+from typing import Optional, Dict, Any
+from agent_runtime.http_clients import get_async_client
+
+async def api_request(
+    method: str,
+    url: str,
+    headers: Optional[Dict[str, str]] = None,
+    params: Optional[Dict[str, Any]] = None,
+    data: Optional[Dict[str, Any]] = None,
+    timeout: float = 30.0,
+) -> Dict[str, Any]:
+    """
+    Performs an HTTP request without blocking the event loop.
+
+    Args:
+        method (str): The HTTP method (e.g., "GET", "POST", "PUT", "DELETE", "PATCH").
+        url (str): The URL for the request.
+        headers (Optional[Dict[str, str]]): A dictionary of headers to send.
+        params (Optional[Dict[str, Any]]): A dictionary of query parameters.
+        data (Optional[Dict[str, Any]]): The JSON body for "POST", "PUT", "PATCH" requests.
+        timeout (float): Request timeout in seconds.
+
+    Returns:
+        Dict[str, Any]: The JSON response from the API, or a dictionary with an "error" key.
+    """
+    try:
+        # Shared keep-alive pool: repeat calls to the same host reuse their connection
+        response = await get_async_client(url).request(
+            method=method.upper(),
+            url=url,
+            headers=headers,
+            params=params,
+            json=data,  # 'json' kwarg handles serializing 'data' and setting content-type
+            timeout=timeout
+        )
+        
+        # Raise an exception for bad HTTP status codes
+        response.raise_for_status()
+        
+        # Try to return JSON, fall back to raw text if it's not JSON
+        try:
+            return response.json()
+        except Exception:
+            return {"content": response.text}
+
+    except httpx.TimeoutException:
+        return {"error": f"Request timed out ({timeout}s)."}
+    except httpx.HTTPStatusError as exc:
+        return {"error": f"HTTP error: {exc.response.status_code} - {exc.response.text}"}
+    except httpx.RequestError as exc:
+        return {"error": f"Request error: {exc}"}
+    except Exception as exc:
+        return {"error": f"An unexpected error occurred: {str(exc)}"}
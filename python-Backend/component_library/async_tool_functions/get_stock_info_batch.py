@@ -0,0 +1,21 @@
+from typing import Dict, Any, List
+from agent_runtime.deadlines import tool_timeout
+from agent_runtime.quotes import afetch_quotes, normalize_symbols
+
+async def get_stock_info_batch(ticker_symbols: List[str]) -> Dict[str, Any]:
+    """
+    Gets financial information for several stock ticker symbols at once using Yahoo Finance.
+    Use this instead of calling get_stock_info once per symbol when comparing stocks.
+
+    Args:
+        ticker_symbols (List[str]): The stock ticker symbols (e.g., ["AAPL", "MSFT", "NVDA"]).
+
+    Returns:
+        Dict[str, Any]: One entry per symbol with its price, market cap, P/E and dividend yield, or an error.
+    """
+    symbols = normalize_symbols(ticker_symbols)
+    if not symbols:
+        return {"error": "No ticker symbols given."}
+    # The symbols are fetched concurrently: TOOL_TIMEOUTS (or 30s) for all of them, within the run's deadline
+    timeout = tool_timeout(TOOL_TIMEOUTS.get("get_stock_info_batch", 30.0))
+    return await afetch_quotes(symbols, timeout)
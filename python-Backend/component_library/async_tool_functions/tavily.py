@@ -0,0 +1,59 @@
+import httpx
+import os
+from typing import Optional, List, Dict, Any
+from agent_runtime.http_clients import get_async_client
+from agent_runtime.deadlines import tool_timeout
+
+async def tavily(  # <-- Function name MUST match the 'type' in the JSON
+    query: str, 
+    search_depth: str = "advanced",
+    chunks_per_source: int = 3,
+    topic: str = "general",
+    days: int = 7,
+    max_results: int = 5,
+    include_answer: bool = True,
+    time_range: Optional[str] = None,
+    include_images: bool = True,
+    include_domains: Optional[List[str]] = None,
+    exclude_domains: Optional[List[str]] = None,
+    include_raw_content: bool = False,
+) -> Dict[str, Any]:
+    """
+    Tavily Search tool (async). Reads TAVILY_API_KEY from the flow's credentials.
+    """
+    
+    # CREDENTIALS is defined by the generated agent (per flow, never os.environ)
+    api_key = CREDENTIALS.get("TAVILY_API_KEY")
+    if not api_key:
+        return {"error": "TAVILY_API_KEY is not set for this flow (node 'API_key', agent .env or environment)."}
+    
+    try:
+        # TAVILY_API_URL points at a stand-in server (e.g. for offline benchmarks)
+        url = os.environ.get("TAVILY_API_URL", "https://api.tavily.com/search")
+        # TOOL_TIMEOUTS is defined by the generated agent from the node's 'timeout';
+        # never more than what is left of the run's deadline
+        timeout = tool_timeout(TOOL_TIMEOUTS.get("tavily", 90.0))
+        headers = { "content-type": "application/json", "accept": "application/json" }
+        payload = {
+            "api_key": api_key, "query": query, "search_depth": search_depth,
+            "topic": topic, "max_results": max_results, "include_images": include_images,
+            "include_answer": include_answer, "include_raw_content": include_raw_content,
+        }
+        if include_domains: payload["include_domains"] = include_domains
+        if exclude_domains: payload["exclude_domains"] = exclude_domains
+        if search_depth == "advanced" and chunks_per_source: payload["chunks_per_source"] = chunks_per_source
+        if topic == "news" and days: payload["days"] = int(days)
+        if time_range: payload["time_range"] = time_range
+
+        # Shared keep-alive pool: repeat searches reuse the TLS connection
+        response = await get_async_client(url).post(url, json=payload, headers=headers, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+    except httpx.TimeoutException:
+        return {"error": f"Request timed out ({timeout}s)."}
+    except httpx.HTTPStatusError as exc:
+        return {"error": f"HTTP error: {exc.response.status_code} - {exc.response.text}"}
+    except httpx.RequestError as exc:
+        return {"error": f"Request error: {exc}"}
+    except ValueError as exc:
+        return {"error": f"Invalid response format: {exc}"}
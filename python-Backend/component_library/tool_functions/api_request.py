@@ -1,5 +1,6 @@
 import httpx
 from typing import Optional, Dict, Any
+from agent_runtime.http_clients import get_client
 
 def api_request(
     method: str,
@@ -7,6 +8,7 @@ def api_request(
     headers: Optional[Dict[str, str]] = None,
     params: Optional[Dict[str, Any]] = None,
     data: Optional[Dict[str, Any]] = None,
+    timeout: float = 30.0,
 ) -> Dict[str, Any]:
     """
     Performs an HTTP request.
@@ -17,19 +19,21 @@ def api_request(
         headers (Optional[Dict[str, str]]): A dictionary of headers to send.
         params (Optional[Dict[str, Any]]): A dictionary of query parameters.
         data (Optional[Dict[str, Any]]): The JSON body for "POST", "PUT", "PATCH" requests.
+        timeout (float): Request timeout in seconds.
 
     Returns:
         Dict[str, Any]: The JSON response from the API, or a dictionary with an "error" key.
     """
     try:
-        with httpx.Client(timeout=30.0) as client:
-            response = client.request(
-                method=method.upper(),
-                url=url,
-                headers=headers,
-                params=params,
-                json=data  # 'json' kwarg handles serializing 'data' and setting content-type
-            )
+        # Shared keep-alive pool: repeat calls to the same host reuse their connection
+        response = get_client(url).request(
+            method=method.upper(),
+            url=url,
+            headers=headers,
+            params=params,
+            json=data,  # 'json' kwarg handles serializing 'data' and setting content-type
+            timeout=timeout
+        )
         
         # Raise an exception for bad HTTP status codes
         response.raise_for_status()
@@ -41,7 +45,7 @@ def api_request(
             return {"content": response.text}
 
     except httpx.TimeoutException:
-        return {"error": "Request timed out (30s)."}
+        return {"error": f"Request timed out ({timeout}s)."}
     except httpx.HTTPStatusError as exc:
         return {"error": f"HTTP error: {exc.response.status_code} - {exc.response.text}"}
     except httpx.RequestError as exc:
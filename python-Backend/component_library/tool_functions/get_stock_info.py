@@ -1,5 +1,6 @@
 import yfinance as yf
 from typing import Dict, Any
+from agent_runtime.deadlines import run_with_timeout, tool_timeout
 
 def get_stock_info(ticker_symbol: str) -> Dict[str, Any]:
     """
@@ -11,9 +12,10 @@ def get_stock_info(ticker_symbol: str) -> Dict[str, Any]:
     Returns:
         Dict[str, Any]: A dictionary containing the stock's info, or an error.
     """
+    # yfinance has no timeout of its own: TOOL_TIMEOUTS (or 30s), within the run's deadline
+    timeout = tool_timeout(TOOL_TIMEOUTS.get("get_stock_info", 30.0))
     try:
-        ticker = yf.Ticker(ticker_symbol)
-        info = ticker.info
+        info = run_with_timeout(lambda: yf.Ticker(ticker_symbol).info, timeout)
 
         if not info or info.get('regularMarketPrice') is None:
             return {"error": f"Could not find valid data for ticker symbol: {ticker_symbol}"}
@@ -36,5 +38,7 @@ def get_stock_info(ticker_symbol: str) -> Dict[str, Any]:
         }
         
         return useful_info
+    except TimeoutError:
+        return {"error": f"Timed out fetching data for {ticker_symbol} ({timeout:g}s)."}
     except Exception as e:
         return {"error": f"An error occurred while fetching data for {ticker_symbol}: {str(e)}"}
\ No newline at end of file
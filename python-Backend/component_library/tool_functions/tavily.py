@@ -1,6 +1,8 @@
 import httpx
-import os 
+import os
 from typing import Optional, List, Dict, Any
+from agent_runtime.http_clients import get_client
+from agent_runtime.deadlines import tool_timeout
 
 def tavily(  # <-- Function name MUST match the 'type' in the JSON
     query: str, 
@@ -17,16 +19,21 @@ def tavily(  # <-- Function name MUST match the 'type' in the JSON
     include_raw_content: bool = False,
 ) -> Dict[str, Any]:
     """
-    Tavily Search tool. Reads TAVILY_API_KEY from the environment.
+    Tavily Search tool. Reads TAVILY_API_KEY from the flow's credentials.
     """
     
-    api_key = os.environ.get("TAVILY_API_KEY") # <-- Reads from env
+    # CREDENTIALS is defined by the generated agent (per flow, never os.environ)
+    api_key = CREDENTIALS.get("TAVILY_API_KEY")
     if not api_key:
-        return {"error": "TAVILY_API_KEY environment variable not set."}
+        return {"error": "TAVILY_API_KEY is not set for this flow (node 'API_key', agent .env or environment)."}
     
     # ... (rest of the function is identical to tavily_search.py) ...
     try:
-        url = "https://api.tavily.com/search"
+        # TAVILY_API_URL points at a stand-in server (e.g. for offline benchmarks)
+        url = os.environ.get("TAVILY_API_URL", "https://api.tavily.com/search")
+        # TOOL_TIMEOUTS is defined by the generated agent from the node's 'timeout';
+        # never more than what is left of the run's deadline
+        timeout = tool_timeout(TOOL_TIMEOUTS.get("tavily", 90.0))
         headers = { "content-type": "application/json", "accept": "application/json" }
         payload = {
             "api_key": api_key, "query": query, "search_depth": search_depth,
@@ -39,12 +46,12 @@ def tavily(  # <-- Function name MUST match the 'type' in the JSON
         if topic == "news" and days: payload["days"] = int(days)
         if time_range: payload["time_range"] = time_range
 
-        with httpx.Client(timeout=90.0) as client:
-            response = client.post(url, json=payload, headers=headers)
+        # Shared keep-alive pool: repeat searches reuse the TLS connection
+        response = get_client(url).post(url, json=payload, headers=headers, timeout=timeout)
         response.raise_for_status()
         return response.json()
     except httpx.TimeoutException:
-        return {"error": "Request timed out (90s)."}
+        return {"error": f"Request timed out ({timeout}s)."}
     except httpx.HTTPStatusError as exc:
         return {"error": f"HTTP error: {exc.response.status_code} - {exc.response.text}"}
     except httpx.RequestError as exc:
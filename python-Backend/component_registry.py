@@ -0,0 +1,139 @@
+import ast
+import hashlib
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+# Component type -> sub-directory of the component library
+COMPONENT_DIRS = {
+    "tool_function": "tool_functions",
+    "async_tool_function": "async_tool_functions",
+    "condition": "conditions",
+}
+
+
+class Component:
+    """A parsed component_library file."""
+
+    def __init__(self, component_type: str, name: str, path: str, mtime_ns: int, source: str):
+        self.component_type = component_type
+        self.name = name
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.source = source
+        self.imports: List[str] = []
+        self.functions: Dict[str, Dict[str, Any]] = {}
+        self._parse()
+
+    def _parse(self) -> None:
+        tree = ast.parse(self.source, filename=self.path)
+        for node in tree.body:
+            if isinstance(node, (ast.Import, ast.ImportFrom)):
+                # unparse() flattens multi-line / parenthesised imports to one line
+                self.imports.append(ast.unparse(node))
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                self.functions[node.name] = {
+                    "signature": f"{node.name}({ast.unparse(node.args)})",
+                    "returns": ast.unparse(node.returns) if node.returns else None,
+                    "docstring": ast.get_docstring(node),
+                    "is_async": isinstance(node, ast.AsyncFunctionDef),
+                }
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "type": self.component_type,
+            "name": self.name,
+            "path": self.path,
+            "imports": self.imports,
+            "functions": self.functions,
+        }
+
+
+class ComponentRegistry:
+    """
+    In-memory index of the component library.
+
+    Every file is read and parsed with `ast` once; later lookups only
+    stat the file and re-parse it if its mtime changed. New files are
+    picked up on first lookup, deleted files drop out of the index.
+    'stamp' goes up whenever the index changes.
+    """
+
+    def __init__(self, root: str = "component_library"):
+        self.root = root
+        self._components: Dict[str, Dict[str, Component]] = {t: {} for t in COMPONENT_DIRS}
+        self._lock = threading.Lock()
+        self.stamp = 0
+
+    def path_for(self, component_type: str, name: str) -> str:
+        return os.path.join(self.root, COMPONENT_DIRS[component_type], f"{name}.py")
+
+    def scan(self) -> None:
+        """(Re)indexes every component in the library, skipping files that do not parse."""
+        for component_type, sub_dir in COMPONENT_DIRS.items():
+            directory = os.path.join(self.root, sub_dir)
+            names = set()
+            if os.path.isdir(directory):
+                names = {f[:-3] for f in os.listdir(directory) if f.endswith(".py")}
+            for name in sorted(names):
+                try:
+                    self.get(component_type, name)
+                except SyntaxError as e:
+                    # Only flows that use it fail (when they render it)
+                    print(f"⚠️  Warning: Skipping component {name}: {e}")
+            with self._lock:
+                for name in set(self._components[component_type]) - names:
+                    del self._components[component_type][name]
+                    self.stamp += 1
+
+    def get(self, component_type: str, name: str) -> Optional[Component]:
+        """
+        Returns the parsed component, or None if it does not exist.
+        Raises SyntaxError if the component file does not parse.
+        """
+        if component_type not in COMPONENT_DIRS:
+            return None
+        path = self.path_for(component_type, name)
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            with self._lock:
+                if self._components[component_type].pop(name, None) is not None:
+                    self.stamp += 1
+            return None
+
+        with self._lock:
+            component = self._components[component_type].get(name)
+            if component is not None and component.mtime_ns == mtime_ns:
+                return component
+
+        with open(path, "r", encoding="utf-8") as f:
+            source = f.read()
+        component = Component(component_type, name, path, mtime_ns, source)
+        with self._lock:
+            self._components[component_type][name] = component
+            self.stamp += 1
+        return component
+
+    def fingerprint(self) -> str:
+        """Hash of every indexed file and its mtime, from the index alone (no disk access)."""
+        with self._lock:
+            parts = sorted(
+                f"{component.path}:{component.mtime_ns}"
+                for components in self._components.values()
+                for component in components.values()
+            )
+        return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+    def has(self, component_type: str, name: str) -> bool:
+        return self.get(component_type, name) is not None
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Describes every indexed component (refreshing changed files first)."""
+        self.scan()
+        with self._lock:
+            return [
+                component.describe()
+                for components in self._components.values()
+                for component in components.values()
+            ]
@@ -0,0 +1,574 @@
+import argparse
+import asyncio
+import bisect
+import hashlib
+import itertools
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+
+from jobs import JOBS_DB_PATH
+from warmup import UsageLog, WARMUP_FLOWS, discover_flows, select_flows
+
+# --- Configuration ---
+SERVE_WORKERS = int(os.environ.get("SERVE_WORKERS", str(os.cpu_count() or 1)))
+SERVE_HOST = os.environ.get("SERVE_HOST", "0.0.0.0")
+SERVE_PORT = int(os.environ.get("SERVE_PORT", "8000"))
+WORKER_BASE_PORT = int(os.environ.get("WORKER_BASE_PORT", "8100"))
+HASH_RING_REPLICAS = int(os.environ.get("HASH_RING_REPLICAS", "128")) # Virtual nodes per worker
+WORKER_HEALTH_INTERVAL = float(os.environ.get("WORKER_HEALTH_INTERVAL", "2"))
+WORKER_START_TIMEOUT = float(os.environ.get("WORKER_START_TIMEOUT", "60"))
+# Connections to the workers open at once (0 = no limit). Every proxied run,
+# stream and job long-poll holds one until it finishes; requests over the
+# limit wait up to DISPATCHER_POOL_TIMEOUT seconds, then get a 503
+DISPATCHER_MAX_CONNECTIONS = int(os.environ.get("DISPATCHER_MAX_CONNECTIONS", "0"))
+DISPATCHER_POOL_TIMEOUT = float(os.environ.get("DISPATCHER_POOL_TIMEOUT", "30"))
+# How often a proxied request checks whether its client is still connected
+DISCONNECT_CHECK_INTERVAL = float(os.environ.get("DISCONNECT_CHECK_INTERVAL", "0.5"))
+# Must match the workers' setting: flows that are not exported can only be
+# moved to another worker by replaying their /generate request
+EXPORT_AGENT_PROJECTS = os.environ.get("EXPORT_AGENT_PROJECTS", "1").lower() not in ("0", "false", "no")
+
+# Headers that describe one hop, not the request itself
+HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailers", "transfer-encoding", "upgrade", "host", "content-length",
+}
+
+# Where the workers export agents (main.BASE_PROJECT_DIR, relative to this directory)
+AGENTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "generated_agents")
+
+FLOW_PATH = re.compile(r"^/(?:workflows|cache/flows)/([^/]+)")
+# Job ids start with the name of the worker that has the job ("worker-0.<hex>")
+JOB_PATH = re.compile(r"^/workflows/[^/]+/jobs/([^/.]+)\.")
+
+
+class HashRing:
+    """
+    Consistent-hash ring with virtual nodes. Adding or removing one of N
+    workers only moves about 1/N of the keys.
+    """
+
+    def __init__(self, nodes: Iterable[str] = (), replicas: int = HASH_RING_REPLICAS):
+        self.replicas = replicas
+        self.nodes = sorted(set(nodes))
+        points = [
+            (self._hash(f"{node}#{i}"), node)
+            for node in self.nodes for i in range(replicas)
+        ]
+        points.sort()
+        self._hashes = [h for h, _ in points]
+        self._owners = [node for _, node in points]
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.sha1(key.encode()).digest()[:8], "big")
+
+    def node_for(self, key: str) -> Optional[str]:
+        if not self._hashes:
+            return None
+        i = bisect.bisect(self._hashes, self._hash(key)) % len(self._hashes)
+        return self._owners[i]
+
+    def with_node(self, node: str) -> "HashRing":
+        return HashRing(self.nodes + [node], self.replicas)
+
+    def without_node(self, node: str) -> "HashRing":
+        return HashRing([n for n in self.nodes if n != node], self.replicas)
+
+
+def worker_jobs_path(name: str) -> str:
+    """JOBS_DB_PATH with the worker's name added (jobs.sqlite3 -> jobs.worker-0.sqlite3)."""
+    root, ext = os.path.splitext(JOBS_DB_PATH)
+    return f"{root}.{name}{ext}"
+
+
+class Worker:
+    """One `uvicorn main:app` process."""
+
+    def __init__(self, name: str, port: int):
+        self.name = name
+        self.port = port
+        self.url = f"http://127.0.0.1:{port}"
+        self.process: Optional[subprocess.Popen] = None
+        self.restarts = 0
+
+    def start(self) -> None:
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app",
+             "--host", "127.0.0.1", "--port", str(self.port), "--log-level", "warning"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            # The dispatcher tells each worker which flows to warm up (its own).
+            # Each worker keeps its jobs in its own file: it fails the runs it
+            # was doing when it restarts, which must not touch other workers' jobs.
+            # Job ids name the worker, so job URLs are routed to it, not by flow
+            env={**os.environ, "WARMUP_FLOWS": "none", "JOBS_DB_PATH": worker_jobs_path(self.name),
+                 "JOB_ID_PREFIX": f"{self.name}."},
+        )
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def stop(self, timeout: float = 30) -> None:
+        if self.process is None:
+            return
+        self.process.terminate()
+        try:
+            self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+class Dispatcher:
+    """
+    Front process of the production serving mode (`python dispatcher.py`).
+
+    Each worker is a plain `uvicorn main:app` process with its own graph
+    cache. Requests for a flow_id always go to the same worker (consistent
+    hashing), so each flow is loaded and cached by one worker only. When a
+    worker is added, removed or dies, only the flows whose owner changed
+    move: they are warmed on their new worker and evicted from the old one.
+    """
+
+    def __init__(self, worker_count: int = SERVE_WORKERS, base_port: int = WORKER_BASE_PORT):
+        self.base_port = base_port
+        self.workers: Dict[str, Worker] = {}
+        self.ring = HashRing()
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(None, pool=DISPATCHER_POOL_TIMEOUT),
+            limits=httpx.Limits(max_connections=DISPATCHER_MAX_CONNECTIONS or None,
+                                max_keepalive_connections=None),
+        )
+        self._ports = itertools.count(base_port)
+        self._round_robin = itertools.count()
+        self._initial_workers = worker_count
+        self._lock = asyncio.Lock() # Serialises ring changes
+        # Flows seen so far, and the last /generate payload of flows that
+        # were not exported (they cannot be reloaded from disk elsewhere)
+        self.known_flows: set = set()
+        self.in_memory_definitions: Dict[str, Tuple[bytes, str]] = {}
+        self.rebalanced_flows = 0
+
+    # --- Lifecycle ---
+
+    async def start(self) -> None:
+        workers = [self._new_worker() for _ in range(self._initial_workers)]
+        for worker in workers:
+            worker.start()
+        await asyncio.gather(*(self._wait_ready(worker) for worker in workers))
+        for worker in workers:
+            self.workers[worker.name] = worker
+        self.ring = HashRing(self.workers)
+        # Flows exported before this start can move between workers too
+        self.known_flows.update(discover_flows(AGENTS_DIR))
+        await self.warm_up(select_flows(AGENTS_DIR, UsageLog(), WARMUP_FLOWS))
+        print(f"🚦 Dispatcher ready with {len(workers)} worker(s).")
+
+    async def warm_up(self, flow_ids: Iterable[str]) -> Dict[str, int]:
+        """Starts a background warm-up on each worker, of the flows it owns."""
+        owned: Dict[str, list] = {}
+        for flow_id in flow_ids:
+            owner = self.ring.node_for(flow_id)
+            if owner is not None:
+                owned.setdefault(owner, []).append(flow_id)
+
+        async def start(name: str, flows: list) -> int:
+            try:
+                response = await self.client.post(f"{self.workers[name].url}/warmup", json={"flow_ids": flows})
+                return response.json().get("queued", 0)
+            except (httpx.HTTPError, ValueError) as e:
+                print(f"⚠️  Warning: Could not start the warm-up on {name}: {e}")
+                return 0
+
+        names = list(owned)
+        queued = await asyncio.gather(*(start(name, owned[name]) for name in names))
+        return dict(zip(names, queued))
+
+    async def stop(self) -> None:
+        for worker in self.workers.values():
+            await asyncio.to_thread(worker.stop)
+        await self.client.aclose()
+
+    def _new_worker(self) -> Worker:
+        port = next(self._ports)
+        return Worker(f"worker-{port - self.base_port}", port)
+
+    async def _wait_ready(self, worker: Worker) -> None:
+        deadline = time.monotonic() + WORKER_START_TIMEOUT
+        while time.monotonic() < deadline:
+            if not worker.alive:
+                raise RuntimeError(f"{worker.name} exited during startup.")
+            try:
+                if (await self.client.get(worker.url + "/", timeout=2)).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+        raise RuntimeError(f"{worker.name} did not become ready in {WORKER_START_TIMEOUT}s.")
+
+    # --- Membership changes ---
+
+    async def add_worker(self) -> Worker:
+        """Starts a new worker, hands it its share of the flows, then routes to it."""
+        worker = self._new_worker()
+        worker.start()
+        try:
+            await self._wait_ready(worker)
+        except RuntimeError:
+            await asyncio.to_thread(worker.stop)
+            raise
+        async with self._lock:
+            self.workers[worker.name] = worker
+            await self._switch_ring(self.ring.with_node(worker.name))
+        print(f"➕ Added {worker.name}.")
+        return worker
+
+    async def remove_worker(self, name: str) -> None:
+        """Moves a worker's flows to the others, then stops it once idle."""
+        async with self._lock:
+            worker = self.workers.get(name)
+            if worker is None:
+                raise KeyError(name)
+            if len(self.workers) == 1:
+                raise ValueError("Cannot remove the last worker.")
+            await self._switch_ring(self.ring.without_node(name))
+            del self.workers[name]
+        # uvicorn finishes in-flight requests on SIGTERM
+        await asyncio.to_thread(worker.stop)
+        print(f"➖ Removed {name}.")
+
+    async def _switch_ring(self, new_ring: HashRing) -> None:
+        """
+        Warms every moved flow on its new worker, swaps the ring, then evicts
+        the flows from their old worker. Call with the lock held.
+        """
+        old_ring = self.ring
+        moves = [
+            (flow_id, old_ring.node_for(flow_id), new_ring.node_for(flow_id))
+            for flow_id in self.known_flows
+        ]
+        moves = [move for move in moves if move[1] != move[2]]
+
+        await asyncio.gather(*(self._warm(flow_id, new) for flow_id, _, new in moves))
+        self.ring = new_ring
+        await asyncio.gather(*(
+            self._evict(flow_id, old) for flow_id, old, _ in moves
+            if old in self.workers and self.workers[old].alive
+        ))
+        self.rebalanced_flows += len(moves)
+        if moves:
+            print(f"🔀 Rebalanced {len(moves)} flow(s) across {len(new_ring.nodes)} worker(s).")
+
+    async def _warm(self, flow_id: str, worker_name: Optional[str]) -> None:
+        worker = self.workers.get(worker_name)
+        if worker is None:
+            return
+        try:
+            definition = self.in_memory_definitions.get(flow_id)
+            if definition is not None:
+                body, query = definition
+                await self.client.post(f"{worker.url}/generate?{query}", content=body,
+                                       headers={"content-type": "application/json"})
+            else:
+                await self.client.post(f"{worker.url}/cache/flows/{flow_id}/load")
+        except httpx.HTTPError as e:
+            # Not fatal: the new owner loads the flow on its first request
+            print(f"⚠️  Warning: Could not warm {flow_id} on {worker_name}: {e}")
+
+    async def _evict(self, flow_id: str, worker_name: str) -> None:
+        try:
+            await self.client.delete(f"{self.workers[worker_name].url}/cache/flows/{flow_id}")
+        except httpx.HTTPError as e:
+            print(f"⚠️  Warning: Could not evict {flow_id} from {worker_name}: {e}")
+
+    async def supervise(self) -> None:
+        """Replaces workers that died: their flows move, then move back on restart."""
+        while True:
+            await asyncio.sleep(WORKER_HEALTH_INTERVAL)
+            for name, worker in list(self.workers.items()):
+                if worker.alive:
+                    continue
+                print(f"💥 {name} exited (code {worker.process.returncode}); restarting it.")
+                async with self._lock:
+                    if len(self.workers) > 1:
+                        await self._switch_ring(self.ring.without_node(name))
+                worker.restarts += 1
+                worker.start()
+                try:
+                    await self._wait_ready(worker)
+                except RuntimeError as e:
+                    print(f"❌ {e}")
+                    continue
+                async with self._lock:
+                    if name not in self.ring.nodes:
+                        await self._switch_ring(self.ring.with_node(name))
+
+    # --- Routing ---
+
+    def route(self, flow_id: Optional[str], path: str = "") -> Worker:
+        """
+        The worker that has the job a job URL names, else the flow's owner,
+        or any worker (round robin) for flow-less requests.
+        """
+        job = JOB_PATH.match(path)
+        if job:
+            worker = self.workers.get(job.group(1))
+            if worker is None:
+                raise HTTPException(status_code=404, detail=f"The worker that ran this job ({job.group(1)}) was removed.")
+            return worker
+        if flow_id is not None:
+            name = self.ring.node_for(flow_id)
+        else:
+            nodes = self.ring.nodes
+            name = nodes[next(self._round_robin) % len(nodes)] if nodes else None
+        if name is None:
+            raise HTTPException(status_code=503, detail="No worker available.")
+        return self.workers[name]
+
+    def remember(self, flow_id: str, path: str, body: bytes, query: str) -> None:
+        self.known_flows.add(flow_id)
+        if path == "/generate":
+            export = re.search(r"(?:^|&)export=([^&]*)", query.lower())
+            exported = EXPORT_AGENT_PROJECTS if export is None else export.group(1) not in ("false", "0", "no")
+            if exported:
+                self.in_memory_definitions.pop(flow_id, None)
+            else:
+                self.in_memory_definitions[flow_id] = (body, query)
+
+    def stats(self) -> Dict[str, Any]:
+        owned: Dict[str, int] = {name: 0 for name in self.workers}
+        for flow_id in self.known_flows:
+            name = self.ring.node_for(flow_id)
+            if name in owned:
+                owned[name] += 1
+        return {
+            "workers": [
+                {"name": w.name, "url": w.url, "alive": w.alive, "in_ring": w.name in self.ring.nodes,
+                 "restarts": w.restarts, "flows": owned[w.name]}
+                for w in self.workers.values()
+            ],
+            "known_flows": len(self.known_flows),
+            "rebalanced_flows": self.rebalanced_flows,
+        }
+
+
+def merge_metrics(texts: Dict[str, str]) -> str:
+    """
+    Merges the Prometheus text of several workers into one exposition,
+    adding a 'worker' label to every sample and keeping each HELP/TYPE once.
+    """
+    families: Dict[str, Dict[str, Any]] = {}
+    for worker, text in texts.items():
+        family = None
+        for line in text.splitlines():
+            if line.startswith("# HELP ") or line.startswith("# TYPE "):
+                family = families.setdefault(line.split()[2], {"header": [], "samples": []})
+                if line not in family["header"]:
+                    family["header"].append(line)
+            elif line and not line.startswith("#") and family is not None:
+                name, _, rest = line.partition("{")
+                if rest:
+                    sample = f'{name}{{worker="{worker}",{rest}'
+                else:
+                    name, _, value = line.partition(" ")
+                    sample = f'{name}{{worker="{worker}"}} {value}'
+                family["samples"].append(sample)
+    lines = []
+    for family in families.values():
+        lines.extend(family["header"])
+        lines.extend(family["samples"])
+    return "\n".join(lines) + "\n"
+
+
+def flow_id_for(path: str, body: bytes) -> Optional[str]:
+    """The flow a request is about: from the URL, or the 'id' of a /generate body."""
+    match = FLOW_PATH.match(path)
+    if match:
+        return match.group(1)
+    if path == "/generate":
+        try:
+            flow_id = json.loads(body).get("id")
+        except (ValueError, AttributeError):
+            return None
+        return flow_id if isinstance(flow_id, str) else None
+    return None
+
+
+async def send_until_disconnect(client: httpx.AsyncClient, upstream: httpx.Request,
+                                request: Request) -> Optional[httpx.Response]:
+    """
+    Sends a proxied request, giving up (and closing the upstream connection,
+    so the worker cancels the run) if the client disconnects before the
+    response starts. Returns None in that case.
+    """
+    task = asyncio.ensure_future(client.send(upstream, stream=True))
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_CHECK_INTERVAL)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                try:
+                    # It may have completed meanwhile: release its connection
+                    await (await task).aclose()
+                except (asyncio.CancelledError, httpx.HTTPError):
+                    pass
+                return None
+    finally:
+        task.cancel()
+
+
+def create_app(worker_count: int = SERVE_WORKERS) -> FastAPI:
+    dispatcher = Dispatcher(worker_count)
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        await dispatcher.start()
+        supervisor = asyncio.create_task(dispatcher.supervise())
+        yield
+        supervisor.cancel()
+        await dispatcher.stop()
+
+    app = FastAPI(title="LangGraph Agent Dispatcher", lifespan=lifespan)
+    app.state.dispatcher = dispatcher
+
+    @app.get("/dispatcher/workers")
+    def list_workers():
+        return dispatcher.stats()
+
+    @app.post("/dispatcher/workers")
+    async def add_worker():
+        try:
+            worker = await dispatcher.add_worker()
+        except RuntimeError as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        return {"name": worker.name, "url": worker.url}
+
+    @app.delete("/dispatcher/workers/{name}")
+    async def remove_worker(name: str):
+        try:
+            await dispatcher.remove_worker(name)
+        except KeyError:
+            raise HTTPException(status_code=404, detail=f"Unknown worker: {name}")
+        except ValueError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        return {"name": name, "status": "removed"}
+
+    @app.get("/cache/stats")
+    async def cache_stats():
+        """Each worker's own /cache/stats, keyed by worker name."""
+        async def fetch(worker: Worker):
+            try:
+                return (await dispatcher.client.get(f"{worker.url}/cache/stats")).json()
+            except httpx.HTTPError as e:
+                return {"error": str(e)}
+        workers = list(dispatcher.workers.values())
+        results = await asyncio.gather(*(fetch(w) for w in workers))
+        return {"workers": {w.name: r for w, r in zip(workers, results)}}
+
+    @app.get("/ready")
+    async def ready():
+        """Ready when every worker is; includes each worker's warm-up progress."""
+        async def fetch(worker: Worker):
+            try:
+                response = await dispatcher.client.get(f"{worker.url}/ready")
+                return response.json()
+            except (httpx.HTTPError, ValueError) as e:
+                return {"ready": False, "error": str(e)}
+        workers = list(dispatcher.workers.values())
+        results = await asyncio.gather(*(fetch(w) for w in workers))
+        all_ready = bool(workers) and all(r.get("ready") for r in results)
+        return JSONResponse(
+            status_code=200 if all_ready else 503,
+            content={"ready": all_ready, "workers": {w.name: r for w, r in zip(workers, results)}},
+        )
+
+    @app.post("/warmup")
+    async def warm_up(request: Request):
+        """Warms 'flow_ids' (or the 'limit' most recently used flows, or all) on their owners."""
+        try:
+            body = json.loads(await request.body() or b"{}")
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body must be JSON.")
+        flow_ids = body.get("flow_ids")
+        if flow_ids is None:
+            limit = body.get("limit")
+            flow_ids = select_flows(AGENTS_DIR, UsageLog(), "all" if limit is None else str(limit))
+        dispatcher.known_flows.update(flow_ids)
+        return {"queued": await dispatcher.warm_up(flow_ids)}
+
+    @app.get("/metrics")
+    async def metrics():
+        """Every worker's /metrics, merged, with a 'worker' label on each sample."""
+        async def fetch(worker: Worker):
+            try:
+                return (await dispatcher.client.get(f"{worker.url}/metrics")).text
+            except httpx.HTTPError:
+                return ""
+        workers = list(dispatcher.workers.values())
+        texts = await asyncio.gather(*(fetch(w) for w in workers))
+        return Response(
+            content=merge_metrics({w.name: t for w, t in zip(workers, texts)}),
+            media_type="text/plain; version=0.0.4; charset=utf-8",
+        )
+
+    @app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS", "HEAD"])
+    async def proxy(request: Request, path: str):
+        body = await request.body()
+        flow_id = flow_id_for(request.url.path, body)
+        worker = dispatcher.route(flow_id, request.url.path)
+
+        upstream = dispatcher.client.build_request(
+            request.method,
+            f"{worker.url}{request.url.path}",
+            params=request.query_params,
+            headers=[(k, v) for k, v in request.headers.items() if k.lower() not in HOP_BY_HOP_HEADERS],
+            content=body,
+        )
+        try:
+            response = await send_until_disconnect(dispatcher.client, upstream, request)
+        except httpx.PoolTimeout:
+            raise HTTPException(status_code=503, detail="Too many requests in progress: try again later.")
+        except httpx.TransportError as e:
+            raise HTTPException(status_code=502, detail=f"{worker.name} is unavailable: {e}")
+        if response is None:
+            # Nobody is left to read it; 499 is the usual "client closed request" code
+            return Response(status_code=499)
+
+        if flow_id is not None and response.status_code < 400:
+            dispatcher.remember(flow_id, request.url.path, body, request.url.query)
+
+        # Stream the body through, so SSE endpoints keep streaming
+        return StreamingResponse(
+            response.aiter_raw(),
+            status_code=response.status_code,
+            headers={k: v for k, v in response.headers.items() if k.lower() not in HOP_BY_HOP_HEADERS},
+            background=BackgroundTask(response.aclose),
+        )
+
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the agent API with several workers.")
+    parser.add_argument("--workers", type=int, default=SERVE_WORKERS)
+    parser.add_argument("--host", default=SERVE_HOST)
+    parser.add_argument("--port", type=int, default=SERVE_PORT)
+    args = parser.parse_args()
+
+    print(f"--- Starting dispatcher with {args.workers} worker(s) ---")
+    uvicorn.run(create_app(args.workers), host=args.host, port=args.port)
@@ -0,0 +1,108 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from component_registry import ComponentRegistry
+
+# Only these fields feed enrich_json and the template. Everything else
+# (node positions, sizes, selection state, handles, titles...) is cosmetic.
+NODE_CONTENT_FIELDS = ("id", "type", "data")
+EDGE_CONTENT_FIELDS = ("source", "target", "type", "condition")
+
+
+_fingerprints: Dict[Tuple[str, str], Tuple[float, int, str]] = {}
+_fingerprints_lock = threading.Lock()
+
+
+def generator_fingerprint(registry: ComponentRegistry, template_path: str = "langgraph_template.py.j2",
+                          max_age: float = 2.0) -> str:
+    """
+    Identifies the current generator inputs (template + component library),
+    so editing either invalidates cached artifacts. The library comes from
+    the registry's index; the disk is rescanned at most every 'max_age'
+    seconds, and sooner when a render re-indexed a changed component.
+    """
+    key = (registry.root, template_path)
+    now = time.monotonic()
+    with _fingerprints_lock:
+        cached = _fingerprints.get(key)
+    if cached is not None and now - cached[0] < max_age and cached[1] == registry.stamp:
+        return cached[2]
+    registry.scan()
+    try:
+        st = os.stat(template_path)
+        template = f"{template_path}:{st.st_mtime_ns}:{st.st_size}"
+    except OSError:
+        template = f"{template_path}:missing"
+    stamp = registry.stamp
+    fingerprint = hashlib.sha256(f"{template}\n{registry.fingerprint()}".encode()).hexdigest()
+    with _fingerprints_lock:
+        _fingerprints[key] = (now, stamp, fingerprint)
+    return fingerprint
+
+
+def workflow_content_hash(graph_def: Dict[str, Any], fingerprint: str = "") -> str:
+    """
+    Canonical SHA-256 of the parts of a graph definition that affect the
+    generated agent. The flow's own 'id' is excluded, so two flows with
+    identical content get the same hash.
+    """
+    canonical = {
+        "nodes": [
+            {k: node[k] for k in NODE_CONTENT_FIELDS if k in node}
+            for node in graph_def.get("nodes", [])
+        ],
+        "edges": [
+            {k: edge[k] for k in EDGE_CONTENT_FIELDS if k in edge}
+            for edge in graph_def.get("edges", [])
+        ],
+        "metadata": graph_def.get("metadata", {}),
+        "generator": fingerprint,
+    }
+    payload = json.dumps(canonical, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class GenerationCache:
+    """
+    Thread-safe LRU of rendered agent sources, keyed by content hash.
+    Sources are small strings, so this can hold many more flows than
+    the graph cache and still skip enrich/render on a graph cache miss.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._sources: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, content_hash: str) -> Optional[str]:
+        with self._lock:
+            source = self._sources.get(content_hash)
+            if source is None:
+                self.misses += 1
+                return None
+            self._sources.move_to_end(content_hash)
+            self.hits += 1
+            return source
+
+    def put(self, content_hash: str, source: str) -> None:
+        with self._lock:
+            self._sources[content_hash] = source
+            self._sources.move_to_end(content_hash)
+            while len(self._sources) > self.max_entries:
+                self._sources.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._sources),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
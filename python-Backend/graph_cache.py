@@ -0,0 +1,361 @@
+import gc
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set, Tuple
+
+try:
+    import psutil  # Optional: more portable RSS readings
+except ImportError:
+    psutil = None
+
+
+def current_rss_bytes() -> Optional[int]:
+    """
+    Returns the resident set size of this process in bytes,
+    or None if it cannot be measured on this platform.
+    """
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class CacheEntry:
+    """
+    One loaded version of a flow: a compiled graph plus the objects that
+    keep it alive, and the number of runs currently using it.
+    """
+
+    def __init__(self, graph: Any, module: Any = None, size_bytes: int = 0,
+                 content_hash: Optional[str] = None, version: int = 0):
+        self.graph = graph
+        self.module = module
+        self.size_bytes = size_bytes
+        self.content_hash = content_hash
+        self.version = version
+        self.active_runs = 0
+        self.retired = False
+        # Per-version lock: runs of different flows never contend on it
+        self._lock = threading.Lock()
+
+    def begin_run(self) -> Any:
+        """
+        Counts a new run and returns the graph, or None if this version has
+        already been retired (it may be freed at any moment).
+        """
+        with self._lock:
+            if self.retired or self.graph is None:
+                return None
+            self.active_runs += 1
+            return self.graph
+
+    def end_run(self) -> bool:
+        """Returns True if this was the last run of a retired version."""
+        with self._lock:
+            self.active_runs -= 1
+            return self.retired and self.active_runs == 0
+
+    def retire(self) -> bool:
+        """Marks the version as replaced; returns True if no run is using it."""
+        with self._lock:
+            self.retired = True
+            return self.active_runs == 0
+
+    def free(self) -> None:
+        with self._lock:
+            self.graph = None
+            self.module = None
+
+
+class GraphLease:
+    """
+    A run's hold on one version of a flow. Use it as a context manager
+    (it yields the graph); the version cannot be freed until it is released.
+    """
+
+    def __init__(self, graph: Any, cache: "Optional[GraphCache]" = None,
+                 entry: Optional[CacheEntry] = None, module: Any = None):
+        self.graph = graph
+        self.module = entry.module if entry is not None else module
+        self.version = entry.version if entry is not None else None
+        self._cache = cache
+        self._entry = entry
+
+    def release(self) -> None:
+        entry, self._entry = self._entry, None
+        if entry is not None:
+            self._cache._end_run(entry)
+
+    def __enter__(self) -> Any:
+        return self.graph
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
+
+
+class GraphCache:
+    """
+    Thread-safe LRU cache of compiled graphs, keyed by flow_id.
+
+    Bounded by an entry count and, optionally, a byte budget. Entry sizes
+    are the RSS growth measured while the agent module was loaded, so the
+    byte budget is an approximation of what each flow really costs.
+    Evicting an entry drops the agent module (with its chat model client
+    and tool closures) so the memory can be reclaimed.
+
+    Entries may carry the content hash of the workflow they were built
+    from, so flows with identical content can share one compiled graph.
+
+    Each put() is a new version of the flow, swapped in atomically. Runs
+    hold a lease on the version they started with (see lease()); a replaced
+    or evicted version is only freed once its last run has finished.
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: Optional[int] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes or None
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._by_hash: Dict[str, Set[str]] = {}
+        self._versions: Dict[str, int] = {}  # flow_id -> last version number
+        self._retired: Set[CacheEntry] = set()  # Replaced, but still running
+        self._lock = threading.RLock()
+
+        # --- Counters ---
+        self.hits = 0
+        self._contended_hits = 0  # Fast-path hits counted without the lock (approximate)
+        self.misses = 0
+        self.evictions = 0
+        self.loads = 0
+        self.load_failures = 0
+        self.load_seconds_total = 0.0
+        self.versions_released = 0
+
+    def get(self, flow_id: str) -> Any:
+        """Returns the cached graph (marking it most recently used), or None."""
+        # Fast path for loaded flows: a plain dict read needs no lock
+        entry = self._entries.get(flow_id)
+        graph = entry.graph if entry is not None else None
+        if graph is not None:
+            self._touch(flow_id)
+            return graph
+
+        with self._lock:
+            entry = self._entries.get(flow_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(flow_id)
+            self.hits += 1
+            return entry.graph
+
+    def lease(self, flow_id: str, count: bool = True) -> Optional[GraphLease]:
+        """
+        Returns a lease on the current version of a flow for one run
+        (counted as a hit, like get()), or None if it is not cached.
+        'count=False' leaves the counters alone, for the lease taken right
+        after loading a flow whose miss was already counted.
+        """
+        while True:
+            entry = self._entries.get(flow_id)
+            if entry is None:
+                if count:
+                    with self._lock:
+                        self.misses += 1
+                return None
+            graph = entry.begin_run()
+            if graph is not None:
+                if count:
+                    self._touch(flow_id)
+                return GraphLease(graph, self, entry)
+            # Lost a race with a swap that retired this version: use the new one
+
+    def version(self, flow_id: str) -> Optional[int]:
+        """Returns the version number of the flow's current graph, if cached."""
+        with self._lock:
+            entry = self._entries.get(flow_id)
+            return entry.version if entry else None
+
+    def peek(self, flow_id: str) -> Any:
+        """Returns the cached graph without touching LRU order or counters."""
+        with self._lock:
+            entry = self._entries.get(flow_id)
+            return entry.graph if entry else None
+
+    def content_hash(self, flow_id: str) -> Optional[str]:
+        """Returns the content hash the cached graph was built from, if known."""
+        with self._lock:
+            entry = self._entries.get(flow_id)
+            return entry.content_hash if entry else None
+
+    def find_by_content_hash(self, content_hash: str, exclude: Optional[str] = None) -> Optional[Tuple[Any, Any]]:
+        """Returns (graph, module) of any cached flow built from this content, other than 'exclude'."""
+        with self._lock:
+            for flow_id in self._by_hash.get(content_hash, ()):
+                if flow_id != exclude:
+                    entry = self._entries[flow_id]
+                    return entry.graph, entry.module
+            return None
+
+    def put(self, flow_id: str, graph: Any, module: Any = None,
+            load_seconds: float = 0.0, size_bytes: int = 0,
+            content_hash: Optional[str] = None, shared: bool = False) -> int:
+        """
+        Stores a graph as the flow's new version, then evicts until within
+        budget. 'shared' marks a graph reused from another flow with the
+        same content: it costs no extra memory and does not count as a load.
+        Returns the new version number.
+        """
+        with self._lock:
+            version = self._versions.get(flow_id, 0) + 1
+            self._versions[flow_id] = version
+            entry = CacheEntry(
+                graph, module, 0 if shared else max(size_bytes, 0), content_hash, version
+            )
+            # Swap first, so new runs never see the flow missing
+            old = self._entries.get(flow_id)
+            self._entries[flow_id] = entry
+            self._entries.move_to_end(flow_id)
+            if old is not None:
+                self._retire(flow_id, old)
+            if content_hash:
+                self._by_hash.setdefault(content_hash, set()).add(flow_id)
+            if not shared:
+                self.loads += 1
+                self.load_seconds_total += load_seconds
+            evicted = self._enforce_limits()
+
+        if evicted:
+            # Agent modules, graphs and clients reference each other,
+            # so only the cycle collector can actually free them
+            gc.collect()
+        return version
+
+    def record_load_failure(self, load_seconds: float = 0.0) -> None:
+        with self._lock:
+            self.load_failures += 1
+            self.load_seconds_total += load_seconds
+
+    def pop(self, flow_id: str) -> Any:
+        """Removes a flow from the cache (e.g. before regenerating it)."""
+        with self._lock:
+            entry = self._entries.pop(flow_id, None)
+            if entry is None:
+                return None
+            graph = entry.graph
+            self._retire(flow_id, entry)
+            return graph
+
+    def __contains__(self, flow_id: str) -> bool:
+        with self._lock:
+            return flow_id in self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    @property
+    def total_bytes(self) -> int:
+        with self._lock:
+            return sum(entry.size_bytes for entry in self._entries.values())
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of the cache size and counters."""
+        with self._lock:
+            hits = self.hits + self._contended_hits
+            lookups = hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "rss_bytes": current_rss_bytes(),
+                "hits": hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else None,
+                "evictions": self.evictions,
+                "loads": self.loads,
+                "load_failures": self.load_failures,
+                "load_seconds_total": self.load_seconds_total,
+                "load_seconds_avg": (
+                    self.load_seconds_total / (self.loads + self.load_failures)
+                    if (self.loads + self.load_failures) else None
+                ),
+                "active_runs": sum(e.active_runs for e in self._entries.values())
+                               + sum(e.active_runs for e in self._retired),
+                "retired_versions_running": len(self._retired),
+                "versions_released": self.versions_released,
+            }
+
+    def _touch(self, flow_id: str) -> None:
+        # Best-effort LRU bump: never wait for the lock on the hot path.
+        # A hit that finds it busy is counted but keeps its LRU position.
+        if self._lock.acquire(blocking=False):
+            try:
+                if flow_id in self._entries:
+                    self._entries.move_to_end(flow_id)
+                self.hits += 1
+            finally:
+                self._lock.release()
+        else:
+            self._contended_hits += 1
+
+    # --- Internals (call with the lock held) ---
+
+    def _over_budget(self) -> bool:
+        if len(self._entries) > self.max_entries:
+            return True
+        return self.max_bytes is not None and self.total_bytes > self.max_bytes
+
+    def _enforce_limits(self) -> int:
+        evicted = 0
+        # Never evict the entry that was just added
+        while len(self._entries) > 1 and self._over_budget():
+            flow_id, entry = self._entries.popitem(last=False)
+            self._retire(flow_id, entry)
+            self.evictions += 1
+            evicted += 1
+            print(f"♻️  Evicted graph for flow_id {flow_id} from cache.")
+        return evicted
+
+    def _retire(self, flow_id: str, entry: CacheEntry) -> None:
+        """Takes a version out of service; frees it now or after its last run."""
+        if entry.content_hash:
+            flows = self._by_hash.get(entry.content_hash)
+            if flows is not None:
+                flows.discard(flow_id)
+                if not flows:
+                    del self._by_hash[entry.content_hash]
+                elif entry.size_bytes:
+                    self._hand_over_size(entry, flows)
+        if entry.retire():
+            self._free(entry)
+        else:
+            self._retired.add(entry)
+            print(f"⏳ Version {entry.version} of flow_id {flow_id} retired; "
+                  f"released after its {entry.active_runs} in-flight run(s).")
+
+    def _hand_over_size(self, entry: CacheEntry, flows: Set[str]) -> None:
+        # The module stays alive in the flows sharing it: one of them now carries its bytes
+        for other_id in flows:
+            other = self._entries[other_id]
+            if other.module is entry.module and not other.size_bytes:
+                other.size_bytes = entry.size_bytes
+                return
+
+    def _free(self, entry: CacheEntry) -> None:
+        self._retired.discard(entry)
+        module = entry.module
+        if module is not None and sys.modules.get(module.__name__) is module:
+            del sys.modules[module.__name__]
+        entry.free()
+        self.versions_released += 1
+
+    def _end_run(self, entry: CacheEntry) -> None:
+        if entry.end_run():
+            with self._lock:
+                self._free(entry)
@@ -0,0 +1,278 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+# Background runs of every flow, in one local SQLite file
+JOBS_DB_PATH = os.environ.get("JOBS_DB_PATH", "jobs.sqlite3")
+# Jobs run at once; further ones wait in the queue
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "4"))
+# Jobs that may wait for a worker before submissions are turned away
+JOB_QUEUE_SIZE = int(os.environ.get("JOB_QUEUE_SIZE", "100"))
+# Finished jobs (and their results) are kept this long
+JOB_RETENTION_SECONDS = float(os.environ.get("JOB_RETENTION_SECONDS", "86400"))
+# Longest a single GET /jobs/{id}?wait= request is held open
+JOB_MAX_WAIT_SECONDS = float(os.environ.get("JOB_MAX_WAIT_SECONDS", "60"))
+# Put in front of every job_id: the dispatcher sets it to the worker's name,
+# so a job's URLs keep reaching the worker that has it after flows move
+JOB_ID_PREFIX = os.environ.get("JOB_ID_PREFIX", "")
+
+FINISHED = ("succeeded", "failed", "cancelled")
+
+
+class JobQueueFull(Exception):
+    """Raised by JobQueue.submit when JOB_QUEUE_SIZE jobs are already waiting."""
+
+
+class JobStore:
+    """
+    Job records in SQLite: status, input, result and timings. Every state
+    change is written through, so a job's result outlives the request that
+    submitted it (and the client that stopped waiting for it).
+    """
+
+    def __init__(self, path: str = JOBS_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, flow_id TEXT NOT NULL, status TEXT NOT NULL,"
+            " input TEXT NOT NULL, result TEXT, error TEXT,"
+            " created_at REAL NOT NULL, started_at REAL, finished_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def _row(row) -> Dict[str, Any]:
+        job_id, flow_id, status, payload, result, error, created_at, started_at, finished_at = row
+        return {
+            "job_id": job_id,
+            "flow_id": flow_id,
+            "status": status,
+            "input": json.loads(payload),
+            "result": json.loads(result) if result is not None else None,
+            "error": error,
+            "created_at": created_at,
+            "started_at": started_at,
+            "finished_at": finished_at,
+        }
+
+    def create(self, flow_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        job_id = JOB_ID_PREFIX + uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, flow_id, status, input, created_at) VALUES (?, ?, 'queued', ?, ?)",
+                (job_id, flow_id, json.dumps(payload), time.time()),
+            )
+            self._conn.commit()
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, flow_id, status, input, result, error, created_at, started_at, finished_at"
+                " FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return self._row(row) if row else None
+
+    def start(self, job_id: str) -> bool:
+        """Marks a queued job as running; False if it was cancelled meanwhile."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = ? WHERE id = ? AND status = 'queued'",
+                (time.time(), job_id),
+            )
+            self._conn.commit()
+            return cursor.rowcount == 1
+
+    def finish(self, job_id: str, status: str, result: Any = None, error: Optional[str] = None) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+                (status, json.dumps(result, default=str) if result is not None else None, error,
+                 time.time(), job_id),
+            )
+            self._conn.commit()
+
+    def cancel_queued(self, job_id: str) -> bool:
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status = 'queued'",
+                (time.time(), job_id),
+            )
+            self._conn.commit()
+            return cursor.rowcount == 1
+
+    def recover(self) -> List[str]:
+        """
+        After a restart: jobs that were running when the server stopped are
+        failed (a run is not resumed half-way), queued ones are returned so
+        they can be queued again, oldest first.
+        """
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'failed', error = 'Interrupted: the server stopped during the run.',"
+                " finished_at = ? WHERE status = 'running'", (time.time(),)
+            )
+            self._conn.commit()
+            rows = self._conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def purge(self, max_age: float = JOB_RETENTION_SECONDS) -> int:
+        """Deletes finished jobs older than max_age seconds."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?", (time.time() - max_age,)
+            )
+            self._conn.commit()
+            return cursor.rowcount
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return dict(rows)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class JobQueue:
+    """
+    Runs submitted jobs in the background on the server's event loop: a
+    fixed number of workers take jobs from a bounded queue. 'run' is called
+    with the job's flow_id and input and returns the job's result.
+    """
+
+    def __init__(self, run: Callable[[str, Dict[str, Any]], Awaitable[Any]], path: str = JOBS_DB_PATH,
+                 workers: int = JOB_WORKERS, max_queued: int = JOB_QUEUE_SIZE):
+        self._run = run
+        self.path = path
+        self.store: Optional[JobStore] = None
+        self._workers = max(1, workers)
+        self.max_queued = max_queued
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._running: Dict[str, asyncio.Task] = {}
+        self._cancelled: set = set()
+        self._waiters: Dict[str, asyncio.Event] = {}
+        self._last_purge = 0.0
+
+    def start(self) -> None:
+        """
+        Opens the job database and starts the workers on the running event
+        loop, re-queueing jobs left from a previous run.
+        """
+        self.store = JobStore(self.path)
+        self._queue = asyncio.Queue()
+        for job_id in self.store.recover():
+            self._queue.put_nowait(job_id)
+        self._purge()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self._workers)]
+        print(f"📋 Job queue started with {self._workers} worker(s), {self._queue.qsize()} job(s) recovered.")
+
+    async def shutdown(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.store is not None:
+            self.store.close()
+
+    def submit(self, flow_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Records a job and queues it; raises JobQueueFull if the queue is at
+        its limit. Like cancel(), call it from the event loop's thread.
+        """
+        if self._queue.qsize() >= self.max_queued:
+            raise JobQueueFull(f"{self._queue.qsize()} jobs are already waiting.")
+        job = self.store.create(flow_id, payload)
+        self._queue.put_nowait(job["job_id"])
+        return job
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """The job once it has finished, or as it is after 'timeout' seconds."""
+        job = self.store.get(job_id)
+        if job is None or job["status"] in FINISHED or timeout <= 0:
+            return job
+        event = self._waiters.setdefault(job_id, asyncio.Event())
+        # The job may have finished (and notified) before the event was registered
+        job = self.store.get(job_id)
+        if job["status"] in FINISHED:
+            self._waiters.pop(job_id, None)
+            return job
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.store.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Cancels a queued or running job; finished jobs are returned unchanged."""
+        if self.store.cancel_queued(job_id):
+            self._notify(job_id)
+        elif job_id in self._running:
+            self._cancelled.add(job_id)
+            self._running[job_id].cancel()
+        return self.store.get(job_id)
+
+    def _notify(self, job_id: str) -> None:
+        event = self._waiters.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+    def _purge(self) -> None:
+        now = time.time()
+        if now - self._last_purge >= 60:
+            self._last_purge = now
+            self.store.purge()
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._execute(job_id)
+            finally:
+                self._queue.task_done()
+                self._purge()
+
+    async def _execute(self, job_id: str) -> None:
+        # SQLite writes here are one short indexed statement each: done inline
+        if not self.store.start(job_id):
+            return  # Cancelled while queued
+        job = self.store.get(job_id)
+        task = asyncio.create_task(self._run(job["flow_id"], job["input"]))
+        self._running[job_id] = task
+        try:
+            result = await task
+        except asyncio.CancelledError:
+            if job_id not in self._cancelled:
+                # The server is shutting down; recover() fails the job on the next start
+                raise
+            self.store.finish(job_id, "cancelled", error="Cancelled by request.")
+        except Exception as e:
+            self.store.finish(job_id, "failed", error=getattr(e, "detail", None) or str(e))
+        else:
+            self.store.finish(job_id, "succeeded", result=result)
+        finally:
+            self._running.pop(job_id, None)
+            self._cancelled.discard(job_id)
+        self._notify(job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self._workers,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "running": len(self._running),
+            "max_queued": self.max_queued,
+            "by_status": self.store.counts() if self.store is not None else {},
+        }
@@ -1,55 +1,254 @@
+import asyncio
+import hashlib
 import os
-from langchain_openai import ChatOpenAI, AzureChatOpenAI
-from langchain_groq import ChatGroq
+import threading
+import weakref
+import httpx
+from llm_factory.rate_limits import rate_limiter
+from llm_factory.response_cache import response_cache
 
-def init_chat_model(**kwargs):
+# The provider SDKs (langchain_openai, langchain_groq) take over a second to
+# import, so they are imported on first use: the server starts without them
+# and only the flows that need a provider pay for it, once.
+
+# --- Shared connection pools ---
+# One sync + one async httpx client per (provider, endpoint), shared by every
+# model on that endpoint. Credentials are sent per request, so pools never
+# need to be split by API key.
+LLM_MAX_CONNECTIONS = int(os.environ.get("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE = int(os.environ.get("LLM_MAX_KEEPALIVE", "20"))
+# Longest a single LLM request may take (the SDKs' own default is 10 minutes)
+LLM_TIMEOUT = float(os.environ.get("LLM_TIMEOUT", "60"))
+
+# Credential names used when a node does not set its own value
+PROVIDER_KEY_NAMES = {
+    "OpenAI": "OPENAI_API_KEY",
+    "Groq": "GROQ_API_KEY",
+    "Azure": "AZURE_OPENAI_API_KEY",
+}
+
+DEFAULT_ENDPOINTS = {
+    "OpenAI": "https://api.openai.com/v1",
+    "Groq": "https://api.groq.com",
+}
+
+_lock = threading.Lock()
+_http_pools = {}  # (provider, endpoint) -> (httpx.Client, httpx.AsyncClient)
+# (provider, model, endpoint, api_version, credential hash) -> chat model.
+# Weak: a model lives as long as a loaded agent uses it, so evicting or
+# replacing a flow (GraphCache) releases its model too.
+_models = weakref.WeakValueDictionary()
+
+
+class _LoopLocalTransport(httpx.AsyncBaseTransport):
+    """
+    Async transport keeping one connection pool per event loop. A model's
+    async client is fixed when it is built, but its connections must not
+    outlive the loop that opened them (e.g. one asyncio.run per CLI turn).
+    """
+
+    def __init__(self, limits):
+        self._limits = limits
+        self._transports = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _transport(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            transport = self._transports.get(loop)
+            if transport is None:
+                transport = httpx.AsyncHTTPTransport(limits=self._limits)
+                self._transports[loop] = transport
+        return transport
+
+    async def handle_async_request(self, request):
+        return await self._transport().handle_async_request(request)
+
+    async def aclose(self):
+        with self._lock:
+            transport = self._transports.pop(asyncio.get_running_loop(), None)
+        if transport is not None:
+            await transport.aclose()
+
+    def transports(self):
+        with self._lock:
+            return list(self._transports.values())
+
+
+def _http_pool(provider, endpoint):
+    key = (provider, endpoint)
+    pool = _http_pools.get(key)
+    if pool is None:
+        limits = httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_KEEPALIVE,
+        )
+        pool = (
+            httpx.Client(limits=limits),
+            httpx.AsyncClient(transport=_LoopLocalTransport(limits)),
+        )
+        _http_pools[key] = pool
+    return pool
+
+
+def _credential_id(api_key):
+    # Keys are only used to tell pools apart, so never keep them in the clear
+    return hashlib.sha256((api_key or "").encode()).hexdigest()[:16]
+
+
+def init_chat_model(credentials=None, **kwargs):
     """
     Factory function to initialize a chat model based on the provider.
-    Sets the appropriate environment variables for the model to auto-detect.
+
+    'credentials' is the flow's CredentialContext (any mapping works); it
+    fills in the API key, Azure endpoint and API version when the node does
+    not set them. Without it, the process environment is read instead.
+    Credentials are passed to the client explicitly (never via os.environ),
+    and models are pooled: flows using the same provider, model, endpoint
+    and credential share one client and its connection pool.
+
+    'cache' (the agent node's setting) turns on the exact-match response
+    cache for this flow only; see llm_factory/response_cache.py. Requests
+    that reach the provider go through the model's LLM_RATE_LIMITS token
+    bucket, if it has one (llm_factory/rate_limits.py).
     """
-    
+    credentials = os.environ if credentials is None else credentials
+
     provider = kwargs.get("provider")
     model_name = kwargs.get("model")
-    api_key = kwargs.get("API_key")
+    api_key = kwargs.get("API_key") or credentials.get(PROVIDER_KEY_NAMES.get(provider, ""))
 
     if not provider:
         raise ValueError("LLM node 'data' must include a 'provider' field.")
 
+    if provider == "Fake":
+        # Offline scripted model for benchmarks and tests: no key, no connections
+        from llm_factory.fake_chat_model import FakeToolCallingChatModel
+        model = FakeToolCallingChatModel(
+            model=model_name or "fake",
+            script=kwargs.get("script"),
+            latency_ms=float(kwargs.get("latency_ms") or 0),
+            rate_limiter=rate_limiter(provider, model_name or "fake"),
+        )
+        return _with_cache(model, model_name or "fake", kwargs.get("cache"))
+
+    api_version = kwargs.get("API_Version")
+    if provider == "Azure":
+        api_version = api_version or credentials.get("OPENAI_API_VERSION")
+        endpoint = kwargs.get("Azure_Endpoint") or credentials.get("AZURE_OPENAI_ENDPOINT")
+    else:
+        # Optional 'Base_URL' points OpenAI/Groq at a compatible endpoint (proxy, gateway...)
+        endpoint = kwargs.get("Base_URL") or DEFAULT_ENDPOINTS.get(provider)
+
+    if provider == "Azure" and not all([api_version, endpoint]):
+        raise ValueError("Azure provider requires 'API_Version' and 'Azure_Endpoint'.")
+    if provider not in ("OpenAI", "Groq", "Azure"):
+        raise ValueError(f"Unsupported provider: '{provider}'. Supported: OpenAI, Azure, Groq, Fake")
+    if not api_key:
+        # Fail here rather than let the client fall back to os.environ
+        raise ValueError(f"No API key for provider '{provider}': set 'API_key' on the LLM node or {PROVIDER_KEY_NAMES[provider]}.")
+
+    key = (provider, model_name, endpoint, api_version, _credential_id(api_key))
+    with _lock:
+        model = _models.get(key)
+        if model is None:
+            http_client, http_async_client = _http_pool(provider, endpoint)
+            model = _build_chat_model(
+                provider, model_name, api_key, endpoint, api_version,
+                http_client, http_async_client
+            )
+            _models[key] = model
+    return _with_cache(model, model_name, kwargs.get("cache"))
+
+
+def _with_cache(model, model_name, cache_config):
+    cache = response_cache(model_name, cache_config)
+    if cache is None:
+        return model
+    # The pooled model is shared with other flows: give this flow a shallow
+    # copy (same clients and connection pool) with its own cache
+    return model.model_copy(update={"cache": cache})
+
+
+def _build_chat_model(provider, model_name, api_key, endpoint, api_version,
+                      http_client, http_async_client):
     if provider == "OpenAI":
-        # Set the environment variable for OpenAI
-        os.environ["OPENAI_API_KEY"] = api_key
+        from langchain_openai import ChatOpenAI
         return ChatOpenAI(
             model=model_name,
-            temperature=0
-            # Client will auto-read "OPENAI_API_KEY"
+            temperature=0,
+            timeout=LLM_TIMEOUT,
+            api_key=api_key,
+            base_url=endpoint,
+            http_client=http_client,
+            http_async_client=http_async_client,
+            rate_limiter=rate_limiter(provider, model_name)
         )
-        
+
     elif provider == "Groq":
-        # Set the environment variable for Groq
-        os.environ["GROQ_API_KEY"] = api_key
+        from langchain_groq import ChatGroq
         return ChatGroq(
             model=model_name,
-            temperature=0
-            # Client will auto-read "GROQ_API_KEY"
+            temperature=0,
+            timeout=LLM_TIMEOUT,
+            api_key=api_key,
+            base_url=endpoint,
+            http_client=http_client,
+            http_async_client=http_async_client,
+            rate_limiter=rate_limiter(provider, model_name)
         )
-        
-    elif provider == "Azure":
-        api_version = kwargs.get("API_Version")
-        azure_endpoint = kwargs.get("Azure_Endpoint")
-        
-        if not all([api_version, azure_endpoint]):
-            raise ValueError("Azure provider requires 'API_Version' and 'Azure_Endpoint'.")
-
-        # Set environment variables for the Azure client
-        os.environ["AZURE_OPENAI_API_KEY"] = api_key
-        os.environ["AZURE_OPENAI_ENDPOINT"] = azure_endpoint
-        os.environ["OPENAI_API_VERSION"] = api_version
-            
+
+    else:  # Azure
+        from langchain_openai import AzureChatOpenAI
         return AzureChatOpenAI(
             model=model_name,
-            temperature=0
-            # Client will auto-read the AZURE_... variables
+            temperature=0,
+            timeout=LLM_TIMEOUT,
+            api_key=api_key,
+            azure_endpoint=endpoint,
+            api_version=api_version,
+            http_client=http_client,
+            http_async_client=http_async_client,
+            rate_limiter=rate_limiter(provider, model_name)
         )
-        
-    else:
-        raise ValueError(f"Unsupported provider: '{provider}'. Supported: OpenAI, Azure, Groq")
\ No newline at end of file
+
+
+def _live_connections(transport):
+    # httpx does not expose its pool publicly; count what the transport holds
+    pool = getattr(transport, "_pool", None)
+    return len(getattr(pool, "connections", []))
+
+
+def pool_stats():
+    """
+    Reports how many chat models and connection pools are alive,
+    and how many connections those pools currently hold.
+    """
+    with _lock:
+        return {
+            "models": len(_models),
+            "http_pools": len(_http_pools),
+            "connections": sum(
+                _live_connections(sync_client._transport)
+                + sum(_live_connections(t) for t in async_client._transport.transports())
+                for sync_client, async_client in _http_pools.values()
+            ),
+        }
+
+
+async def aclose_pools():
+    """Closes the running event loop's connections in the shared async pools (call before clear_pools)."""
+    with _lock:
+        pools = list(_http_pools.values())
+    for _, async_client in pools:
+        await async_client.aclose()
+
+
+def clear_pools():
+    """Drops every pooled model and closes the shared sync connection pools."""
+    with _lock:
+        pools = list(_http_pools.values())
+        _http_pools.clear()
+        _models.clear()
+    for sync_client, _ in pools:
+        sync_client.close()
@@ -0,0 +1,91 @@
+import asyncio
+import json
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+# Placeholder argument per JSON schema type, for tools called without scripted args
+_PLACEHOLDERS = {"string": "test", "integer": 1, "number": 1.0, "boolean": True, "array": [], "object": {}}
+
+
+class FakeToolCallingChatModel(BaseChatModel):
+    """
+    Deterministic, offline chat model (provider "Fake") for benchmarks and tests.
+
+    'script' lists the tool calls of each turn, e.g.
+    [[{"name": "get_weather", "args": {"location": "sf"}}], []]. A turn is
+    counted as one model call since the last user message; once the script
+    runs out the model answers with the content of the last tool result.
+    Without a script, the first turn calls every bound tool once (in
+    parallel) with placeholder arguments. 'latency_ms' simulates the
+    provider's response time.
+    """
+
+    model: str = "fake"
+    script: Optional[List[List[Dict[str, Any]]]] = None
+    latency_ms: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-tool-calling"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model": self.model}
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any):
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    def _default_turn(self, tools: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        calls = []
+        for tool in tools:
+            function = tool["function"]
+            schema = function.get("parameters", {})
+            properties = schema.get("properties", {})
+            args = {
+                name: _PLACEHOLDERS.get(properties.get(name, {}).get("type"), "test")
+                for name in schema.get("required", [])
+            }
+            calls.append({"name": function["name"], "args": args})
+        return calls
+
+    def _respond(self, messages: List[BaseMessage], tools: Optional[List[Dict[str, Any]]]) -> AIMessage:
+        turn = 0
+        for message in reversed(messages):
+            if isinstance(message, HumanMessage):
+                break
+            if isinstance(message, AIMessage):
+                turn += 1
+
+        script = self.script if self.script is not None else [self._default_turn(tools or [])]
+        calls = script[turn] if turn < len(script) else []
+        usage = {"input_tokens": sum(len(str(m.content)) // 4 + 1 for m in messages), "output_tokens": 0}
+
+        if calls:
+            tool_calls = [
+                {"name": call["name"], "args": call.get("args", {}), "id": f"call_{turn}_{i}"}
+                for i, call in enumerate(calls)
+            ]
+            usage["output_tokens"] = len(json.dumps(tool_calls)) // 4 + 1
+            usage["total_tokens"] = usage["input_tokens"] + usage["output_tokens"]
+            return AIMessage(content="", tool_calls=tool_calls, usage_metadata=usage)
+
+        last_tool = next((m for m in reversed(messages) if isinstance(m, ToolMessage)), None)
+        content = f"Done: {last_tool.content}" if last_tool is not None else "Done."
+        usage["output_tokens"] = len(content) // 4 + 1
+        usage["total_tokens"] = usage["input_tokens"] + usage["output_tokens"]
+        return AIMessage(content=content, usage_metadata=usage)
+
+    def _generate(self, messages, stop=None, run_manager=None, tools=None, **kwargs) -> ChatResult:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages, tools))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, tools=None, **kwargs) -> ChatResult:
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages, tools))])
@@ -0,0 +1,105 @@
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from langchain_core.rate_limiters import InMemoryRateLimiter
+
+# Token-bucket limits on LLM requests, per "provider/model" or per provider,
+# as JSON: {"OpenAI/gpt-4o": 5, "Groq": {"requests_per_second": 2, "burst": 4}}
+LLM_RATE_LIMITS = os.environ.get("LLM_RATE_LIMITS", "")
+
+_limiters: Dict[str, "TokenBucket"] = {}
+_lock = threading.Lock()
+
+
+class TokenBucket(InMemoryRateLimiter):
+    """
+    LangChain's in-memory token bucket, starting full (so a burst up to its
+    size goes through at once) and counting requests and time spent waiting.
+    Chat models call it on every request that misses the response cache.
+    """
+
+    def __init__(self, requests_per_second: float, burst: float = 1):
+        super().__init__(requests_per_second=requests_per_second, check_every_n_seconds=0.05,
+                         max_bucket_size=max(1, burst))
+        self.available_tokens = self.max_bucket_size
+        self.requests = 0
+        self.throttled = 0
+        self.wait_seconds = 0.0
+
+    def _record(self, waited: float) -> None:
+        with self._consume_lock:
+            self.requests += 1
+            if waited >= self.check_every_n_seconds:
+                self.throttled += 1
+                self.wait_seconds += waited
+
+    def acquire(self, *, blocking: bool = True) -> bool:
+        start = time.monotonic()
+        acquired = super().acquire(blocking=blocking)
+        self._record(time.monotonic() - start)
+        return acquired
+
+    async def aacquire(self, *, blocking: bool = True) -> bool:
+        start = time.monotonic()
+        acquired = await super().aacquire(blocking=blocking)
+        self._record(time.monotonic() - start)
+        return acquired
+
+
+def _parse(value: str) -> Dict[str, Dict[str, float]]:
+    if not value:
+        return {}
+    try:
+        limits = {}
+        for key, setting in json.loads(value).items():
+            if not isinstance(setting, dict):
+                setting = {"requests_per_second": setting}
+            limits[key] = {
+                "requests_per_second": float(setting["requests_per_second"]),
+                "burst": float(setting.get("burst", 1)),
+            }
+        return limits
+    except (ValueError, TypeError, KeyError, AttributeError):
+        print(f"⚠️  Warning: Ignoring LLM_RATE_LIMITS={value!r}: expected a JSON object of "
+              "'provider' or 'provider/model' -> requests per second.")
+        return {}
+
+
+_limits = _parse(LLM_RATE_LIMITS)
+
+
+def rate_limiter(provider: str, model: Optional[str]) -> Optional[TokenBucket]:
+    """
+    The process-wide bucket for a provider's model: its "provider/model"
+    entry in LLM_RATE_LIMITS, else the provider's (shared by all its models).
+    """
+    key = f"{provider}/{model}"
+    if key not in _limits:
+        key = provider
+        if key not in _limits:
+            return None
+    with _lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = TokenBucket(**_limits[key])
+            _limiters[key] = limiter
+        return limiter
+
+
+def rate_limit_stats() -> Dict[str, Any]:
+    """Requests, throttled requests and total wait per configured bucket."""
+    with _lock:
+        limiters = dict(_limiters)
+    return {
+        key: {
+            "requests_per_second": limiter.requests_per_second,
+            "burst": limiter.max_bucket_size,
+            "requests": limiter.requests,
+            "throttled": limiter.throttled,
+            "wait_seconds": round(limiter.wait_seconds, 3),
+        }
+        for key, limiter in limiters.items()
+    }
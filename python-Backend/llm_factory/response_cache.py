@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, Optional
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumpd, load
+
+from agent_runtime.tool_cache import MISSING, MemoryStore, SQLiteStore
+
+LLM_CACHE_PATH = os.environ.get("LLM_CACHE_PATH", "llm_cache.sqlite3")
+
+# Message fields that are not part of what the model sees
+_NOT_SENT = ("id", "usage_metadata", "response_metadata")
+
+_stores: Dict[str, Any] = {}
+_stats: Dict[str, Dict[str, int]] = {}
+_lock = threading.Lock()
+
+
+def _get_store(backend: str, max_entries: int):
+    """Process-wide store per backend, shared by every flow that enables the cache."""
+    if backend not in ("memory", "sqlite"):
+        raise ValueError(f"Unsupported LLM cache backend: '{backend}'. Supported: memory, sqlite")
+    with _lock:
+        store = _stores.get(backend)
+        if store is None:
+            if backend == "sqlite":
+                store = SQLiteStore(max_entries, path=LLM_CACHE_PATH, table="llm_cache")
+            else:
+                store = MemoryStore(max_entries)
+            _stores[backend] = store
+        else:
+            store.max_entries = max(store.max_entries, max_entries)
+        return store
+
+
+def _record(model: str, outcome: str) -> None:
+    with _lock:
+        counters = _stats.setdefault(model, {"hits": 0, "misses": 0})
+        counters[outcome] += 1
+
+
+class ResponseCache(BaseCache):
+    """
+    Exact-match cache of chat model responses (LangChain cache interface).
+
+    LangChain calls it with the serialised message list as 'prompt' and the
+    model's configuration, including bound tool schemas, as 'llm_string'; an
+    entry is reused only when both match exactly. Models here run at
+    temperature 0, so a hit is the answer the provider would have given.
+
+    The key leaves out each message's 'id', 'usage_metadata' and
+    'response_metadata': they are never sent to the provider, and differ
+    between a fresh response and the same response served from the cache.
+    Entries are namespaced by model name (the store is process-wide), and
+    clear() removes this model's entries.
+    """
+
+    def __init__(self, model: str, ttl: float = 3600, max_entries: int = 1024, backend: str = "memory"):
+        self.model = model
+        self.ttl = ttl
+        self.backend = backend
+        self._store = _get_store(backend, max_entries)
+
+    def _key(self, prompt: str, llm_string: str) -> str:
+        # Drop the fields the provider never sees (see the class docstring)
+        try:
+            messages = json.loads(prompt)
+            for message in messages:
+                for field in _NOT_SENT:
+                    message.get("kwargs", {}).pop(field, None)
+            prompt = json.dumps(messages, sort_keys=True)
+        except (ValueError, TypeError, AttributeError):
+            pass
+        return f"{self.model}:" + hashlib.sha256(f"{llm_string}\0{prompt}".encode()).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        value = self._store.get(self._key(prompt, llm_string))
+        if value is MISSING:
+            _record(self.model, "misses")
+            return None
+        _record(self.model, "hits")
+        # Memory entries are the generations themselves; SQLite holds their serialised form
+        return load(value, allowed_objects="core") if self.backend == "sqlite" else value
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        value = dumpd(return_val) if self.backend == "sqlite" else return_val
+        self._store.set(self._key(prompt, llm_string), value, self.ttl)
+
+    # Lookups are a dict read or one indexed SQLite query: not worth a thread hop
+    async def alookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        return self.lookup(prompt, llm_string)
+
+    async def aupdate(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        self.update(prompt, llm_string, return_val)
+
+    def clear(self, **kwargs: Any) -> None:
+        """Drops this model's entries from the shared store."""
+        self._store.clear(f"{self.model}:")
+
+    async def aclear(self, **kwargs: Any) -> None:
+        self.clear()
+
+
+def response_cache(model: str, config: Any) -> Optional[ResponseCache]:
+    """
+    The cache for an agent node's 'cache' setting: true for the defaults, or
+    {"ttl": seconds, "max_entries": N, "backend": "memory" | "sqlite"}.
+    """
+    if not config:
+        return None
+    if not isinstance(config, dict):
+        config = {}
+    return ResponseCache(
+        model,
+        ttl=float(config.get("ttl", 3600)),
+        max_entries=int(config.get("max_entries", 1024)),
+        backend=config.get("backend", "memory"),
+    )
+
+
+def cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters per model, and the number of entries in each store."""
+    with _lock:
+        return {
+            "models": {model: dict(counters) for model, counters in _stats.items()},
+            "stores": {backend: len(store) for backend, store in _stores.items()},
+        }
@@ -1,68 +1,338 @@
+import asyncio
 import json
 import copy
+import hashlib
 import re
 import os
 import shutil
-import sys
-import importlib.util
-from jinja2 import Environment, FileSystemLoader, select_autoescape
+import linecache
+import time
+import types
+import weakref
+from jinja2 import Environment, FileSystemLoader, Undefined, select_autoescape
 from dotenv import load_dotenv
 
 # --- FastAPI & Pydantic Imports ---
+import anyio.from_thread
 import uvicorn
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+from pydantic import BaseModel, Field
 from typing import Dict, Any, List, Optional
+from contextlib import asynccontextmanager, contextmanager
+
+from graph_cache import GraphCache, GraphLease, current_rss_bytes
+from single_flight import KeyedLock, SingleFlight
+import metrics
+from metrics import MetricsCallbackHandler
+from generation_cache import GenerationCache, generator_fingerprint, workflow_content_hash
+from component_registry import ComponentRegistry, COMPONENT_DIRS
+from agent_runtime import http_clients, tool_cache
+from llm_factory import chat_models, rate_limits, response_cache
+from checkpoints import close_checkpointers, get_checkpointer, thread_key
+from warmup import UsageLog, Warmup, WARMUP_FLOWS, USAGE_LOG_FLUSH_INTERVAL, select_flows
+from jobs import JobQueue, JobQueueFull, JOB_MAX_WAIT_SECONDS
+from admission import AdmissionController, AdmissionRejected, AdmissionSlot
+from agent_runtime.tool_cache import CACHEABLE_METHODS
+from agent_runtime.deadlines import DeadlineExceeded, run_deadline, with_deadline
+from langgraph.errors import GraphRecursionError
 
 # --- Pydantic Models for API ---
 
 class RunInput(BaseModel):
-    """Pydantic model for the user's message to the agent."""
+    """
+    Pydantic model for the user's message to the agent. With a 'thread_id'
+    the message continues that conversation, stored server-side.
+    'timeout' (seconds) and 'max_steps' bound the run; both default to
+    the server's RUN_TIMEOUT_SECONDS and RUN_MAX_STEPS.
+    """
     message: str
+    thread_id: Optional[str] = None
+    timeout: Optional[float] = Field(default=None, gt=0)
+    max_steps: Optional[int] = Field(default=None, ge=1)
+
+class WarmupInput(BaseModel):
+    """Pydantic model for a warm-up request: explicit flows, or the N most recently used."""
+    flow_ids: Optional[List[str]] = None
+    limit: Optional[int] = Field(default=None, ge=0)
+
+class BatchRunInput(BaseModel):
+    """Pydantic model for a batch of messages run against the same agent."""
+    inputs: List[RunInput]
+    max_concurrency: Optional[int] = Field(default=None, ge=1)
 
 # --- App Initialization ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Start serving right away; flows selected by WARMUP_FLOWS load in the background
+    warmup.start(select_flows(BASE_PROJECT_DIR, usage_log, WARMUP_FLOWS))
+    flusher = asyncio.create_task(flush_usage_log())
+    # Workers for background jobs; jobs queued before a restart run again
+    jobs.start()
+    yield
+    flusher.cancel()
+    await jobs.shutdown()
+    warmup.shutdown()
+    usage_log.flush()
+    # Close the pooled HTTP connections shared by the agents' tools and chat models
+    await http_clients.aclose_clients()
+    http_clients.close_clients()
+    await chat_models.aclose_pools()
+    chat_models.clear_pools()
+    close_checkpointers()
+
 app = FastAPI(
     title="LangGraph Agent Generator & Runner",
-    description="API to dynamically generate and run LangGraph agents."
+    description="API to dynamically generate and run LangGraph agents.",
+    lifespan=lifespan
 )
 
+# Load the root .env: server settings, plus default keys that flows may fall
+# back to (read-only, see agent_runtime/credentials.py)
+load_dotenv()
+
 # --- Agent Cache ---
-# This will store compiled graphs in memory, mapped by their flow_id
-graphs_cache: Dict[str, Any] = {}
+# This will store compiled graphs in memory, mapped by their flow_id.
+# It is an LRU bounded by entry count and (optionally) an approximate byte budget.
+GRAPH_CACHE_MAX_ENTRIES = int(os.environ.get("GRAPH_CACHE_MAX_ENTRIES", "256"))
+GRAPH_CACHE_MAX_BYTES = int(os.environ.get("GRAPH_CACHE_MAX_BYTES", "0")) # 0 = no byte budget
+graphs_cache = GraphCache(max_entries=GRAPH_CACHE_MAX_ENTRIES, max_bytes=GRAPH_CACHE_MAX_BYTES)
+# Rendered agent sources keyed by the workflow's content hash, so unchanged
+# workflows skip enrich/render even after their graph was evicted
+GENERATION_CACHE_MAX_ENTRIES = int(os.environ.get("GENERATION_CACHE_MAX_ENTRIES", "1024"))
+# Longest an edit to the template or component library goes unnoticed by /generate
+GENERATOR_RESCAN_SECONDS = float(os.environ.get("GENERATOR_RESCAN_SECONDS", "2"))
+generation_cache = GenerationCache(max_entries=GENERATION_CACHE_MAX_ENTRIES)
+
+# --- Request Coalescing ---
+# Concurrent cold loads of a flow (and identical /generate calls) share one
+# run, and a load never overlaps a /generate of the same flow.
+flow_flights = SingleFlight()
+flow_locks = KeyedLock()
+# When each flow was last used (picks what to warm up after a restart)
+usage_log = UsageLog()
+
+# --- Admission Control ---
+# Global and per-flow limits on runs executing at once; runs over the limit
+# wait in a bounded queue, and get a 429 when it is full or the wait is too long
+admission = AdmissionController()
+
+# --- Metrics ---
+# Cache counters are kept by the caches themselves and read at scrape time
+metrics.REGISTRY.register(metrics.CounterFunc(
+    "agent_graph_cache_requests_total", "Graph cache lookups by result.",
+    lambda: {(result,): graphs_cache.stats()[result] for result in ("hits", "misses")}, ["result"]))
+metrics.REGISTRY.register(metrics.Gauge(
+    "agent_graph_cache_hit_ratio", "Share of graph cache lookups that were hits.",
+    lambda: {(): graphs_cache.stats()["hit_rate"]}))
+metrics.REGISTRY.register(metrics.Gauge(
+    "agent_graph_cache_entries", "Flows currently loaded.", lambda: {(): len(graphs_cache)}))
+metrics.REGISTRY.register(metrics.Gauge(
+    "agent_graph_cache_bytes", "Approximate memory of the loaded flows.", lambda: {(): graphs_cache.total_bytes}))
+metrics.REGISTRY.register(metrics.CounterFunc(
+    "agent_generation_cache_requests_total", "Rendered-source cache lookups by result.",
+    lambda: {(result,): generation_cache.stats()[result] for result in ("hits", "misses")}, ["result"]))
+metrics.REGISTRY.register(metrics.CounterFunc(
+    "agent_llm_cache_requests_total", "LLM response cache lookups by model and result.",
+    lambda: {(model, result): count for model, counters in response_cache.cache_stats()["models"].items()
+             for result, count in counters.items()}, ["model", "result"]))
+metrics.REGISTRY.register(metrics.Gauge(
+    "agent_llm_cache_entries", "Cached LLM responses per backend.",
+    lambda: {(backend,): count for backend, count in response_cache.cache_stats()["stores"].items()}, ["backend"]))
+metrics.REGISTRY.register(metrics.Gauge(
+    "agent_admission_runs", "Runs holding a slot, and runs waiting for one.",
+    lambda: {("running",): admission.stats()["running"], ("waiting",): admission.stats()["waiting"]}, ["state"]))
+metrics.REGISTRY.register(metrics.CounterFunc(
+    "agent_admission_requests_total", "Runs admitted and rejected (429) by admission control.",
+    lambda: {(outcome,): admission.stats()[outcome] for outcome in ("admitted", "rejected")}, ["outcome"]))
+metrics.REGISTRY.register(metrics.CounterFunc(
+    "agent_llm_rate_limit_wait_seconds_total", "Time LLM requests spent waiting for their token bucket.",
+    lambda: {(bucket,): stats["wait_seconds"] for bucket, stats in rate_limits.rate_limit_stats().items()}, ["bucket"]))
+metrics.REGISTRY.register(metrics.Gauge(
+    "agent_jobs", "Background jobs waiting for a worker or running.",
+    lambda: {(state,): jobs.stats()[state] for state in ("queued", "running")}, ["state"]))
 BASE_PROJECT_DIR = "generated_agents"
+# Report not-ready on /ready until the startup warm-up finishes
+WARMUP_BLOCKS_READY = os.environ.get("WARMUP_BLOCKS_READY", "0").lower() in ("1", "true", "yes")
+# Write each generated agent out as a standalone project (needed to reload it after a restart)
+EXPORT_AGENT_PROJECTS = os.environ.get("EXPORT_AGENT_PROJECTS", "1").lower() not in ("0", "false", "no")
+# Worker threads a sync agent's ToolNode uses to run one turn's tool calls in parallel
+TOOL_CALL_WORKERS = int(os.environ.get("TOOL_CALL_WORKERS", "16"))
+# Default number of batch items run at once by /execute/batch
+BATCH_MAX_CONCURRENCY = int(os.environ.get("BATCH_MAX_CONCURRENCY", "8"))
+# Time budget of one run (0 = none) and its cap on graph steps (LangGraph's recursion limit)
+RUN_TIMEOUT_SECONDS = float(os.environ.get("RUN_TIMEOUT_SECONDS", "0"))
+RUN_MAX_STEPS = int(os.environ.get("RUN_MAX_STEPS", "25"))
+# How often async runs check whether their client is still connected
+DISCONNECT_CHECK_INTERVAL = float(os.environ.get("DISCONNECT_CHECK_INTERVAL", "0.5"))
 
 
 # ----------------------------------------------------------------------
 #  AGENT GENERATION LOGIC
 # ----------------------------------------------------------------------
 
-IMPORT_REGEX = re.compile(r"^\s*(import\s.+|from\s.+\simport\s.+)", re.MULTILINE)
+# Component library index: every file is parsed once with `ast`
+# and only re-read when its mtime changes
+component_registry = ComponentRegistry("component_library")
+component_registry.scan()
 
-def load_code_from_library(component_type, name):
+# Jinja environment, built once. Templates are compiled on first use
+# and recompiled automatically if the file changes (auto_reload).
+jinja_env = Environment(
+    loader=FileSystemLoader('.'), # Assumes template is in the root
+    autoescape=select_autoescape(),
+    auto_reload=True
+)
+
+def python_literal(value: Any) -> str:
     """
-    Helper function to read code from files.
+    Jinja filter: renders JSON-like data as a Python literal ('True'/'None'
+    rather than tojson's 'true'/'null'). Undefined values become None.
     """
-    imports = []
-    full_code = ""
-    filepath = "" # Define filepath in outer scope
-    try:
-        if component_type == "tool_function":
-            filepath = f"component_library/tool_functions/{name}.py"
-        elif component_type == "condition":
-            filepath = f"component_library/conditions/{name}.py"
-        else:
-            return f"# ERROR: Unknown component type '{component_type}'", []
+    def convert(v):
+        if isinstance(v, Undefined):
+            return None
+        if isinstance(v, dict):
+            return {k: convert(item) for k, item in v.items()}
+        if isinstance(v, (list, tuple)):
+            return [convert(item) for item in v]
+        return v
+    return repr(convert(value))
 
-        with open(filepath, 'r') as f:
-            full_code = f.read()
-            imports = IMPORT_REGEX.findall(full_code)
-            
-        return full_code, imports
+jinja_env.filters["python_literal"] = python_literal
+
+def load_code_from_library(component_type, name):
+    """
+    Helper function to get a component's code and imports from the registry.
+    """
+    if component_type not in COMPONENT_DIRS:
+        return f"# ERROR: Unknown component type '{component_type}'", []
 
-    except FileNotFoundError:
+    component = component_registry.get(component_type, name)
+    if component is None:
+        filepath = component_registry.path_for(component_type, name)
         print(f"⚠️  Warning: Code file for '{name}' not found at {filepath}.")
         return f"# ERROR: Code for '{name}' not found.", []
 
+    return component.source, list(component.imports)
+
+
+def load_tool_from_library(name, async_mode=False):
+    """
+    Loads a tool function, preferring its async variant for async agents.
+    Tools without an async variant fall back to the sync version, which
+    ToolNode runs in a worker thread.
+    """
+    if async_mode and component_registry.has("async_tool_function", name):
+        return load_code_from_library("async_tool_function", name)
+    return load_code_from_library("tool_function", name)
+
+
+def agent_code_logic(node: Dict[str, Any], tool_names: List[str], async_mode: bool, suffix: str = "") -> str:
+    """
+    Source of an agent node's function ('agent' + suffix), which calls the
+    node's model ('model_with_tools' + suffix) on its bounded history.
+    """
+    prompt_tools_list = ""
+    for i, tool_name in enumerate(tool_names, 1):
+        prompt_tools_list += f"\\n{i}. {tool_name}()" 
+    
+    original_message = node["data"].get("system_message", "You are a helpful assistant.")
+    system_message = (
+        f"{original_message} "
+        f"You have access to the following tools:\\n{prompt_tools_list}\\n"
+        "You must decide which one is most appropriate."
+    )
+    
+    node["data"]["system_message_generated"] = system_message
+    agent_def = "async def" if async_mode else "def"
+    if async_mode:
+        # Cancelled when the run's deadline passes
+        model_call = f"response = await with_deadline(model_with_tools{suffix}.ainvoke(messages))"
+    else:
+        # A blocking call cannot be interrupted: no new call once the deadline has passed
+        model_call = f"check_deadline()\n    response = model_with_tools{suffix}.invoke(messages)"
+    history_policy = {
+        key: int(value) for key, value in (node["data"].get("history") or {}).items()
+        if key in ("max_messages", "max_tokens") and value is not None
+    }
+    return f"""
+from langgraph.graph import MessagesState
+from agent_runtime.deadlines import check_deadline, with_deadline
+from agent_runtime.history import trim_history
+
+# Prompt budget from the agent node's 'history' (unset: HISTORY_MAX_* defaults)
+HISTORY_POLICY{suffix} = {history_policy!r}
+
+{agent_def} agent{suffix}(state: MessagesState):
+    \"\"\"Node to call the LLM.\"\"\"
+    system_prompt = {{
+        "role": "system",
+        "content": \"\"\"{system_message}\"\"\"
+    }}
+    # Bounded prompt: only the most recent turns that fit the history budget
+    messages = [system_prompt] + trim_history(state["messages"], **HISTORY_POLICY{suffix})
+    {model_call}
+    return {{"messages": [response]}}
+"""
+
+
+def plan_agent_branches(agent_nodes: List[Dict[str, Any]], agent_tools: Dict[str, List[str]],
+                        edges: List[Dict[str, Any]], function_definitions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Lays out a multi-agent graph: each agent is a branch, and an agent -> agent
+    edge means the target runs after the source. Agents that do not depend on
+    each other run in the same superstep (concurrently); an agent with several
+    sources waits for all of them. Agents are returned in dependency order.
+    """
+    agent_ids = [node["id"] for node in agent_nodes]
+    sources = {agent_id: [] for agent_id in agent_ids}
+    conditions = {}
+    for edge in edges:
+        if edge["source"] in sources and edge["target"] in sources:
+            if edge["source"] not in sources[edge["target"]]:
+                sources[edge["target"]].append(edge["source"])
+        elif edge["source"] in sources and edge.get("type") == "conditional":
+            conditions.setdefault(edge["source"], edge["condition"])
+
+    # Topological order (Kahn); agent -> agent cycles have no place to join
+    order, ready = [], [agent_id for agent_id in agent_ids if not sources[agent_id]]
+    remaining = {agent_id: len(sources[agent_id]) for agent_id in agent_ids}
+    while ready:
+        agent_id = ready.pop(0)
+        order.append(agent_id)
+        for target in agent_ids:
+            if agent_id in sources[target]:
+                remaining[target] -= 1
+                if remaining[target] == 0:
+                    ready.append(target)
+    if len(order) != len(agent_ids):
+        cyclic = [agent_id for agent_id in agent_ids if agent_id not in order]
+        raise ValueError(f"Agent edges form a cycle between {cyclic}; multi-agent graphs must be acyclic.")
+
+    has_default = any(func["name"] == "should_continue" for func in function_definitions)
+    by_id = {node["id"]: node for node in agent_nodes}
+    plan = []
+    for agent_id in order:
+        condition = None
+        if agent_tools[agent_id]:
+            condition = conditions.get(agent_id, "should_continue")
+            if condition == "should_continue" and not has_default:
+                code_string, _ = load_code_from_library("condition", "should_continue")
+                function_definitions.append({"name": "should_continue", "type": "condition", "code": code_string})
+                has_default = True
+        plan.append({
+            "id": agent_id,
+            "index": by_id[agent_id]["data"]["index"],
+            "node": by_id[agent_id],
+            "tools": agent_tools[agent_id],
+            "condition": condition,
+            "sources": sources[agent_id],
+            "sink": not any(agent_id in sources[other] for other in agent_ids),
+        })
+    return plan
+
 
 def enrich_json(minimal_json):
     """
@@ -71,8 +341,14 @@ def enrich_json(minimal_json):
     """
     
     complete_json = copy.deepcopy(minimal_json)
+    # Async agents get 'async def' agent/tool nodes and are run with ainvoke
+    async_mode = bool(complete_json.get("metadata", {}).get("async_mode", False))
     all_tool_imports = set()
     tool_api_keys = {} 
+    tool_timeouts = {} # Per-tool request timeouts (seconds), from the node's 'timeout'
+    tool_caches = {} # Per-tool result cache settings, from the node's 'cache'
+    tool_limits = {} # Per-tool concurrent call limits, from the node's 'max_concurrency'
+    max_parallel_tool_calls = {} # Per agent: cap on one turn's parallel tool calls, from the agent node
     base_tool_code = set()
     
     # --- 1. Find all Tool Definitions and Agent IDs ---
@@ -92,7 +368,7 @@ def enrich_json(minimal_json):
             
             if base_tool_name:
                 # Dynamic API tool
-                code_string, imports_list = load_code_from_library("tool_function", base_tool_name)
+                code_string, imports_list = load_tool_from_library(base_tool_name, async_mode)
                 all_tool_imports.update(imports_list)
                 base_tool_code.add(code_string) 
 
@@ -105,11 +381,14 @@ def enrich_json(minimal_json):
                 ])
                 llm_arg_names = [arg.split(":")[0].strip() for arg in llm_args_list]
                 wrapper_signature = ", ".join(llm_args_list)
+                wrapper_def = "async def" if async_mode else "def"
+                wrapper_call = "await api_request" if async_mode else "api_request"
 
                 generated_code = f"""
 from typing import Optional, Dict, Any
+from agent_runtime.deadlines import tool_timeout
 
-def {func_name}({wrapper_signature}):
+{wrapper_def} {func_name}({wrapper_signature}):
     \"\"\"Dynamically generated tool. Calls {base_tool_name}\"\"\"
     final_args = {static_args_str}
     if "url" in final_args:
@@ -119,13 +398,15 @@ def {func_name}({wrapper_signature}):
     if "params" in {llm_arg_names} and params: final_args["params"] = params
     if "data" in {llm_arg_names} and data: final_args["data"] = data
     if "headers" in {llm_arg_names} and headers: final_args["headers"] = headers
-    return api_request(**final_args)
+    # The node's 'timeout' (or 30s), never more than what is left of the run's deadline
+    final_args["timeout"] = tool_timeout(TOOL_TIMEOUTS.get("{func_name}", 30.0))
+    return {wrapper_call}(**final_args)
 """
                 node["data"]["code"] = generated_code
                 
             else:
                 # Normal tool
-                code_string, imports_list = load_code_from_library("tool_function", func_name)
+                code_string, imports_list = load_tool_from_library(func_name, async_mode)
                 node["data"]["code"] = code_string
                 all_tool_imports.update(imports_list)
 
@@ -139,12 +420,40 @@ def {func_name}({wrapper_signature}):
             tool_node_ids.add(node["id"])
             
             # Load 'component_library/tool_functions/tavily.py'
-            code_string, imports_list = load_code_from_library("tool_function", "tavily")
+            code_string, imports_list = load_tool_from_library("tavily", async_mode)
             node["data"]["code"] = code_string
             all_tool_imports.update(imports_list)
 
         elif node.get("type") == "agent":
             agent_node_ids.add(node["id"])
+            if node["data"].get("max_parallel_tool_calls"):
+                max_parallel_tool_calls[node["id"]] = int(node["data"]["max_parallel_tool_calls"])
+
+        if func_name and node["data"].get("max_concurrency"):
+            tool_limits[func_name] = int(node["data"]["max_concurrency"])
+
+        if func_name and node["data"].get("timeout"):
+            # Library tools look their timeout up under their own name
+            timeout_key = "tavily" if node.get("type") == "tavily" else func_name
+            tool_timeouts[timeout_key] = float(node["data"]["timeout"])
+
+        if func_name and node["data"].get("cache"):
+            cache_cfg = node["data"]["cache"]
+            if not isinstance(cache_cfg, dict):
+                cache_cfg = {} # "cache": true -> defaults
+            cache_unsafe = bool(cache_cfg.get("cache_unsafe_methods", False))
+            static_method = str(node["data"].get("static_args", {}).get("method", "GET")).upper()
+            if node["data"].get("base_tool") and static_method not in CACHEABLE_METHODS and not cache_unsafe:
+                print(f"⚠️  Warning: Not caching '{func_name}': {static_method} is not idempotent.")
+            else:
+                tool_caches[func_name] = {
+                    "ttl": float(cache_cfg.get("ttl", 300)),
+                    "max_entries": int(cache_cfg.get("max_entries", 1024)),
+                    "backend": cache_cfg.get("backend", "memory"),
+                    # Same-named tools with different code (e.g. API wrappers) get separate entries
+                    "scope": hashlib.sha256(node["data"].get("code", "").encode()).hexdigest()[:16],
+                    "cache_unsafe_methods": cache_unsafe,
+                }
 
         # Add API keys if present
         if "API_key" in node["data"]:
@@ -158,33 +467,27 @@ def {func_name}({wrapper_signature}):
             tool_funcs_available.append(func_name)
 
     # ... (Step 2: Enrich Agent Nodes) ...
-    for node in complete_json.get("nodes", []):
-        if node.get("type") == "agent":
-            prompt_tools_list = ""
-            for i, tool_name in enumerate(tool_funcs_available, 1):
-                prompt_tools_list += f"\\n{i}. {tool_name}()" 
-            
-            original_message = node["data"].get("system_message", "You are a helpful assistant.")
-            system_message = (
-                f"{original_message} "
-                f"You have access to the following tools:\\n{prompt_tools_list}\\n"
-                "You must decide which one is most appropriate."
-            )
-            
-            node["data"]["system_message_generated"] = system_message
-            node["data"]["code_logic"] = f"""
-from langgraph.graph import MessagesState
+    # Several agents: each becomes its own branch (model, tools and loop)
+    agent_nodes = [node for node in complete_json.get("nodes", []) if node.get("type") == "agent"]
+    multi_agent = len(agent_nodes) > 1
+    agent_tools = {node["id"]: [] for node in agent_nodes}
+    tool_names = {
+        node["id"]: node["data"]["function_name"] for node in complete_json.get("nodes", [])
+        if node["id"] in tool_node_ids
+    }
+    for edge in complete_json.get("edges", []):
+        agent_id, tool_id = edge["source"], edge["target"]
+        if agent_id in tool_node_ids:
+            agent_id, tool_id = tool_id, agent_id
+        if agent_id in agent_tools and tool_id in tool_names and tool_names[tool_id] not in agent_tools[agent_id]:
+            agent_tools[agent_id].append(tool_names[tool_id])
 
-def agent(state: MessagesState):
-    \"\"\"Node to call the LLM.\"\"\"
-    system_prompt = {{
-        "role": "system",
-        "content": \"\"\"{system_message}\"\"\"
-    }}
-    messages = [system_prompt] + state["messages"]
-    response = model_with_tools.invoke(messages)
-    return {{"messages": [response]}}
-"""
+    for index, node in enumerate(agent_nodes, 1):
+        suffix = f"_{index}" if multi_agent else ""
+        node["data"]["index"] = index
+        node["data"]["code_logic"] = agent_code_logic(
+            node, agent_tools[node["id"]] if multi_agent else tool_funcs_available, async_mode, suffix
+        )
 
     # --- 3. Compile Graph - Force a single "tools" node ---
     tool_executor_id = "tools"
@@ -250,215 +553,852 @@ def should_continue(state: MessagesState):
                 "name": condition_name, "type": "condition", "code": code_string
             })
     
+    if multi_agent:
+        complete_json["metadata"]["agents"] = plan_agent_branches(
+            agent_nodes, agent_tools, complete_json["edges"], complete_json["metadata"]["function_definitions"]
+        )
+        complete_json["metadata"]["sink_agents"] = [
+            agent["id"] for agent in complete_json["metadata"]["agents"] if agent["sink"]
+        ]
+        all_tool_imports.add("from agent_runtime.branches import branch_input, branch_output, merge_branches")
+
+    if tool_caches:
+        all_tool_imports.add("from agent_runtime.tool_cache import cached_tool")
+    if tool_limits or max_parallel_tool_calls:
+        all_tool_imports.add("from agent_runtime.tool_limits import limit_concurrency, limit_turn, tool_limit, turn_limit")
+
     complete_json["metadata"]["imports"] = list(all_tool_imports)
     complete_json["metadata"]["tool_api_keys"] = tool_api_keys
+    complete_json["metadata"]["tool_timeouts"] = tool_timeouts
+    complete_json["metadata"]["tool_caches"] = tool_caches
+    complete_json["metadata"]["tool_limits"] = tool_limits
+    complete_json["metadata"]["max_parallel_tool_calls"] = max_parallel_tool_calls
+    complete_json["metadata"]["tool_call_workers"] = TOOL_CALL_WORKERS
     complete_json["metadata"]["base_tool_code_blocks"] = list(base_tool_code)
+    complete_json["metadata"]["async_mode"] = async_mode
     return complete_json
 
-def generate_agent_project(minimal_data: Dict[str, Any], flow_id: str) -> Dict[str, Any]:
+def render_agent_source(minimal_data: Dict[str, Any]) -> Dict[str, Any]:
     """
-    Takes JSON data and a flow_id, and builds the agent project directory.
-    The directory will be named after the flow_id.
+    Enriches the graph JSON and renders it through the Jinja template.
+    Returns the agent.py source as a string; nothing is written to disk.
     """
-    global BASE_PROJECT_DIR
-    output_dir = os.path.join(BASE_PROJECT_DIR, flow_id)
     logs = []
 
-    # 1. Clean and create output dir
+    # 1. Enrich the JSON
     try:
-        if os.path.exists(output_dir):
-            logs.append(f"Cleaning old directory: {output_dir}/")
-            shutil.rmtree(output_dir)
-        os.makedirs(output_dir)
-        logs.append(f"Created new directory: {output_dir}/")
-    except Exception as e:
-        logs.append(f"❌ Error cleaning/creating directory: {e}")
-        return {"status": "error", "logs": logs, "error": str(e)}
-
-    # 2. Setup Jinja
-    env = Environment(
-        loader=FileSystemLoader('.'), # Assumes template is in the root
-        autoescape=select_autoescape()
-    )
-
-    # 3. Enrich the JSON
-    try:
-        complete_data = enrich_json(minimal_data)
+        with metrics.GENERATE_PHASE_SECONDS.time(phase="enrich"):
+            complete_data = enrich_json(minimal_data)
         logs.append("✅ Enriched JSON with code library.")
     except Exception as e:
         logs.append(f"❌ Error during JSON enrichment: {e}")
         return {"status": "error", "logs": logs, "error": str(e)}
-    
-    # 4. Copy dependencies
+
+    # 2. Render agent.py
     try:
-        if os.path.exists("llm_factory"):
-            shutil.copytree("llm_factory", os.path.join(output_dir, "llm_factory"))
-        if os.path.exists(".env"):
-            shutil.copy(".env", os.path.join(output_dir, ".env"))
-        if os.path.exists("requirement.txt"):
-            shutil.copy("requirement.txt", os.path.join(output_dir, "requirements.txt"))
-        logs.append("✅ Copied dependencies.")
+        with metrics.GENERATE_PHASE_SECONDS.time(phase="render"):
+            template = jinja_env.get_template('langgraph_template.py.j2')
+            rendered = template.render(complete_data)
+        logs.append("✅ Rendered agent source.")
     except Exception as e:
-        logs.append(f"⚠️  Warning: Failed to copy dependencies: {e}")
+        logs.append(f"❌ Error during template rendering: {e}")
+        return {"status": "error", "logs": logs, "error": str(e)}
+
+    return {"status": "success", "logs": logs, "source": rendered}
+
+def export_agent_project(flow_id: str, source: str) -> Dict[str, Any]:
+    """
+    Writes a rendered agent as a standalone project directory named after the flow_id
+    (agent.py plus copies of llm_factory, agent_runtime, .env and requirements.txt).
+    The project is built in a temporary directory and then swapped into place,
+    so readers never see a half-written agent.py.
+    """
+    global BASE_PROJECT_DIR
+    output_dir = os.path.join(BASE_PROJECT_DIR, flow_id)
+    staging_dir = f"{output_dir}.tmp-{os.getpid()}-{time.monotonic_ns()}"
+    logs = []
 
-    # 5. Render and Save agent.py
     try:
-        template = env.get_template('langgraph_template.py.j2')
-        rendered = template.render(complete_data)
+        os.makedirs(staging_dir)
+
+        # 1. Copy dependencies
+        try:
+            for package_dir in ("llm_factory", "agent_runtime"):
+                if os.path.exists(package_dir):
+                    shutil.copytree(
+                        package_dir, os.path.join(staging_dir, package_dir),
+                        ignore=shutil.ignore_patterns("__pycache__")
+                    )
+            if os.path.exists(".env"):
+                shutil.copy(".env", os.path.join(staging_dir, ".env"))
+            if os.path.exists("requirement.txt"):
+                shutil.copy("requirement.txt", os.path.join(staging_dir, "requirements.txt"))
+            logs.append("✅ Copied dependencies.")
+        except Exception as e:
+            logs.append(f"⚠️  Warning: Failed to copy dependencies: {e}")
+
+        # 2. Save agent.py
+        with open(os.path.join(staging_dir, "agent.py"), 'w', encoding='utf-8') as out:
+            out.write(source)
+
+        # 3. Swap the new project in place of the old one
+        old_dir = None
+        if os.path.exists(output_dir):
+            old_dir = f"{staging_dir}.old"
+            os.rename(output_dir, old_dir)
+        os.rename(staging_dir, output_dir)
+        if old_dir:
+            shutil.rmtree(old_dir, ignore_errors=True)
+
         output_path = os.path.join(output_dir, "agent.py")
-        
-        with open(output_path, 'w', encoding='utf-8') as out:
-            out.write(rendered)
-        
         logs.append(f"🎉 Success! Agent file written to: {output_path}")
-        
+
     except Exception as e:
-        logs.append(f"❌ Error during template rendering: {e}")
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        logs.append(f"❌ Error writing agent project: {e}")
         return {"status": "error", "logs": logs, "error": str(e)}
-    
+
     return {"status": "success", "logs": logs, "agent_path": output_path}
 
+def generate_agent_project(minimal_data: Dict[str, Any], flow_id: str) -> Dict[str, Any]:
+    """
+    Takes JSON data and a flow_id, and builds the agent project directory.
+    The directory will be named after the flow_id.
+    """
+    result = render_agent_source(minimal_data)
+    if result["status"] != "success":
+        return result
+
+    export = export_agent_project(flow_id, result["source"])
+    export["logs"] = result["logs"] + export["logs"]
+    return export
+
 
 # ----------------------------------------------------------------------
 #  AGENT RUNNER LOGIC
 # ----------------------------------------------------------------------
 
-def load_graph(flow_id: str) -> bool:
+def compile_agent_module(flow_id: str, source: str, origin: str) -> types.ModuleType:
     """
-    Dynamically imports the compiled graph for a given flow_id
-    from its directory (e.g., generated_agents/68fb5d0e.../agent.py)
-    and stores it in the cache.
+    Compiles rendered agent source into a fresh module namespace.
+    The agent imports llm_factory and friends from this process,
+    so no per-flow directory or sys.path entry is needed.
     """
-    global graphs_cache
-    global BASE_PROJECT_DIR
-    
-    agent_dir = os.path.join(BASE_PROJECT_DIR, flow_id)
-    agent_path = os.path.join(agent_dir, "agent.py")
-    app_dir = os.path.abspath(agent_dir)
-    
-    if not os.path.exists(agent_path):
-        print(f"Agent file not found for flow_id {flow_id} at: {agent_path}")
-        return False
+    module = types.ModuleType(f"agent_{flow_id}")
+    module.__file__ = origin
+    # Let tracebacks show the generated source even when it was never written to disk
+    linecache.cache[origin] = (len(source), None, source.splitlines(True), origin)
+    code = compile(source, origin, "exec")
+    exec(code, module.__dict__)
+    return module
 
-    # Add the generated app dir to the Python path
-    if app_dir not in sys.path:
-        sys.path.insert(0, app_dir)
-        
+def instrument_graph(graph, flow_id: str):
+    """
+    Returns the graph with a MetricsCallbackHandler attached, so every run
+    reports node, tool and LLM timings without callers passing callbacks.
+    """
+    return graph.with_config(callbacks=[MetricsCallbackHandler(flow_id)])
+
+def load_graph_from_source(flow_id: str, source: str, origin: Optional[str] = None,
+                           content_hash: Optional[str] = None) -> bool:
+    """
+    Compiles a rendered agent and stores its 'graph' object in the cache.
+    """
+    load_source = "disk" if origin else "generate"
+    origin = origin or f"<agent_{flow_id}>"
+    start = time.perf_counter()
+    rss_before = current_rss_bytes()
+    loaded = False
     try:
-        # Load the .env file from the *agent's directory*
-        env_path = os.path.join(app_dir, ".env")
-        if os.path.exists(env_path):
-            load_dotenv(env_path, override=True) # Override to load specific keys
-            print(f"✅ Loaded .env file from {env_path}")
-
-        # Import the module
-        spec = importlib.util.spec_from_file_location(f"agent_{flow_id}", agent_path)
-        if spec is None:
-            print(f"Could not create module spec for {agent_path}")
-            return False
-            
-        agent_module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(agent_module)
-        
+        agent_module = compile_agent_module(flow_id, source, origin)
+
         # Get the 'graph' object from the loaded module
         if hasattr(agent_module, "graph"):
-            graphs_cache[flow_id] = agent_module.graph
+            rss_after = current_rss_bytes()
+            size_bytes = rss_after - rss_before if rss_before is not None and rss_after is not None else 0
+            graphs_cache.put(
+                flow_id, instrument_graph(agent_module.graph, flow_id), module=agent_module,
+                load_seconds=time.perf_counter() - start, size_bytes=size_bytes,
+                content_hash=content_hash
+            )
+            loaded = True
             print(f"✅ Graph for flow_id {flow_id} loaded successfully into cache.")
             return True
         else:
-            print(f"❌ 'graph' object not found in agent.py for flow_id {flow_id}")
+            print(f"❌ 'graph' object not found in agent source for flow_id {flow_id}")
             return False
-            
+
     except Exception as e:
+        # Any version already in the cache keeps serving
         print(f"Error loading graph {flow_id}: {e}")
         import traceback
         traceback.print_exc()
-        if flow_id in graphs_cache:
-            del graphs_cache[flow_id]
         return False
     finally:
-        # Clean up path
-        if sys.path[0] == app_dir:
-            sys.path.pop(0)
+        metrics.GRAPH_LOAD_SECONDS.observe(
+            time.perf_counter() - start, source=load_source, status="ok" if loaded else "error"
+        )
+        if not loaded:
+            graphs_cache.record_load_failure(time.perf_counter() - start)
+
+def load_graph(flow_id: str) -> bool:
+    """
+    Loads the exported agent for a given flow_id from its directory
+    (e.g., generated_agents/68fb5d0e.../agent.py) and stores it in the cache.
+    """
+    global BASE_PROJECT_DIR
+    
+    agent_dir = os.path.join(BASE_PROJECT_DIR, flow_id)
+    agent_path = os.path.join(agent_dir, "agent.py")
+    
+    if not os.path.exists(agent_path):
+        print(f"Agent file not found for flow_id {flow_id} at: {agent_path}")
+        return False
+
+    try:
+        # The agent reads its own .env through its CredentialContext,
+        # so nothing is loaded into (or overridden in) os.environ here
+        with open(agent_path, 'r', encoding='utf-8') as f:
+            source = f.read()
+    except Exception as e:
+        print(f"Error reading agent {agent_path}: {e}")
+        return False
+
+    return load_graph_from_source(flow_id, source, origin=os.path.abspath(agent_path))
+
+def acquire_graph(flow_id: str) -> GraphLease:
+    """
+    Leases the current version of a flow for one run, loading it from disk
+    if needed. The run keeps this version even if /generate swaps in a new
+    one meanwhile; release the lease (or use it as a context manager) when
+    the run is over. Raises a 404 if the agent has never been generated.
+    """
+    usage_log.touch(flow_id)
+    lease = graphs_cache.lease(flow_id)
+
+    # If not in cache, try to load it
+    if lease is None:
+        compiled_graph = load_compiled_graph(flow_id)
+        # The miss is already counted
+        lease = graphs_cache.lease(flow_id, count=False) or GraphLease(compiled_graph)
+    return lease
+
+def load_compiled_graph(flow_id: str):
+    """
+    Loads a flow that missed the cache and returns its graph,
+    raising a 404 if the agent has never been generated.
+    Concurrent callers for the same flow share a single load.
+    """
+    return flow_flights.do(("load", flow_id), lambda: _load_compiled_graph(flow_id))
+
+def _load_compiled_graph(flow_id: str):
+    with flow_locks.hold(flow_id):
+        # A /generate (or an earlier load) may have finished while we waited
+        compiled_graph = graphs_cache.peek(flow_id)
+        if compiled_graph is not None:
+            return compiled_graph
+
+        if not load_graph(flow_id):
+            raise HTTPException(
+                status_code=404, 
+                detail=f"Agent (flow_id: {flow_id}) not found. Please call /generate first."
+            )
+        return graphs_cache.peek(flow_id) # Get it again after loading
+
+async def aacquire_graph(flow_id: str) -> GraphLease:
+    """
+    Async version of acquire_graph. Cold loads import the agent module,
+    so they run in a worker thread instead of blocking the event loop; other
+    requests for the same flow wait for that load without holding a thread.
+    """
+    usage_log.touch(flow_id)
+    lease = graphs_cache.lease(flow_id)
+    if lease is None:
+        compiled_graph = await flow_flights.ado(("load", flow_id), lambda: _load_compiled_graph(flow_id))
+        lease = graphs_cache.lease(flow_id, count=False) or GraphLease(compiled_graph)
+    return lease
+
+# Background loading of flows at startup (and on POST /warmup)
+warmup = Warmup(load_compiled_graph)
+
+async def run_job(flow_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Runs one background job, like /execute/async: the result is what that
+    endpoint would have returned.
+    """
+    input = RunInput(**payload)
+    # Jobs are already bounded by their own queue: wait for a run slot as long as it takes
+    with await admission.aacquire(flow_id, bounded=False), await aacquire_graph(flow_id) as compiled_graph:
+        graph, state, config = run_target(compiled_graph, flow_id, input)
+        with run_deadline(run_budget(input)), rollback_unanswered(graph, config):
+            try:
+                out = await with_deadline(graph.ainvoke(state, config))
+            except Exception as e:
+                if stop_reason(e):
+                    metrics.RUNS_STOPPED.inc(flow_id=flow_id, reason=stop_reason(e))
+                raise
+    last_message = out["messages"][-1]
+    return {"response": getattr(last_message, "content", str(last_message)), "thread_id": input.thread_id}
+
+# Background executions (POST /workflows/{flow_id}/jobs), kept in SQLite
+jobs = JobQueue(run_job)
+
+async def flush_usage_log():
+    while True:
+        await asyncio.sleep(USAGE_LOG_FLUSH_INTERVAL)
+        await asyncio.to_thread(usage_log.flush)
+
+def format_sse(event: str, data: Any) -> str:
+    """Formats one Server-Sent Event frame."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def message_text(message: Any) -> str:
+    """Returns the text of a message or message chunk (content may be a list of parts)."""
+    content = getattr(message, "content", message)
+    if isinstance(content, list):
+        return "".join(
+            part.get("text", "") if isinstance(part, dict) else str(part) for part in content
+        )
+    return content if isinstance(content, str) else str(content)
+
+# Copies of compiled graphs that persist their state, made once per graph version
+_threaded_graphs = weakref.WeakKeyDictionary()
+
+def run_target(graph, flow_id: str, input: RunInput):
+    """
+    The graph, input state and run config for one message. Without a
+    thread_id the run is stateless; with one it resumes the stored thread,
+    so only the new message is sent and the checkpointer adds the history.
+    """
+    state = {"messages": [{"role": "user", "content": input.message}]}
+    # Caps the agent <-> tools loop (GraphRecursionError past it)
+    config = {"recursion_limit": input.max_steps or RUN_MAX_STEPS}
+    if not input.thread_id:
+        return graph, state, config
+    threaded = _threaded_graphs.get(graph)
+    if threaded is None:
+        threaded = graph.copy({"checkpointer": get_checkpointer()})
+        _threaded_graphs[graph] = threaded
+    config["configurable"] = {"thread_id": thread_key(flow_id, input.thread_id)}
+    return threaded, state, config
+
+@contextmanager
+def rollback_unanswered(graph, config):
+    """
+    Wraps a threaded run: if it fails before any node finished, the thread
+    has only gained the new message. It is put back as it was, so the next
+    turn does not start with two user messages in a row.
+    """
+    if "configurable" not in config:
+        yield
+        return
+    # SQLite reads and writes here are one short statement each: done inline
+    head = graph.checkpointer.get_tuple(config)
+    try:
+        yield
+    except BaseException:
+        # A run checkpoints its input, then the input applied (START); a
+        # third checkpoint means a node finished and the turn is kept
+        latest = graph.checkpointer.get_tuple(config)
+        head_step = head.metadata.get("step", -2) if head is not None else -2
+        if latest is not None and latest.metadata.get("step", 0) <= head_step + 2:
+            if head is None:
+                graph.checkpointer.delete_thread(config["configurable"]["thread_id"])
+            else:
+                graph.update_state(head.config, None, as_node="__copy__")
+        raise
+
+def run_budget(input: RunInput) -> Optional[float]:
+    """The run's time budget in seconds: the tighter of the request's and the server's."""
+    budgets = [budget for budget in (input.timeout, RUN_TIMEOUT_SECONDS) if budget]
+    return min(budgets) if budgets else None
+
+def stop_reason(error: BaseException) -> Optional[str]:
+    """Why a run was stopped early ('deadline', 'step_limit'), or None for other errors."""
+    if isinstance(error, DeadlineExceeded):
+        return "deadline"
+    if isinstance(error, GraphRecursionError):
+        return "step_limit"
+    return None
+
+def run_error(flow_id: str, error: Exception) -> HTTPException:
+    """The HTTP error for a failed run: 504 past its deadline, 500 otherwise."""
+    reason = stop_reason(error)
+    if reason:
+        metrics.RUNS_STOPPED.inc(flow_id=flow_id, reason=reason)
+    if reason == "deadline":
+        return HTTPException(status_code=504, detail=f"Agent run for {flow_id} exceeded its deadline.")
+    import traceback
+    traceback.print_exception(error)
+    return HTTPException(
+        status_code=500,
+        detail=f"Error during agent invocation for {flow_id}: {str(error)}"
+    )
+
+class ClientDisconnected(Exception):
+    """The client of an async run went away; the run was cancelled."""
+
+async def cancel_on_disconnect(request: Request, flow_id: str, awaitable):
+    """
+    Awaits a run, cancelling it (and every LLM and tool call in it) if the
+    client disconnects first, so abandoned runs stop using capacity.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_CHECK_INTERVAL)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                print(f"🔌 Client disconnected: cancelling the run of flow {flow_id}.")
+                metrics.RUNS_STOPPED.inc(flow_id=flow_id, reason="disconnect")
+                raise ClientDisconnected()
+    finally:
+        task.cancel()
+
+async def stream_graph_events(lease: GraphLease, flow_id: str, input: RunInput, slot: AdmissionSlot):
+    """
+    Runs the leased graph with 'astream_events' and translates LangGraph events
+    into SSE frames: node_start/node_end, token, tool_start/tool_end,
+    and a final 'done' (or 'error') event with the last message.
+    The lease and the run's admission slot are released when the stream ends.
+    """
+    final_output = None
+    try:
+        graph, state, config = run_target(lease.graph, flow_id, input)
+        # Runs in the streaming response's task, which serves only this stream
+        with run_deadline(run_budget(input)), rollback_unanswered(graph, config):
+            async for event in graph.astream_events(state, config, version="v2"):
+                kind = event["event"]
+                name = event.get("name")
+                node = event.get("metadata", {}).get("langgraph_node")
+
+                if kind == "on_chat_model_stream":
+                    text = message_text(event["data"]["chunk"])
+                    if text:
+                        yield format_sse("token", {"node": node, "content": text})
+                elif kind == "on_tool_start":
+                    yield format_sse("tool_start", {
+                        "tool": name, "run_id": event["run_id"], "input": event["data"].get("input")
+                    })
+                elif kind == "on_tool_end":
+                    yield format_sse("tool_end", {
+                        "tool": name, "run_id": event["run_id"], "output": message_text(event["data"].get("output"))
+                    })
+                elif kind in ("on_chain_start", "on_chain_end"):
+                    if not event.get("parent_ids"):
+                        # The root run is the graph itself; its end carries the final state
+                        if kind == "on_chain_end":
+                            final_output = event["data"].get("output")
+                    elif name == node:
+                        yield format_sse("node_start" if kind == "on_chain_start" else "node_end", {"node": node})
+
+        response_content = None
+        if isinstance(final_output, dict) and final_output.get("messages"):
+            response_content = message_text(final_output["messages"][-1])
+        yield format_sse("done", {"response": response_content, "thread_id": input.thread_id})
+
+    except Exception as e:
+        yield format_sse("error", {"detail": run_error(flow_id, e).detail})
+    finally:
+        lease.release()
+        slot.release()
 
 # ----------------------------------------------------------------------
 #  API ENDPOINTS
 # ----------------------------------------------------------------------
 
+@app.exception_handler(ClientDisconnected)
+async def client_disconnected(request, exc: ClientDisconnected):
+    """Nobody is left to read the response; 499 (client closed request) for the logs."""
+    return Response(status_code=499)
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected(request, exc: AdmissionRejected):
+    """Runs turned away by admission control: 429, with when to try again."""
+    return JSONResponse(status_code=429, content={"detail": str(exc)},
+                        headers={"Retry-After": str(exc.retry_after)})
+
 @app.post("/generate")
-def generate_agent(graph_def: Dict[str, Any]):
+def generate_agent(graph_def: Dict[str, Any], export: Optional[bool] = None):
     """
-    Endpoint 1: Receives a raw graph JSON, generates the agent project
-    (named by the 'id' field), and loads the new agent into memory.
+    Endpoint 1: Receives a raw graph JSON, compiles the agent in memory
+    (keyed by the 'id' field) and loads it into the cache. The agent is
+    then exported as a project directory unless 'export' is false
+    (defaults to EXPORT_AGENT_PROJECTS).
     """
-    global graphs_cache
-    
     flow_id = graph_def.get("id")
     if not flow_id:
         raise HTTPException(status_code=400, detail="JSON payload must have an 'id' field.")
+    usage_log.touch(flow_id)
 
-    # Clear any old, cached version of this graph
-    graphs_cache.pop(flow_id, None) 
-    
-    # Run the project generation logic
-    result = generate_agent_project(graph_def, flow_id)
+    should_export = EXPORT_AGENT_PROJECTS if export is None else export
+    agent_path = os.path.join(BASE_PROJECT_DIR, flow_id, "agent.py")
+
+    # Key the artifacts on what the workflow does, not how it is laid out
+    content_hash = workflow_content_hash(graph_def, generator_fingerprint(component_registry, max_age=GENERATOR_RESCAN_SECONDS))
+
+    # Unchanged since the last /generate: the loaded graph is already current
+    if graphs_cache.content_hash(flow_id) == content_hash:
+        if not should_export or os.path.exists(agent_path):
+            metrics.GENERATE_REQUESTS.inc(outcome="cached")
+            return {"id": flow_id, "status": "success", "content_hash": content_hash,
+                    "version": graphs_cache.version(flow_id), "cached": True}
+
+    # Identical concurrent requests share one generate; different ones for
+    # the same flow run one at a time (and never overlap a load)
+    result = flow_flights.do(
+        ("generate", flow_id, content_hash, should_export),
+        lambda: _generate_agent(flow_id, graph_def, content_hash, should_export, agent_path),
+    )
+    outcome = "error" if result["status"] != "success" else "cached" if result["cached"] else "generated"
+    metrics.GENERATE_REQUESTS.inc(outcome=outcome)
+    return result
+
+def _generate_agent(flow_id: str, graph_def: Dict[str, Any], content_hash: str,
+                    should_export: bool, agent_path: str) -> Dict[str, Any]:
+    """Renders, loads and exports one flow while holding its lock."""
+    with flow_locks.hold(flow_id):
+        # Re-check: a request we waited for may have generated this exact content
+        if graphs_cache.content_hash(flow_id) == content_hash:
+            if not should_export or os.path.exists(agent_path):
+                return {"id": flow_id, "status": "success", "content_hash": content_hash,
+                        "version": graphs_cache.version(flow_id), "cached": True}
+
+        # Render the agent source (in memory), unless this content was rendered before
+        source = generation_cache.get(content_hash)
+        if source is not None:
+            result = {"status": "success", "logs": [], "source": source}
+        else:
+            result = render_agent_source(graph_def)
+            if result["status"] == "success":
+                generation_cache.put(content_hash, result["source"])
     
-    if result["status"] == "success":
-        # Immediately try to load the new graph
-        if load_graph(flow_id):
-            return {"id": flow_id, "status": "success"}
+        if result["status"] == "success":
+            # Not this flow itself: re-putting its own graph as "shared" would drop its size
+            shared = graphs_cache.find_by_content_hash(content_hash, exclude=flow_id)
+            if shared is not None:
+                # Another flow with identical content is loaded: share its compiled graph
+                graph, module = shared
+                graphs_cache.put(flow_id, instrument_graph(module.graph, flow_id), module=module,
+                                 content_hash=content_hash, shared=True)
+            elif graphs_cache.content_hash(flow_id) != content_hash:
+                # Build the new version next to the current one; it is swapped
+                # in only once it loads, and runs in progress keep the old one
+                with metrics.GENERATE_PHASE_SECONDS.time(phase="import"):
+                    loaded = load_graph_from_source(flow_id, result["source"], content_hash=content_hash)
+                if not loaded:
+                    return {
+                        "id": flow_id,
+                        "status": "error",
+                        "message": f"Agent {flow_id} generated but failed to load. Check server logs."
+                    }
+
+            # Optional export step, only for agents that loaded
+            if should_export:
+                with metrics.GENERATE_PHASE_SECONDS.time(phase="write"):
+                    export_result = export_agent_project(flow_id, result["source"])
+                if export_result["status"] != "success":
+                    print(f"⚠️  Warning: Agent {flow_id} loaded but export failed: {export_result['error']}")
+
+            return {"id": flow_id, "status": "success", "content_hash": content_hash,
+                    "version": graphs_cache.version(flow_id), "cached": False}
         else:
+            # Generation itself failed
             return {
                 "id": flow_id,
                 "status": "error",
-                "message": f"Agent {flow_id} generated but failed to load. Check server logs."
+                "message": result.get("error", "Generation failed. Check server logs.")
             }
-    else:
-        # Generation itself failed
-        return {
-            "id": flow_id,
-            "status": "error",
-            "message": result.get("error", "Generation failed. Check server logs.")
-        }
 
 @app.post("/workflows/{flow_id}/execute")
 def run_agent(flow_id: str, input: RunInput):
     """
     Endpoint 2: Runs the agent specified by 'flow_id' with user input.
+    Agents generated with 'async_mode' are run with 'ainvoke' on the event
+    loop while this request's thread waits for the result.
     """
-    global graphs_cache
-    
-    # Get graph from cache
-    compiled_graph = graphs_cache.get(flow_id)
-    
-    # If not in cache, try to load it
-    if compiled_graph is None:
-        if not load_graph(flow_id):
-            raise HTTPException(
-                status_code=404, 
-                detail=f"Agent (flow_id: {flow_id}) not found. Please call /generate first."
-            )
-        compiled_graph = graphs_cache.get(flow_id) # Get it again after loading
+    # Wait for a run slot (or get a 429) before loading or running anything.
+    # Get graph from cache (or load it); the run keeps this version until it ends
+    with admission.acquire(flow_id):
+        lease = acquire_graph(flow_id)
+        with lease as compiled_graph:
+            return run_sync(flow_id, input, compiled_graph, getattr(lease.module, "ASYNC_MODE", False))
 
+def run_sync(flow_id: str, input: RunInput, compiled_graph, async_mode: bool) -> Dict[str, Any]:
+    """Runs one /execute request on its worker thread."""
     # --- Run the agent ---
     try:
-        state = {"messages": [{"role": "user", "content": input.message}]}
-        
-        # Use synchronous 'invoke'
-        out = compiled_graph.invoke(state)
-        
+        graph, state, config = run_target(compiled_graph, flow_id, input)
+
+        with run_deadline(run_budget(input)), rollback_unanswered(graph, config):
+            if async_mode:
+                # Async nodes cannot be run by 'invoke' (which would fail only after
+                # checkpointing the input): hand the run to the event loop
+                out = anyio.from_thread.run(lambda: with_deadline(graph.ainvoke(state, config)))
+            else:
+                # Use synchronous 'invoke'. Blocking calls cannot be interrupted,
+                # so the deadline stops the run before its next LLM or tool call
+                out = graph.invoke(state, config)
+
         last_message = out["messages"][-1]
         response_content = getattr(last_message, "content", str(last_message))
-        
-        return {"response": response_content}
-        
+
+        return {"response": response_content, "thread_id": input.thread_id}
+
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        raise run_error(flow_id, e)
+
+@app.post("/workflows/{flow_id}/execute/async")
+async def run_agent_async(flow_id: str, input: RunInput, request: Request):
+    """
+    Endpoint 2b: Runs the agent with 'ainvoke' on the event loop, so a run
+    waiting on the LLM or a tool does not hold a threadpool thread.
+    Agents generated with 'async_mode' run fully async; sync agents still
+    work, with their nodes offloaded to worker threads by LangGraph.
+    The run is cancelled when its deadline passes or the client disconnects.
+    """
+    with await admission.aacquire(flow_id), await aacquire_graph(flow_id) as compiled_graph:
+
+        # --- Run the agent ---
+        try:
+            graph, state, config = run_target(compiled_graph, flow_id, input)
+            
+            with run_deadline(run_budget(input)), rollback_unanswered(graph, config):
+                out = await cancel_on_disconnect(request, flow_id, with_deadline(graph.ainvoke(state, config)))
+            
+            last_message = out["messages"][-1]
+            response_content = getattr(last_message, "content", str(last_message))
+            
+            return {"response": response_content, "thread_id": input.thread_id}
+            
+        except ClientDisconnected:
+            raise
+        except Exception as e:
+            raise run_error(flow_id, e)
+
+@app.post("/workflows/{flow_id}/execute/stream")
+async def run_agent_stream(flow_id: str, input: RunInput):
+    """
+    Endpoint 2c: Runs the agent and streams LLM tokens, tool calls and node
+    transitions back as Server-Sent Events while the run is in progress.
+    """
+    # Admit the run and resolve the graph first, so a 429 or a missing agent
+    # is still a plain error response. The stream releases both when it ends
+    # (or the client goes away).
+    slot = await admission.aacquire(flow_id)
+    try:
+        lease = await aacquire_graph(flow_id)
+    except BaseException:
+        slot.release()
+        raise
+
+    def release():
+        lease.release()
+        slot.release()
+
+    return StreamingResponse(
+        stream_graph_events(lease, flow_id, input, slot),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Also covers a stream that never started (release is idempotent)
+        background=BackgroundTask(release)
+    )
+
+@app.post("/workflows/{flow_id}/execute/batch")
+async def run_agent_batch(flow_id: str, batch: BatchRunInput, request: Request):
+    """
+    Endpoint 2d: Runs the agent over a list of inputs concurrently with
+    'abatch'. Results come back in input order; a failing item gets an
+    'error' entry instead of failing the whole batch. Items may continue
+    different threads. Each item is admitted as its own run, so a batch
+    never runs more items at once than the global and per-flow limits
+    leave room for; an item turned away gets an 'error'. Each item's
+    deadline counts from the start of the request; the whole batch is
+    cancelled if the client disconnects.
+    """
+    max_concurrency = batch.max_concurrency or BATCH_MAX_CONCURRENCY
+    if admission.flow_limit(flow_id):
+        max_concurrency = min(max_concurrency, admission.flow_limit(flow_id))
+
+    # The whole batch runs on one version of the flow
+    started = time.monotonic()
+    with await aacquire_graph(flow_id) as compiled_graph:
+        # Items may run on different graphs (threaded or stateless) and have
+        # their own deadlines: one task each, under a shared concurrency cap
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def run_item(item: RunInput):
+            graph, state, config = run_target(compiled_graph, flow_id, item)
+            async with semaphore:
+                with await admission.aacquire(flow_id):
+                    budget = run_budget(item)
+                    with run_deadline(budget - (time.monotonic() - started) if budget else None), \
+                            rollback_unanswered(graph, config):
+                        return await with_deadline(graph.ainvoke(state, config))
+
+        outputs = await cancel_on_disconnect(request, flow_id, asyncio.gather(
+            *(run_item(item) for item in batch.inputs), return_exceptions=True
+        ))
+
+    results = []
+    for item, out in zip(batch.inputs, outputs):
+        if isinstance(out, AdmissionRejected):
+            results.append({"error": f"{out} Retry after {out.retry_after}s."})
+        elif isinstance(out, Exception):
+            results.append({"error": run_error(flow_id, out).detail})
+        else:
+            last_message = out["messages"][-1]
+            results.append({"response": getattr(last_message, "content", str(last_message)),
+                            "thread_id": item.thread_id})
+
+    return {"results": results}
+
+@app.post("/workflows/{flow_id}/jobs", status_code=202)
+async def submit_job(flow_id: str, input: RunInput):
+    """
+    Endpoint 2e: Queues a run of the agent and returns its job id right
+    away. The run happens in the background (at most JOB_WORKERS at once);
+    poll GET /workflows/{flow_id}/jobs/{job_id} for its status and result. Returns a 429 when
+    JOB_QUEUE_SIZE jobs are already waiting. Runs on the event loop: the
+    job queue's asyncio objects must only be touched from there.
+    """
+    if graphs_cache.peek(flow_id) is None and not os.path.exists(os.path.join(BASE_PROJECT_DIR, flow_id, "agent.py")):
         raise HTTPException(
-            status_code=500, 
-            detail=f"Error during agent invocation for {flow_id}: {str(e)}"
+            status_code=404,
+            detail=f"Agent (flow_id: {flow_id}) not found. Please call /generate first."
         )
+    try:
+        return jobs.submit(flow_id, input.model_dump())
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=f"Job queue is full: {e}", headers={"Retry-After": "5"})
+
+@app.get("/workflows/{flow_id}/jobs/{job_id}")
+async def get_job(flow_id: str, job_id: str, wait: float = 0):
+    """
+    Returns a job's status ('queued', 'running', 'succeeded', 'failed' or
+    'cancelled') and, once it succeeded, its 'result'. With 'wait' (seconds,
+    capped at JOB_MAX_WAIT_SECONDS) the request is held until the job finishes
+    or the time is up, so clients can long-poll instead of polling in a loop.
+    """
+    job = await jobs.wait(job_id, min(max(wait, 0), JOB_MAX_WAIT_SECONDS))
+    if job is None or job["flow_id"] != flow_id:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found.")
+    return job
+
+@app.delete("/workflows/{flow_id}/jobs/{job_id}")
+async def cancel_job(flow_id: str, job_id: str):
+    """
+    Cancels a queued or running job (a running one shows "cancelled" once
+    its run has stopped). Finished jobs are returned unchanged.
+    """
+    job = jobs.store.get(job_id)
+    if job is None or job["flow_id"] != flow_id:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found.")
+    return jobs.cancel(job_id)
+
+@app.get("/workflows/{flow_id}/threads/{thread_id}")
+def get_thread(flow_id: str, thread_id: str):
+    """
+    Returns the stored messages of a conversation thread (the full history,
+    not the trimmed window the agent sends to the model).
+    """
+    checkpoint = get_checkpointer().get_tuple({"configurable": {"thread_id": thread_key(flow_id, thread_id)}})
+    if checkpoint is None:
+        raise HTTPException(status_code=404, detail=f"Thread {thread_id} not found for flow {flow_id}.")
+    messages = checkpoint.checkpoint["channel_values"].get("messages", [])
+    return {
+        "id": flow_id,
+        "thread_id": thread_id,
+        "messages": [
+            {"type": message.type, "content": message.content, "tool_calls": getattr(message, "tool_calls", None) or None}
+            for message in messages
+        ],
+    }
+
+@app.delete("/workflows/{flow_id}/threads/{thread_id}")
+def delete_thread(flow_id: str, thread_id: str):
+    """
+    Deletes a conversation thread; its next message starts a new conversation.
+    """
+    get_checkpointer().delete_thread(thread_key(flow_id, thread_id))
+    return {"id": flow_id, "thread_id": thread_id, "deleted": True}
+
+@app.get("/components")
+def list_components():
+    """
+    Lists the component library: imports, function signatures and docstrings.
+    """
+    return {"components": component_registry.list()}
+
+@app.get("/cache/stats")
+def cache_stats():
+    """
+    Reports the graph cache size, byte usage and hit/miss/eviction/load counters.
+    """
+    stats = graphs_cache.stats()
+    stats["generation_cache"] = generation_cache.stats()
+    stats["single_flight"] = flow_flights.stats()
+    stats["http_pools"] = http_clients.pool_stats()
+    stats["llm_pools"] = chat_models.pool_stats()
+    stats["tool_results"] = tool_cache.cache_stats()
+    stats["llm_responses"] = response_cache.cache_stats()
+    stats["warmup"] = warmup.status()
+    stats["jobs"] = jobs.stats()
+    stats["admission"] = admission.stats()
+    stats["llm_rate_limits"] = rate_limits.rate_limit_stats()
+    return stats
+
+@app.get("/metrics")
+def metrics_endpoint():
+    """
+    Prometheus metrics: /generate phases, graph loads, cache hit rate, and
+    per-run, per-node, per-tool and per-model (LLM latency, tokens) timings.
+    """
+    return Response(content=metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.post("/cache/flows/{flow_id}/load")
+async def warm_flow(flow_id: str):
+    """
+    Loads a flow into the cache ahead of its first run (e.g. when the
+    dispatcher moves it to this worker). Raises a 404 if it was never exported.
+    """
+    with await aacquire_graph(flow_id):
+        return {"id": flow_id, "status": "loaded", "version": graphs_cache.version(flow_id)}
+
+@app.delete("/cache/flows/{flow_id}")
+def evict_flow(flow_id: str):
+    """
+    Drops a flow from the cache (e.g. after the dispatcher moved it to another
+    worker). Runs in progress finish first, as with any retired version.
+    """
+    with flow_locks.hold(flow_id):
+        evicted = graphs_cache.pop(flow_id) is not None
+    return {"id": flow_id, "evicted": evicted}
+
+@app.get("/ready")
+def readiness():
+    """
+    Readiness and warm-up progress. The server takes requests while warming
+    up (a flow that is not loaded yet loads on its first request), so this
+    is 200 unless WARMUP_BLOCKS_READY is set and the warm-up is still running.
+    """
+    status = warmup.status()
+    ready = not (WARMUP_BLOCKS_READY and status["state"] == "running")
+    return JSONResponse(status_code=200 if ready else 503, content={"ready": ready, "warmup": status})
+
+@app.post("/warmup")
+def start_warmup(request: WarmupInput):
+    """
+    Loads flows in the background: the given 'flow_ids', or else the
+    'limit' most recently used exported flows (all of them if no limit).
+    """
+    if request.flow_ids is not None:
+        flow_ids = request.flow_ids
+    else:
+        flow_ids = select_flows(BASE_PROJECT_DIR, usage_log, "all" if request.limit is None else str(request.limit))
+    queued = warmup.start(flow_ids)
+    return {"queued": queued, "warmup": warmup.status()}
 
 @app.get("/")
 def read_root():
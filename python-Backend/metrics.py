@@ -0,0 +1,307 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+# Seconds; covers sub-millisecond cache lookups up to multi-minute agent runs
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Monotonic counter, one series per label combination."""
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    """Cumulative histogram (Prometheus semantics), one series per label combination."""
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Iterable[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # key -> (per-bucket counts, +Inf count, sum)
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = [[0] * len(self.buckets), 0, 0.0]
+                self._series[key] = series
+            if i < len(self.buckets):
+                series[0][i] += 1
+            series[1] += 1
+            series[2] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._series.items())
+        lines = []
+        for key, (counts, total, value_sum) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            le = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {total}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(value_sum)}")
+            lines.append(f"{self.name}_count{labels} {total}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Gauge read from a callback at scrape time: fn() -> {label values tuple: value}."""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, fn: Callable[[], Dict[Tuple[str, ...], Optional[float]]],
+                 labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._fn = fn
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(self._fn().items()) if value is not None
+        ]
+
+
+class CounterFunc(Gauge):
+    """Counter read from a callback, for counts kept by another object (e.g. a cache)."""
+    kind = "counter"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.header())
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# --- Generation and loading ---
+GENERATE_PHASE_SECONDS = REGISTRY.register(Histogram(
+    "agent_generate_phase_seconds", "Time spent in each /generate phase (enrich, render, write, import).",
+    ["phase"]))
+GENERATE_REQUESTS = REGISTRY.register(Counter(
+    "agent_generate_requests_total", "/generate requests by outcome (cached, generated, error).",
+    ["outcome"]))
+GRAPH_LOAD_SECONDS = REGISTRY.register(Histogram(
+    "agent_graph_load_seconds", "Time to compile an agent module and build its graph.",
+    ["source", "status"]))
+
+# --- Runs (fed by MetricsCallbackHandler) ---
+GRAPH_RUN_SECONDS = REGISTRY.register(Histogram(
+    "agent_graph_run_seconds", "End-to-end time of one graph run.", ["flow_id", "status"]))
+NODE_SECONDS = REGISTRY.register(Histogram(
+    "agent_node_seconds", "Time per LangGraph node execution.", ["flow_id", "node", "status"]))
+TOOL_SECONDS = REGISTRY.register(Histogram(
+    "agent_tool_seconds", "Time per tool call.", ["flow_id", "tool", "status"]))
+LLM_SECONDS = REGISTRY.register(Histogram(
+    "agent_llm_seconds", "Latency of one chat model call.", ["model", "status"]))
+LLM_TOKENS = REGISTRY.register(Counter(
+    "agent_llm_tokens_total", "Tokens used by chat model calls.", ["model", "type"]))
+RUNS_STOPPED = REGISTRY.register(Counter(
+    "agent_runs_stopped_total", "Runs stopped early, by reason (deadline, step_limit, disconnect).",
+    ["flow_id", "reason"]))
+
+
+def _model_name(serialized: Optional[Dict[str, Any]], metadata: Optional[Dict[str, Any]],
+                invocation_params: Optional[Dict[str, Any]]) -> str:
+    metadata = metadata or {}
+    params = invocation_params or {}
+    kwargs = (serialized or {}).get("kwargs", {})
+    return str(
+        metadata.get("ls_model_name") or params.get("model") or params.get("model_name")
+        or kwargs.get("model") or kwargs.get("model_name") or "unknown"
+    )
+
+
+def _token_usage(response: Any) -> Tuple[int, int]:
+    """(prompt, completion) tokens of an LLMResult, from usage_metadata or llm_output."""
+    prompt = completion = 0
+    found = False
+    for generations in getattr(response, "generations", None) or []:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                found = True
+                prompt += usage.get("input_tokens", 0)
+                completion += usage.get("output_tokens", 0)
+    if not found:
+        usage = (getattr(response, "llm_output", None) or {}).get("token_usage") or {}
+        prompt = usage.get("prompt_tokens", 0)
+        completion = usage.get("completion_tokens", 0)
+    return prompt, completion
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """
+    Records graph, node, tool and LLM timings for one flow.
+    Attached to every compiled graph by main.instrument_graph.
+    """
+
+    # Only takes a lock and updates counters: safe to run on the event loop
+    run_inline = True
+
+    def __init__(self, flow_id: str):
+        self.flow_id = flow_id
+        self._starts: Dict[UUID, Tuple[str, str, float]] = {}  # run_id -> (kind, name, start)
+        self._lock = threading.Lock()
+
+    def _start(self, run_id: UUID, kind: str, name: str) -> None:
+        with self._lock:
+            self._starts[run_id] = (kind, name, time.perf_counter())
+
+    def _end(self, run_id: UUID) -> Optional[Tuple[str, str, float]]:
+        with self._lock:
+            started = self._starts.pop(run_id, None)
+        if started is None:
+            return None
+        kind, name, start = started
+        return kind, name, time.perf_counter() - start
+
+    # --- Graph and nodes ---
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None,
+                       tags=None, metadata=None, **kwargs):
+        name = kwargs.get("name") or (serialized or {}).get("name")
+        node = (metadata or {}).get("langgraph_node")
+        if parent_run_id is None:
+            self._start(run_id, "graph", "")
+        elif node and name == node:
+            self._start(run_id, "node", node)
+
+    def _chain_done(self, run_id: UUID, status: str) -> None:
+        ended = self._end(run_id)
+        if ended is None:
+            return
+        kind, name, seconds = ended
+        if kind == "graph":
+            GRAPH_RUN_SECONDS.observe(seconds, flow_id=self.flow_id, status=status)
+        else:
+            NODE_SECONDS.observe(seconds, flow_id=self.flow_id, node=name, status=status)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._chain_done(run_id, "ok")
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        # Interrupts and routing exceptions also surface here; they are errors
+        # from the node's point of view
+        self._chain_done(run_id, "error")
+
+    # --- Tools ---
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self._start(run_id, "tool", kwargs.get("name") or (serialized or {}).get("name") or "unknown")
+
+    def _tool_done(self, run_id: UUID, status: str) -> None:
+        ended = self._end(run_id)
+        if ended is not None:
+            TOOL_SECONDS.observe(ended[2], flow_id=self.flow_id, tool=ended[1], status=status)
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._tool_done(run_id, "ok")
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._tool_done(run_id, "error")
+
+    # --- Chat models ---
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        self._start(run_id, "llm", _model_name(serialized, metadata, kwargs.get("invocation_params")))
+
+    def on_llm_start(self, serialized, prompts, *, run_id, metadata=None, **kwargs):
+        self._start(run_id, "llm", _model_name(serialized, metadata, kwargs.get("invocation_params")))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        ended = self._end(run_id)
+        if ended is None:
+            return
+        _, model, seconds = ended
+        LLM_SECONDS.observe(seconds, model=model, status="ok")
+        prompt, completion = _token_usage(response)
+        if prompt:
+            LLM_TOKENS.inc(prompt, model=model, type="prompt")
+        if completion:
+            LLM_TOKENS.inc(completion, model=model, type="completion")
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        ended = self._end(run_id)
+        if ended is not None:
+            LLM_SECONDS.observe(ended[2], model=ended[1], status="error")
@@ -0,0 +1,97 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller runs the
+    function, every caller that arrives while it is running waits for and
+    shares its result (or exception). Works from threads and from coroutines.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+        # --- Counters ---
+        self.calls = 0
+        self.shared = 0
+
+    def _join(self, key: Hashable) -> Tuple[Future, bool]:
+        """Returns (future, is_leader) for a key."""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.shared += 1
+                return future, False
+            future = Future()
+            # A running future cannot be cancelled by a waiter that goes away
+            future.set_running_or_notify_cancel()
+            self._calls[key] = future
+            self.calls += 1
+            return future, True
+
+    def _run(self, key: Hashable, future: Future, func: Callable[[], Any]) -> None:
+        try:
+            result = func()
+        except BaseException as exc:
+            future.set_exception(exc)
+        else:
+            future.set_result(result)
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        """Runs func() once per key at a time and returns its result."""
+        future, leader = self._join(key)
+        if leader:
+            self._run(key, future, func)
+        return future.result()
+
+    async def ado(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        """
+        Async version of do(). The (blocking) func runs in a worker thread;
+        waiters do not hold a thread. If the leading request is cancelled
+        (e.g. the client disconnected), the call still completes for the others.
+        """
+        future, leader = self._join(key)
+        if leader:
+            asyncio.get_running_loop().run_in_executor(None, self._run, key, future, func)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"calls": self.calls, "shared": self.shared, "in_flight": len(self._calls)}
+
+
+class KeyedLock:
+    """
+    One lock per key (e.g. per flow_id), created on demand and dropped
+    once nobody holds or waits for it.
+    """
+
+    def __init__(self):
+        self._locks: Dict[Hashable, Tuple[threading.Lock, int]] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def hold(self, key: Hashable):
+        with self._lock:
+            lock, users = self._locks.get(key, (None, 0))
+            if lock is None:
+                lock = threading.Lock()
+            self._locks[key] = (lock, users + 1)
+        try:
+            with lock:
+                yield
+        finally:
+            with self._lock:
+                lock, users = self._locks[key]
+                if users == 1:
+                    del self._locks[key]
+                else:
+                    self._locks[key] = (lock, users - 1)
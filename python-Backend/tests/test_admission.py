@@ -0,0 +1,82 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from admission import AdmissionController, AdmissionRejected
+
+
+def test_limits_and_release():
+    controller = AdmissionController(max_runs=2, max_runs_per_flow=1, flow_limits={}, queue_timeout=0.05)
+    a = controller.acquire("a")
+    b = controller.acquire("b")
+    with pytest.raises(AdmissionRejected):
+        controller.acquire("c")  # Global limit
+    b.release()
+    with pytest.raises(AdmissionRejected):
+        controller.acquire("a")  # Per-flow limit
+    a.release()
+    a.release()  # Releasing twice is harmless
+    with controller.acquire("a"):
+        assert controller.stats()["running"] == 1
+    assert controller.stats()["running"] == 0
+
+
+def test_full_queue_rejects_with_retry_after():
+    controller = AdmissionController(max_runs=1, max_runs_per_flow=0, flow_limits={}, max_queued=0)
+    with controller.acquire("a"):
+        with pytest.raises(AdmissionRejected) as rejected:
+            controller.acquire("a")
+    assert rejected.value.retry_after >= 1
+    assert controller.stats()["rejected"] == 1
+
+
+def test_freed_slot_goes_to_the_oldest_waiter():
+    controller = AdmissionController(max_runs=1, max_runs_per_flow=0, flow_limits={}, queue_timeout=5)
+    order = []
+    slot = controller.acquire("a")
+
+    def wait(name):
+        with controller.acquire(name):
+            order.append(name)
+
+    first = threading.Thread(target=wait, args=("first",))
+    first.start()
+    while controller.stats()["waiting"] < 1:
+        pass
+    second = threading.Thread(target=wait, args=("second",))
+    second.start()
+    while controller.stats()["waiting"] < 2:
+        pass
+    slot.release()
+    first.join()
+    second.join()
+    assert order == ["first", "second"]
+
+
+def test_cancelled_async_waiter_gives_back_its_slot():
+    controller = AdmissionController(max_runs=1, max_runs_per_flow=0, flow_limits={}, queue_timeout=5)
+
+    async def run():
+        slot = controller.acquire("a")
+        waiter = asyncio.create_task(controller.aacquire("b"))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        slot.release()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+    asyncio.run(run())
+    assert controller.stats()["running"] == 0
+    assert controller.stats()["waiting"] == 0
+
+
+def test_endpoint_returns_429_with_retry_after(monkeypatch):
+    controller = AdmissionController(max_runs=1, max_runs_per_flow=0, flow_limits={}, max_queued=0)
+    monkeypatch.setattr(main, "admission", controller)
+    with controller.acquire("busy"):
+        response = TestClient(main.app).post("/workflows/unknown/execute", json={"message": "hi"})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
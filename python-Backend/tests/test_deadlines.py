@@ -0,0 +1,53 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from agent_runtime.deadlines import arun_with_timeout, run_with_timeout
+
+
+def test_hung_calls_do_not_delay_the_next_one():
+    release = threading.Event()
+    try:
+        for _ in range(20):
+            with pytest.raises(TimeoutError):
+                run_with_timeout(lambda: release.wait(5), 0.01)
+        started = time.monotonic()
+        assert run_with_timeout(lambda: "quote", 1) == "quote"
+        assert time.monotonic() - started < 0.5
+    finally:
+        release.set()
+
+
+def test_errors_from_the_call_are_raised():
+    def fail():
+        raise ValueError("bad symbol")
+
+    with pytest.raises(ValueError, match="bad symbol"):
+        run_with_timeout(fail, 1)
+
+
+def test_async_version_times_out_without_blocking_the_loop():
+    release = threading.Event()
+
+    async def main():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        with pytest.raises(TimeoutError):
+            await arun_with_timeout(lambda: release.wait(5), 0.2)
+        ticker.cancel()
+        assert await arun_with_timeout(lambda: 42, 1) == 42
+        return ticks
+
+    try:
+        assert asyncio.run(main()) > 5
+    finally:
+        release.set()
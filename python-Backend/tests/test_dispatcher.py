@@ -0,0 +1,165 @@
+import asyncio
+import json
+from collections import Counter
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+import dispatcher as dispatcher_module
+from dispatcher import Dispatcher, HashRing, Worker, flow_id_for, merge_metrics, send_until_disconnect
+
+FLOWS = [f"flow-{i}" for i in range(5000)]
+
+
+def owners(ring):
+    return {flow_id: ring.node_for(flow_id) for flow_id in FLOWS}
+
+
+def test_ring_spreads_flows_evenly():
+    counts = Counter(owners(HashRing(["w0", "w1", "w2", "w3"])).values())
+    assert set(counts) == {"w0", "w1", "w2", "w3"}
+    assert all(0.15 < count / len(FLOWS) < 0.35 for count in counts.values())
+
+
+def test_adding_a_worker_moves_only_its_share():
+    ring = HashRing(["w0", "w1", "w2", "w3"])
+    before, after = owners(ring), owners(ring.with_node("w4"))
+    moved = [flow_id for flow_id in FLOWS if before[flow_id] != after[flow_id]]
+    assert all(after[flow_id] == "w4" for flow_id in moved)
+    assert 0.1 < len(moved) / len(FLOWS) < 0.3
+
+
+def test_removing_a_worker_moves_only_its_flows():
+    ring = HashRing(["w0", "w1", "w2", "w3"])
+    before, after = owners(ring), owners(ring.without_node("w2"))
+    assert all(before[flow_id] == "w2" for flow_id in FLOWS if before[flow_id] != after[flow_id])
+    assert "w2" not in after.values()
+
+
+def test_empty_ring_has_no_owner():
+    assert HashRing().node_for("flow") is None
+
+
+def test_merge_metrics_adds_a_worker_label():
+    text = (
+        "# HELP runs_total Runs.\n"
+        "# TYPE runs_total counter\n"
+        'runs_total{flow_id="a"} 3\n'
+        "uptime 12.5\n"
+    )
+    merged = merge_metrics({"worker-0": text, "worker-1": text}).splitlines()
+    assert merged.count("# HELP runs_total Runs.") == 1
+    assert merged.count("# TYPE runs_total counter") == 1
+    assert 'runs_total{worker="worker-0",flow_id="a"} 3' in merged
+    assert 'runs_total{worker="worker-1",flow_id="a"} 3' in merged
+    assert 'uptime{worker="worker-1"} 12.5' in merged
+
+
+def test_flow_id_for_paths_and_generate_bodies():
+    assert flow_id_for("/workflows/abc/execute", b"") == "abc"
+    assert flow_id_for("/workflows/abc/jobs/worker-0.123", b"") == "abc"
+    assert flow_id_for("/cache/flows/abc", b"") == "abc"
+    assert flow_id_for("/generate", json.dumps({"id": "abc", "nodes": []}).encode()) == "abc"
+    assert flow_id_for("/generate", b"not json") is None
+    assert flow_id_for("/generate", b"[1, 2]") is None
+    assert flow_id_for("/generate", json.dumps({"id": 5}).encode()) is None
+    assert flow_id_for("/metrics", b"") is None
+
+
+class RunningProcess:
+    returncode = None
+
+    def poll(self):
+        return None
+
+
+def make_worker(name, port):
+    worker = Worker(name, port)
+    worker.process = RunningProcess()
+    return worker
+
+
+def make_dispatcher(names, handler=None):
+    dispatcher = Dispatcher(worker_count=0)
+    if handler is not None:
+        dispatcher.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    for port, name in enumerate(names, start=9000):
+        dispatcher.workers[name] = make_worker(name, port)
+    dispatcher.ring = HashRing(names)
+    return dispatcher
+
+
+def test_rebalance_warms_moved_flows_and_keeps_jobs_on_their_worker():
+    calls = []
+
+    def handler(request):
+        calls.append((request.method, request.url.port, request.url.path))
+        return httpx.Response(200, json={})
+
+    dispatcher = make_dispatcher(["worker-0", "worker-1"], handler)
+    dispatcher.known_flows.update(FLOWS[:200])
+    before = {flow_id: dispatcher.route(flow_id).name for flow_id in FLOWS[:200]}
+    jobs = {flow_id: f"/workflows/{flow_id}/jobs/{before[flow_id]}.0123abcd" for flow_id in before}
+
+    dispatcher.workers["worker-2"] = make_worker("worker-2", 9002)
+    asyncio.run(dispatcher._switch_ring(dispatcher.ring.with_node("worker-2")))
+
+    moved = [flow_id for flow_id in before if dispatcher.route(flow_id).name != before[flow_id]]
+    assert moved and all(dispatcher.route(flow_id).name == "worker-2" for flow_id in moved)
+    assert dispatcher.rebalanced_flows == len(moved)
+    warmed = {path.split("/")[3] for method, port, path in calls if method == "POST" and port == 9002}
+    evicted = {path.split("/")[3] for method, port, path in calls if method == "DELETE"}
+    assert warmed == evicted == set(moved)
+    # Jobs created before the move are still served by the worker that has them
+    assert all(dispatcher.route(flow_id, jobs[flow_id]).name == before[flow_id] for flow_id in moved)
+
+
+def test_jobs_of_a_removed_worker_are_not_routed_elsewhere():
+    dispatcher = make_dispatcher(["worker-0"])
+    with pytest.raises(HTTPException) as error:
+        dispatcher.route("flow", "/workflows/flow/jobs/worker-7.0123abcd")
+    assert error.value.status_code == 404
+    assert dispatcher.route("flow", "/workflows/flow/jobs/0123abcd").name == "worker-0"
+
+
+class DisconnectingRequest:
+    def __init__(self, after):
+        self.checks = 0
+        self.after = after
+
+    async def is_disconnected(self):
+        self.checks += 1
+        return self.checks >= self.after
+
+
+def test_client_disconnect_closes_the_upstream_request(monkeypatch):
+    monkeypatch.setattr(dispatcher_module, "DISCONNECT_CHECK_INTERVAL", 0.01)
+    cancelled = asyncio.Event()
+
+    async def main():
+        async def handler(request):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+            return httpx.Response(200)
+
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            upstream = client.build_request("POST", "http://worker/workflows/a/execute")
+            response = await send_until_disconnect(client, upstream, DisconnectingRequest(after=3))
+            await asyncio.sleep(0)
+            return response
+
+    assert asyncio.run(main()) is None
+    assert cancelled.is_set()
+
+
+def test_response_is_returned_while_the_client_is_connected():
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(lambda r: httpx.Response(201))) as client:
+            upstream = client.build_request("GET", "http://worker/")
+            return await send_until_disconnect(client, upstream, DisconnectingRequest(after=10**6))
+
+    assert asyncio.run(main()).status_code == 201
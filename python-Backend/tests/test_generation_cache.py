@@ -0,0 +1,85 @@
+import copy
+import os
+
+from component_registry import ComponentRegistry
+from generation_cache import generator_fingerprint, workflow_content_hash
+
+WORKFLOW = {
+    "id": "flow-a",
+    "title": "Support bot",
+    "nodes": [
+        {"id": "agent", "type": "agent", "position": {"x": 10, "y": 20}, "selected": True,
+         "data": {"model": "gpt-4o", "system_message": "Be brief.", "tools": ["tavily"]}},
+        {"id": "end", "type": "end", "position": {"x": 300, "y": 20}, "data": {}},
+    ],
+    "edges": [{"id": "e1", "source": "agent", "target": "end", "type": "default", "animated": True}],
+    "metadata": {"async_mode": True},
+}
+
+
+def test_hash_ignores_key_order_ui_fields_and_flow_id():
+    reordered = {key: WORKFLOW[key] for key in reversed(list(WORKFLOW))}
+    reordered["nodes"] = [dict(reversed(list(node.items()))) for node in WORKFLOW["nodes"]]
+    moved = copy.deepcopy(WORKFLOW)
+    moved.update(id="flow-b", title="Renamed")
+    moved["nodes"][0]["position"] = {"x": 0, "y": 0}
+    moved["nodes"][0].pop("selected")
+    moved["edges"][0]["animated"] = False
+    moved["edges"][0]["id"] = "e2"
+    assert workflow_content_hash(reordered) == workflow_content_hash(moved) == workflow_content_hash(WORKFLOW)
+
+
+def test_hash_changes_with_content_and_generator():
+    changed = copy.deepcopy(WORKFLOW)
+    changed["nodes"][0]["data"]["system_message"] = "Be thorough."
+    assert workflow_content_hash(changed) != workflow_content_hash(WORKFLOW)
+    assert workflow_content_hash(WORKFLOW, "v1") != workflow_content_hash(WORKFLOW, "v2")
+
+
+def make_library(tmp_path):
+    tools = tmp_path / "library" / "tool_functions"
+    tools.mkdir(parents=True)
+    (tools / "echo.py").write_text("def echo(x):\n    return x\n")
+    template = tmp_path / "template.j2"
+    template.write_text("{{ nodes }}")
+    return ComponentRegistry(str(tmp_path / "library")), str(template), tools / "echo.py"
+
+
+def bump_mtime(path):
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+
+def test_fingerprint_is_reused_between_rescans(tmp_path, monkeypatch):
+    registry, template, tool = make_library(tmp_path)
+    first = generator_fingerprint(registry, template, max_age=60)
+    scans = []
+    monkeypatch.setattr(registry, "scan", lambda: scans.append(1))
+    bump_mtime(tool)
+    assert generator_fingerprint(registry, template, max_age=60) == first
+    assert scans == []
+
+
+def test_fingerprint_follows_library_and_template_edits(tmp_path):
+    registry, template, tool = make_library(tmp_path)
+    first = generator_fingerprint(registry, template, max_age=0)
+    bump_mtime(tool)
+    second = generator_fingerprint(registry, template, max_age=0)
+    bump_mtime(template)
+    third = generator_fingerprint(registry, template, max_age=0)
+    assert len({first, second, third}) == 3
+
+
+def test_reindexed_component_invalidates_the_fingerprint_early(tmp_path):
+    registry, template, tool = make_library(tmp_path)
+    first = generator_fingerprint(registry, template, max_age=60)
+    bump_mtime(tool)
+    registry.get("tool_function", "echo")  # A render noticed the edit
+    assert generator_fingerprint(registry, template, max_age=60) != first
+
+
+def test_unparsable_components_are_skipped_by_scan(tmp_path):
+    registry, template, tool = make_library(tmp_path)
+    (tool.parent / "broken.py").write_text("def broken(:\n")
+    generator_fingerprint(registry, template, max_age=0)
+    assert [c["name"] for c in registry.list()] == ["echo"]
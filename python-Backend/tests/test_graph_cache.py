@@ -0,0 +1,113 @@
+import threading
+
+from graph_cache import GraphCache, GraphLease
+
+
+class Graph:
+    def __init__(self, name):
+        self.name = name
+
+
+def test_lease_counts_hit_and_miss():
+    cache = GraphCache()
+    assert cache.lease("a") is None
+    cache.put("a", Graph("a1"))
+    with cache.lease("a") as graph:
+        assert graph.name == "a1"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+
+
+def test_lease_after_load_is_not_counted_again():
+    cache = GraphCache()
+    assert cache.lease("a") is None
+    cache.put("a", Graph("a1"))
+    cache.lease("a", count=False).release()
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (0, 1)
+
+
+def test_replaced_version_is_freed_after_its_last_run():
+    cache = GraphCache()
+    cache.put("a", Graph("a1"))
+    lease = cache.lease("a")
+    cache.put("a", Graph("a2"))
+    assert lease.graph.name == "a1"
+    assert cache.stats()["retired_versions_running"] == 1
+    with cache.lease("a") as graph:
+        assert graph.name == "a2"
+    lease.release()
+    lease.release()  # Releasing twice is harmless
+    stats = cache.stats()
+    assert stats["retired_versions_running"] == 0
+    assert stats["versions_released"] == 1
+    assert stats["active_runs"] == 0
+
+
+def test_retired_entry_cannot_be_leased():
+    cache = GraphCache()
+    cache.put("a", Graph("a1"))
+    entry = cache._entries["a"]
+    entry.retire()
+    assert entry.begin_run() is None
+
+
+def test_leases_never_see_a_freed_graph_under_contention():
+    cache = GraphCache(max_entries=1)
+    cache.put("a", Graph("a0"))
+    stop = threading.Event()
+    errors = []
+
+    def run():
+        while not stop.is_set():
+            lease = cache.lease("a")
+            if lease is None:
+                continue
+            if not isinstance(lease, GraphLease) or lease.graph is None:
+                errors.append("leased a freed graph")
+            lease.release()
+
+    def swap():
+        for i in range(2000):
+            cache.put("a", Graph(f"a{i}"))
+            if i % 10 == 0:
+                cache.pop("a")
+        stop.set()
+
+    threads = [threading.Thread(target=run) for _ in range(4)] + [threading.Thread(target=swap)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = cache.stats()
+    assert not errors
+    assert stats["active_runs"] == 0
+    assert stats["retired_versions_running"] == 0
+    # Every version but the current one was freed exactly once
+    assert stats["versions_released"] == cache.version("a") - 1
+
+
+class Module:
+    __name__ = "agent_test_module"
+
+    def __init__(self, graph):
+        self.graph = graph
+
+
+def test_find_by_content_hash_skips_the_flow_itself():
+    cache = GraphCache()
+    cache.put("a", Graph("a1"), module=Module(Graph("a1")), size_bytes=100, content_hash="h")
+    assert cache.find_by_content_hash("h", exclude="a") is None
+    assert cache.find_by_content_hash("h") is not None
+
+
+def test_shared_graph_bytes_move_to_the_surviving_flow():
+    cache = GraphCache(max_entries=2)
+    module = Module(Graph("g"))
+    cache.put("owner", module.graph, module=module, size_bytes=100, content_hash="h")
+    cache.put("sharer", module.graph, module=module, content_hash="h", shared=True)
+    assert cache.total_bytes == 100
+    cache.put("other", Graph("o"), size_bytes=10)  # Evicts the owner
+    assert "owner" not in cache
+    assert cache.total_bytes == 110
@@ -0,0 +1,107 @@
+import sqlite3
+
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+import checkpoints
+import main
+from agent_runtime.history import trim_history
+
+
+def turn(i, text="x"):
+    """A user message, a tool call, its result and the answer."""
+    return [
+        HumanMessage(f"question {i} {text}"),
+        AIMessage("", tool_calls=[{"name": "lookup", "args": {}, "id": f"call_{i}"}]),
+        ToolMessage("result", tool_call_id=f"call_{i}"),
+        AIMessage(f"answer {i}"),
+    ]
+
+
+CONVERSATION = turn(1) + turn(2) + turn(3)
+
+
+def test_no_budget_keeps_everything():
+    assert trim_history(CONVERSATION, max_messages=0, max_tokens=0) == CONVERSATION
+
+
+@pytest.mark.parametrize("max_messages, kept", [(4, 4), (7, 4), (8, 8), (100, 12)])
+def test_message_budget_keeps_whole_turns(max_messages, kept):
+    window = trim_history(CONVERSATION, max_messages=max_messages, max_tokens=0)
+    assert window == CONVERSATION[-kept:]
+    assert isinstance(window[0], HumanMessage)
+
+
+def test_token_budget_drops_the_oldest_turns():
+    conversation = turn(1, "x" * 4000) + turn(2) + turn(3)
+    window = trim_history(conversation, max_messages=0, max_tokens=500)
+    assert window == conversation[4:]
+
+
+def test_current_turn_is_kept_even_over_budget():
+    conversation = turn(1) + turn(2, "x" * 4000)
+    assert trim_history(conversation, max_messages=2, max_tokens=10) == conversation[4:]
+
+
+def test_tool_results_stay_with_their_call():
+    # A window of 2 would start at the ToolMessage: it starts at the user message instead
+    conversation = turn(1) + turn(2)[:3]
+    window = trim_history(conversation, max_messages=2, max_tokens=0)
+    assert window == conversation[4:]
+
+
+def test_leading_system_message_is_kept():
+    conversation = [SystemMessage("Be brief.")] + CONVERSATION
+    window = trim_history(conversation, max_messages=4, max_tokens=0)
+    assert window == [conversation[0]] + CONVERSATION[-4:]
+    assert trim_history(conversation, max_messages=0, max_tokens=60)[0] == conversation[0]
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    conn = sqlite3.connect(str(tmp_path / "threads.sqlite3"), check_same_thread=False)
+    saver = checkpoints.ThreadSaver(conn)
+    saver.setup()
+    monkeypatch.setitem(checkpoints._savers, checkpoints.THREADS_DB_PATH, saver)
+    monkeypatch.setattr(main, "BASE_PROJECT_DIR", str(tmp_path / "agents"))
+    client = TestClient(main.app)
+    workflow = {
+        "id": "threads-test",
+        "metadata": {"state": {"type": "prebuilt", "name": "MessagesState"}, "async_mode": True},
+        "nodes": [{"id": "a", "type": "agent", "data": {"provider": "Fake", "latency_ms": 300, "system_message": "x"}}],
+        "edges": [],
+    }
+    assert client.post("/generate", json=workflow, params={"export": False}).json()["status"] == "success"
+    yield client
+    main.graphs_cache.pop("threads-test")
+    conn.close()
+
+
+def messages(client, thread_id):
+    response = client.get(f"/workflows/threads-test/threads/{thread_id}")
+    return response.status_code, [(m["type"], m["content"]) for m in response.json().get("messages", [])]
+
+
+def test_thread_listing_and_deletion(client):
+    for message in ("hi", "again"):
+        assert client.post("/workflows/threads-test/execute/async",
+                           json={"message": message, "thread_id": "t1"}).status_code == 200
+    status, history = messages(client, "t1")
+    assert status == 200
+    assert history == [("human", "hi"), ("ai", "Done."), ("human", "again"), ("ai", "Done.")]
+    assert messages(client, "other")[0] == 404
+    assert client.delete("/workflows/threads-test/threads/t1").json()["deleted"] is True
+    assert messages(client, "t1")[0] == 404
+
+
+def test_failed_turn_is_rolled_back(client):
+    client.post("/workflows/threads-test/execute/async", json={"message": "hi", "thread_id": "t2"})
+    # The model takes 300ms: the run is cancelled before its first node finishes
+    response = client.post("/workflows/threads-test/execute/async",
+                           json={"message": "lost", "thread_id": "t2", "timeout": 0.05})
+    assert response.status_code == 504
+    assert messages(client, "t2")[1] == [("human", "hi"), ("ai", "Done.")]
+    # A new thread that fails on its first turn is not created at all
+    client.post("/workflows/threads-test/execute/async", json={"message": "lost", "thread_id": "t3", "timeout": 0.05})
+    assert messages(client, "t3")[0] == 404
@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from jobs import JobQueue, JobQueueFull, JobStore
+
+
+def run_queue(tmp_path, scenario, run=None, **kwargs):
+    async def default_run(flow_id, payload):
+        await asyncio.sleep(payload.get("sleep", 0))
+        if payload.get("fail"):
+            raise ValueError("boom")
+        return {"response": payload["message"]}
+
+    async def main():
+        queue = JobQueue(run or default_run, path=str(tmp_path / "jobs.sqlite3"), **kwargs)
+        queue.start()
+        try:
+            return await scenario(queue)
+        finally:
+            await queue.shutdown()
+
+    return asyncio.run(main())
+
+
+def test_submit_and_wait(tmp_path):
+    async def scenario(queue):
+        ok = queue.submit("flow", {"message": "hi"})
+        failed = queue.submit("flow", {"message": "hi", "fail": True})
+        return await queue.wait(ok["job_id"], 5), await queue.wait(failed["job_id"], 5)
+
+    ok, failed = run_queue(tmp_path, scenario)
+    assert ok["status"] == "succeeded" and ok["result"] == {"response": "hi"}
+    assert failed["status"] == "failed" and failed["error"] == "boom"
+
+
+def test_wait_times_out_on_a_running_job(tmp_path):
+    async def scenario(queue):
+        job = queue.submit("flow", {"message": "hi", "sleep": 1})
+        return await queue.wait(job["job_id"], 0.05)
+
+    assert run_queue(tmp_path, scenario)["status"] in ("queued", "running")
+
+
+def test_full_queue_is_rejected(tmp_path):
+    async def scenario(queue):
+        queue.submit("flow", {"message": "1", "sleep": 1})
+        await asyncio.sleep(0.01)  # The worker takes the first job
+        queue.submit("flow", {"message": "2"})
+        with pytest.raises(JobQueueFull):
+            queue.submit("flow", {"message": "3"})
+
+    run_queue(tmp_path, scenario, workers=1, max_queued=1)
+
+
+def test_cancel_queued_and_running(tmp_path):
+    async def scenario(queue):
+        running = queue.submit("flow", {"message": "1", "sleep": 5})
+        queued = queue.submit("flow", {"message": "2"})
+        await asyncio.sleep(0.01)
+        assert queue.cancel(queued["job_id"])["status"] == "cancelled"
+        queue.cancel(running["job_id"])
+        return await queue.wait(running["job_id"], 5), await queue.wait(queued["job_id"], 5)
+
+    running, queued = run_queue(tmp_path, scenario, workers=1)
+    assert running["status"] == "cancelled"
+    assert queued["status"] == "cancelled" and queued["result"] is None
+
+
+def test_recover_after_restart(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    interrupted = store.create("flow", {"message": "1"})
+    store.start(interrupted["job_id"])
+    pending = store.create("flow", {"message": "2"})
+    store.close()
+
+    async def scenario(queue):
+        return await queue.wait(interrupted["job_id"], 0), await queue.wait(pending["job_id"], 5)
+
+    interrupted, pending = run_queue(tmp_path, scenario)
+    assert interrupted["status"] == "failed" and "Interrupted" in interrupted["error"]
+    assert pending["status"] == "succeeded"
@@ -0,0 +1,86 @@
+import re
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from benchmarks.agents import synthetic_workflow
+from benchmarks.common import start_stub_server
+from metrics import Counter, Gauge, Histogram, Registry
+
+SAMPLE = re.compile(r"^(\w+)(\{.*\})? (\S+)$")
+
+
+def parse(text):
+    """{(name, labels): value} of every sample in an exposition."""
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, labels, value = SAMPLE.match(line).groups()
+            samples[(name, labels or "")] = float(value)
+    return samples
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    histogram = registry.register(Histogram("latency_seconds", "Latency.", ["op"], buckets=(1, 0.1)))
+    for value in (0.05, 0.1, 0.5, 5):
+        histogram.observe(value, op="read")
+    lines = registry.render().splitlines()
+    assert lines[:2] == ["# HELP latency_seconds Latency.", "# TYPE latency_seconds histogram"]
+    assert lines[2:] == [
+        'latency_seconds_bucket{op="read",le="0.1"} 2',
+        'latency_seconds_bucket{op="read",le="1"} 3',
+        'latency_seconds_bucket{op="read",le="+Inf"} 4',
+        'latency_seconds_sum{op="read"} 5.65',
+        'latency_seconds_count{op="read"} 4',
+    ]
+
+
+def test_label_values_are_escaped_and_empty_gauges_skipped():
+    registry = Registry()
+    counter = registry.register(Counter("calls_total", "Calls.", ["tool"]))
+    counter.inc(tool='say "hi"\\\n')
+    counter.inc(2, tool="plain")
+    registry.register(Gauge("pool_size", "Pool.", lambda: {("a",): 3, ("b",): None}, ["pool"]))
+    text = registry.render()
+    assert 'calls_total{tool="say \\"hi\\"\\\\\\n"} 1' in text.splitlines()
+    assert 'calls_total{tool="plain"} 2' in text.splitlines()
+    assert 'pool_size{pool="a"} 3' in text and 'pool="b"' not in text
+    assert text.endswith("\n")
+
+
+@pytest.fixture(scope="module")
+def stub_url():
+    server = start_stub_server()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def test_runs_are_attributed_to_graph_nodes_tools_and_model(stub_url, monkeypatch, tmp_path):
+    monkeypatch.setattr(main, "BASE_PROJECT_DIR", str(tmp_path))
+    client = TestClient(main.app)
+    workflow = synthetic_workflow("metrics-test", 2, stub_url, 0, tavily=False)
+    assert client.post("/generate", json=workflow, params={"export": False}).json()["status"] == "success"
+    before = parse(client.get("/metrics").text)
+    try:
+        assert client.post("/workflows/metrics-test/execute/async", json={"message": "hi"}).status_code == 200
+        response = client.get("/metrics")
+    finally:
+        main.graphs_cache.pop("metrics-test")
+    assert response.headers["content-type"] == "text/plain; version=0.0.4; charset=utf-8"
+    after = parse(response.text)
+
+    def delta(name, labels):
+        return after.get((name, labels), 0) - before.get((name, labels), 0)
+
+    flow = 'flow_id="metrics-test"'
+    assert delta("agent_graph_run_seconds_count", f'{{{flow},status="ok"}}') == 1
+    # The agent answers twice (tool calls, then the final answer); the tool node runs once
+    assert delta("agent_node_seconds_count", f'{{{flow},node="agent-1",status="ok"}}') == 2
+    assert delta("agent_node_seconds_count", f'{{{flow},node="tools",status="ok"}}') == 1
+    for tool in ("get_item_0", "get_item_1"):
+        assert delta("agent_tool_seconds_count", f'{{{flow},tool="{tool}",status="ok"}}') == 1
+    assert delta("agent_llm_seconds_count", '{model="fake",status="ok"}') == 2
+    assert delta("agent_llm_tokens_total", '{model="fake",type="prompt"}') > 0
+    assert delta("agent_llm_tokens_total", '{model="fake",type="completion"}') > 0
@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+import main
+from benchmarks.common import start_stub_server
+
+
+@pytest.fixture(scope="module")
+def stub_url():
+    server = start_stub_server()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def agent(agent_id):
+    return {"id": agent_id, "type": "agent", "data": {"provider": "Fake", "system_message": agent_id}}
+
+
+def api_tool(node_id, path, url):
+    return {"id": node_id, "type": "tool_function", "data": {
+        "function_name": f"call_{node_id}", "base_tool": "api_request",
+        "static_args": {"method": "GET", "url": f"{url}/{path}"}, "llm_args": []}}
+
+
+def edge(source, target, conditional=False):
+    return {"id": f"{source}-{target}", "source": source, "target": target,
+            **({"type": "conditional", "condition": "should_continue"} if conditional else {"type": "simple"})}
+
+
+def workflow(url, agents, agent_edges, async_mode=False):
+    """Every agent gets an API tool echoing its own path; 'agent_edges' link the agents."""
+    nodes, edges = [], []
+    for agent_id in agents:
+        nodes += [agent(agent_id), api_tool(f"{agent_id}_api", agent_id, url)]
+        edges += [edge(agent_id, f"{agent_id}_api", conditional=True), edge(f"{agent_id}_api", agent_id)]
+    edges += [edge(source, target) for source, target in agent_edges]
+    return {"id": "multi", "nodes": nodes, "edges": edges,
+            "metadata": {"state": {"type": "prebuilt", "name": "MessagesState"}, "async_mode": async_mode}}
+
+
+def build(definition):
+    rendered = main.render_agent_source(definition)
+    assert rendered["status"] == "success", rendered
+    return rendered["source"], main.compile_agent_module("multi", rendered["source"], "<agent_multi>").graph
+
+
+def run(graph, async_mode):
+    state = {"messages": [HumanMessage("hi")]}
+    if async_mode:
+        return asyncio.run(graph.ainvoke(state))["messages"]
+    return graph.invoke(state)["messages"]
+
+
+def plan(definition):
+    agents = [node for node in definition["nodes"] if node["type"] == "agent"]
+    for index, node in enumerate(agents):
+        node["data"]["index"] = index
+    tools = {node["id"]: [f"call_{node['id']}_api"] for node in agents}
+    return main.plan_agent_branches(agents, tools, definition["edges"], [])
+
+
+def test_plan_finds_sources_and_sinks(stub_url):
+    steps = plan(workflow(stub_url, ["research", "finance", "writer"],
+                          [("research", "writer"), ("finance", "writer")]))
+    assert [step["id"] for step in steps] == ["research", "finance", "writer"]
+    assert [step["sources"] for step in steps] == [[], [], ["research", "finance"]]
+    assert [step["sink"] for step in steps] == [False, False, True]
+    assert all(step["condition"] == "should_continue" for step in steps)
+
+
+def test_plan_rejects_cycles_between_agents(stub_url):
+    definition = workflow(stub_url, ["a", "b", "c"], [("a", "b"), ("b", "c"), ("c", "b")])
+    with pytest.raises(ValueError, match="cycle"):
+        plan(definition)
+    rendered = main.render_agent_source(definition)
+    assert rendered["status"] == "error" and "cycle" in rendered["error"]
+
+
+@pytest.mark.parametrize("async_mode", [False, True])
+def test_fan_out_then_join_waits_for_both_sources(stub_url, async_mode):
+    source, graph = build(workflow(stub_url, ["research", "finance", "writer"],
+                                   [("research", "writer"), ("finance", "writer")], async_mode))
+    assert 'graph_builder.add_edge(["research", "finance"], "writer")' in source
+    assert 'add_node("merge_branches"' not in source
+    messages = run(graph, async_mode)
+    # Both branch answers (in either order), then the writer's, and nothing of the tool loops
+    assert sorted(m.name for m in messages[1:3]) == ["finance", "research"]
+    assert '"/research"' in messages[1].content + messages[2].content
+    assert '"/finance"' in messages[1].content + messages[2].content
+    assert messages[-1].name == "writer" and len(messages) == 4
+
+
+@pytest.mark.parametrize("async_mode", [False, True])
+def test_parallel_sinks_are_merged(stub_url, async_mode):
+    source, graph = build(workflow(stub_url, ["research", "finance"], [], async_mode))
+    assert 'graph_builder.add_edge(["research", "finance"], "merge_branches")' in source
+    final = run(graph, async_mode)[-1]
+    assert final.name == "merge_branches"
+    research, finance = final.content.split("\n\n")
+    assert research.startswith("[research]\n") and '"/research"' in research
+    assert finance.startswith("[finance]\n") and '"/finance"' in finance
+
+
+def test_chain_ends_at_its_single_sink(stub_url):
+    source, graph = build(workflow(stub_url, ["research", "writer"], [("research", "writer")]))
+    assert 'graph_builder.add_edge("writer", END)' in source
+    assert [m.name for m in run(graph, False)[1:]] == ["research", "writer"]
@@ -0,0 +1,84 @@
+import asyncio
+import threading
+import time
+
+from agent_runtime import quotes
+from agent_runtime.quotes import afetch_quotes, fetch_quotes, normalize_symbols
+
+
+class FakeTicker:
+    calls = []
+
+    def __init__(self, symbol):
+        self.calls.append(symbol)
+        self.info = {"regularMarketPrice": 10.0, "currency": "USD", "sector": "Tech"} if symbol != "NOPE" else {}
+
+
+def use_fake_ticker(monkeypatch):
+    FakeTicker.calls = []
+    monkeypatch.setattr(quotes.yf, "Ticker", FakeTicker)
+
+
+def test_normalize_symbols_dedupes_in_order():
+    assert normalize_symbols([" aapl", "MSFT", "AAPL", "", "nvda"]) == ["AAPL", "MSFT", "NVDA"]
+
+
+def test_symbols_past_the_cap_get_an_error_entry(monkeypatch):
+    use_fake_ticker(monkeypatch)
+    monkeypatch.setattr(quotes, "MAX_BATCH_SYMBOLS", 2)
+    result = fetch_quotes(["A", "B", "C", "D"], timeout=5)
+    assert list(result) == ["A", "B", "C", "D"]
+    assert result["A"] == {"currency": "USD", "regularMarketPrice": 10.0}
+    assert "another call" in result["C"]["error"] and "another call" in result["D"]["error"]
+    assert sorted(FakeTicker.calls) == ["A", "B"]
+
+
+def test_unknown_symbols_and_slow_fetches_get_errors(monkeypatch):
+    use_fake_ticker(monkeypatch)
+    release = threading.Event()
+    real_fetch = quotes._fetch
+
+    def fetch(symbol):
+        if symbol == "SLOW":
+            release.wait(5)
+        return real_fetch(symbol)
+
+    monkeypatch.setattr(quotes, "_fetch", fetch)
+    try:
+        result = asyncio.run(afetch_quotes(["NOPE", "SLOW", "OK"], timeout=0.2))
+    finally:
+        release.set()
+    assert "Could not find" in result["NOPE"]["error"]
+    assert "Timed out" in result["SLOW"]["error"]
+    assert result["OK"]["regularMarketPrice"] == 10.0
+
+
+def test_cached_quotes_skip_the_fetch(monkeypatch):
+    use_fake_ticker(monkeypatch)
+    monkeypatch.setattr(quotes, "QUOTE_CACHE_TTL", 60)
+    monkeypatch.setattr(quotes, "_cache", quotes.MemoryStore(10))
+    fetch_quotes(["AAPL", "NOPE"], timeout=5)
+    fetch_quotes(["AAPL", "NOPE"], timeout=5)
+    assert sorted(FakeTicker.calls) == ["AAPL", "NOPE", "NOPE"]
+
+
+def test_hung_fetches_do_not_delay_later_batches(monkeypatch):
+    use_fake_ticker(monkeypatch)
+    release = threading.Event()
+    real_fetch = quotes._fetch
+
+    def fetch(symbol):
+        if symbol.startswith("HUNG"):
+            release.wait(5)
+        return real_fetch(symbol)
+
+    monkeypatch.setattr(quotes, "_fetch", fetch)
+    try:
+        hung = fetch_quotes([f"HUNG{i}" for i in range(12)], timeout=0.05)
+        assert all("Timed out" in quote["error"] for quote in hung.values())
+        started = time.monotonic()
+        result = fetch_quotes(["AAPL", "MSFT"], timeout=1)
+        assert time.monotonic() - started < 0.5
+    finally:
+        release.set()
+    assert result["AAPL"]["regularMarketPrice"] == 10.0 and result["MSFT"]["regularMarketPrice"] == 10.0
@@ -0,0 +1,27 @@
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration
+
+from agent_runtime.tool_cache import SQLiteStore
+from llm_factory.response_cache import ResponseCache
+
+
+def generations(text):
+    return [ChatGeneration(message=AIMessage(text))]
+
+
+def test_clear_drops_only_this_models_entries():
+    first, second = ResponseCache("clear-a"), ResponseCache("clear-b")
+    first.update("[]", "llm", generations("a"))
+    second.update("[]", "llm", generations("b"))
+    first.clear()
+    assert first.lookup("[]", "llm") is None
+    assert second.lookup("[]", "llm")[0].message.content == "b"
+
+
+def test_sqlite_clear_takes_a_literal_prefix(tmp_path):
+    store = SQLiteStore(10, str(tmp_path / "cache.sqlite3"), table="llm_cache")
+    store.set("gpt_4:1", "a", 60)
+    store.set("gpt%4:1", "b", 60)
+    store.clear("gpt%4:")
+    assert store.get("gpt_4:1") == "a"
+    assert len(store) == 1
@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+from agent_runtime import tool_cache
+from agent_runtime.tool_cache import MISSING, MemoryStore, SQLiteStore, cached_tool
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(tool_cache.time, "time", clock)
+    return clock
+
+
+@pytest.mark.parametrize("make_store", [
+    lambda tmp_path: MemoryStore(10),
+    lambda tmp_path: SQLiteStore(10, str(tmp_path / "tools.sqlite3")),
+])
+def test_entries_expire_after_ttl(make_store, tmp_path, clock):
+    store = make_store(tmp_path)
+    store.set("key", {"price": 1}, 30)
+    clock.now += 29
+    assert store.get("key") == {"price": 1}
+    clock.now += 2
+    assert store.get("key") is MISSING
+
+
+def test_memory_store_evicts_least_recently_used():
+    store = MemoryStore(2)
+    store.set("a", 1, 60)
+    store.set("b", 2, 60)
+    store.get("a")
+    store.set("c", 3, 60)
+    assert store.get("b") is MISSING
+    assert (store.get("a"), store.get("c")) == (1, 3)
+
+
+def test_cached_tool_reuses_results_until_they_expire(clock):
+    calls = []
+
+    @cached_tool("test_ttl_tool", ttl=10)
+    def lookup(symbol):
+        calls.append(symbol)
+        return {"symbol": symbol}
+
+    lookup("AAPL")
+    lookup(symbol="AAPL")
+    assert calls == ["AAPL"]
+    clock.now += 11
+    lookup("AAPL")
+    assert calls == ["AAPL", "AAPL"]
+
+
+def test_errors_are_not_cached():
+    calls = []
+
+    @cached_tool("test_error_tool", ttl=60)
+    def lookup(symbol):
+        calls.append(symbol)
+        return {"error": "not found"}
+
+    lookup("NOPE")
+    lookup("NOPE")
+    assert len(calls) == 2
+
+
+def test_unsafe_methods_bypass_the_cache():
+    calls = []
+
+    @cached_tool("test_method_tool", ttl=60)
+    async def request(url, method="GET"):
+        calls.append(method)
+        return {"ok": True}
+
+    async def main():
+        for method in ("GET", "GET", "POST", "POST"):
+            await request("https://example.com", method=method)
+
+    asyncio.run(main())
+    assert calls == ["GET", "POST", "POST"]
+    assert tool_cache.cache_stats()["tools"]["test_method_tool"] == {"hits": 1, "misses": 1, "bypassed": 2}
@@ -0,0 +1,64 @@
+import asyncio
+
+from agent_runtime.tool_limits import limit_concurrency, limit_turn, tool_limit, turn_limit
+
+
+class Gauge:
+    def __init__(self):
+        self.running = 0
+        self.peak = 0
+
+    async def tool(self, x):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+        return x
+
+
+class FakeToolNode:
+    """Starts every call of a turn at once, like the async ToolNode."""
+
+    def __init__(self, tool, calls):
+        self.tool = tool
+        self.calls = calls
+
+    async def ainvoke(self, state, config):
+        return await asyncio.gather(*(self.tool(i) for i in range(self.calls)))
+
+
+def test_turn_limit_caps_one_turn_only():
+    gauge = Gauge()
+    tool = limit_concurrency(gauge.tool, turn_limit)
+    node = limit_turn(FakeToolNode(tool, 6), 2)
+
+    async def run():
+        # Two turns at once: each may run two calls
+        return await asyncio.gather(node({}, {}), node({}, {}))
+
+    first, second = asyncio.run(run())
+    assert first == second == list(range(6))
+    assert gauge.peak == 4
+
+
+def test_without_a_turn_the_limit_is_a_no_op():
+    gauge = Gauge()
+    tool = limit_concurrency(gauge.tool, turn_limit)
+    asyncio.run(FakeToolNode(tool, 5).ainvoke({}, {}))
+    assert gauge.peak == 5
+
+
+def test_per_tool_limit_is_shared_across_turns():
+    gauge = Gauge()
+    tool = limit_concurrency(gauge.tool, tool_limit("test_shared_tool", 3), turn_limit)
+    node = limit_turn(FakeToolNode(tool, 4), 4)
+
+    async def run():
+        await asyncio.gather(node({}, {}), node({}, {}))
+
+    asyncio.run(run())
+    assert gauge.peak == 3
+
+
+def test_no_limits_returns_the_tool():
+    assert limit_concurrency(Gauge.tool, None, None) is Gauge.tool
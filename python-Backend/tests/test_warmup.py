@@ -0,0 +1,87 @@
+import threading
+import time
+
+import pytest
+
+from warmup import UsageLog, Warmup, select_flows
+
+
+def wait_until_done(warmup, timeout=5):
+    deadline = time.monotonic() + timeout
+    while warmup.running:
+        assert time.monotonic() < deadline, warmup.status()
+        time.sleep(0.01)
+    return warmup.status()
+
+
+def make_flows(tmp_path, *flow_ids):
+    for flow_id in flow_ids:
+        (tmp_path / flow_id).mkdir()
+        (tmp_path / flow_id / "agent.py").write_text("")
+    (tmp_path / "not_a_flow").mkdir()
+    return str(tmp_path)
+
+
+def test_select_flows_orders_by_last_use_and_limits(tmp_path):
+    base_dir = make_flows(tmp_path, "a", "b", "c")
+    log = UsageLog(str(tmp_path / "usage.json"))
+    log.touch("b")
+    time.sleep(0.01)
+    log.touch("c")
+    assert select_flows(base_dir, log, "all") == ["c", "b", "a"]
+    assert select_flows(base_dir, log, "2") == ["c", "b"]
+    assert select_flows(base_dir, log, "none") == []
+    assert select_flows(base_dir, log, "some") == []
+
+
+def test_usage_log_flush_merges_with_other_workers(tmp_path):
+    path = str(tmp_path / "usage.json")
+    first, second = UsageLog(path), UsageLog(path)
+    first.touch("a")
+    first.flush()
+    second.touch("b")
+    second.flush()
+    assert set(UsageLog(path).most_recent(["a", "b", "c"])[:2]) == {"a", "b"}
+
+
+def test_state_goes_from_running_to_done():
+    release = threading.Event()
+    warmup = Warmup(lambda flow_id: release.wait(5), workers=2)
+    assert warmup.status()["state"] == "idle"
+    assert warmup.start(["a", "b", "c"]) == 3
+    assert warmup.start(["a"]) == 0
+    status = warmup.status()
+    assert status["state"] == "running" and status["pending"] == 3
+    release.set()
+    status = wait_until_done(warmup)
+    assert status["state"] == "done"
+    assert (status["loaded"], status["pending"], status["progress"]) == (3, 0, 1.0)
+
+
+def test_failed_loads_are_reported():
+    def load(flow_id):
+        if flow_id == "bad":
+            raise ValueError("no agent.py")
+
+    warmup = Warmup(load)
+    warmup.start(["good", "bad"])
+    status = wait_until_done(warmup)
+    assert status["loaded"] == 1 and status["failed"] == {"bad": "no agent.py"}
+
+
+@pytest.mark.parametrize("fixed", [False, True])
+def test_failed_flow_can_be_warmed_again(fixed):
+    attempts = []
+
+    def load(flow_id):
+        attempts.append(flow_id)
+        if len(attempts) == 1 or not fixed:
+            raise ValueError("no agent.py")
+
+    warmup = Warmup(load)
+    warmup.start(["bad"])
+    wait_until_done(warmup)
+    warmup.start(["bad"])
+    status = wait_until_done(warmup)
+    assert status["state"] == "done" and status["pending"] == 0 and status["total"] == 1
+    assert status["failed"] == ({} if fixed else {"bad": "no agent.py"})
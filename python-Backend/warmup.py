@@ -0,0 +1,179 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# Flows to load at startup: "none", "all", or a number N for the N most
+# recently used ones (according to the usage log)
+WARMUP_FLOWS = os.environ.get("WARMUP_FLOWS", "none").strip().lower()
+WARMUP_WORKERS = int(os.environ.get("WARMUP_WORKERS", "4"))
+# Last-use time of each flow, shared by all workers of a deployment
+FLOW_USAGE_LOG = os.environ.get("FLOW_USAGE_LOG", "flow_usage.json")
+USAGE_LOG_FLUSH_INTERVAL = float(os.environ.get("USAGE_LOG_FLUSH_INTERVAL", "30"))
+
+
+class UsageLog:
+    """
+    When each flow was last used. Updated in memory on every request and
+    written to a JSON file now and then; workers sharing the file merge
+    their entries instead of overwriting each other's.
+    """
+
+    def __init__(self, path: str = FLOW_USAGE_LOG):
+        self.path = path
+        self._lock = threading.Lock()
+        self._last_used: Dict[str, float] = self._read()
+        self._dirty = False
+
+    def _read(self) -> Dict[str, float]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return {k: float(v) for k, v in data.items()} if isinstance(data, dict) else {}
+
+    def touch(self, flow_id: str) -> None:
+        with self._lock:
+            self._last_used[flow_id] = time.time()
+            self._dirty = True
+
+    def most_recent(self, flow_ids: Iterable[str]) -> List[str]:
+        """flow_ids, most recently used first (never used ones last)."""
+        with self._lock:
+            last_used = dict(self._last_used)
+        return sorted(flow_ids, key=lambda flow_id: last_used.get(flow_id, 0.0), reverse=True)
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            merged = self._read()
+            for flow_id, used in self._last_used.items():
+                merged[flow_id] = max(used, merged.get(flow_id, 0.0))
+            self._last_used = merged
+            self._dirty = False
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(merged, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"⚠️  Warning: Could not write usage log {self.path}: {e}")
+
+
+def discover_flows(base_dir: str) -> List[str]:
+    """Every flow exported under base_dir (a directory with an agent.py)."""
+    try:
+        names = os.listdir(base_dir)
+    except OSError:
+        return []
+    return sorted(name for name in names if os.path.isfile(os.path.join(base_dir, name, "agent.py")))
+
+
+def select_flows(base_dir: str, usage_log: UsageLog, mode: str = WARMUP_FLOWS) -> List[str]:
+    """The flows a warm-up 'mode' ("none", "all" or N) covers, most recently used first."""
+    if mode in ("", "none", "0", "false", "no"):
+        return []
+    flows = usage_log.most_recent(discover_flows(base_dir))
+    if mode == "all":
+        return flows
+    try:
+        return flows[:int(mode)]
+    except ValueError:
+        print(f"⚠️  Warning: Ignoring WARMUP_FLOWS={mode!r}: expected 'none', 'all' or a number.")
+        return []
+
+
+class Warmup:
+    """
+    Loads flows in the background, a few at a time, while the server already
+    takes requests. 'load' is the server's normal (coalesced) cold load, so a
+    request for a flow that is still warming waits for the same load.
+    status() covers the current round, or the last one once it is done.
+    """
+
+    def __init__(self, load: Callable[[str], Any], workers: int = WARMUP_WORKERS):
+        self._load = load
+        self._workers = max(1, workers)
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._queued: set = set()
+        self._total = 0
+        self._done = 0
+        self._loaded = 0
+        self._failed: Dict[str, str] = {}
+        self._started: Optional[float] = None
+        self._finished: Optional[float] = None
+
+    def start(self, flow_ids: Iterable[str]) -> int:
+        """Queues flows for loading (skipping ones still queued); returns how many were added."""
+        with self._lock:
+            new = [flow_id for flow_id in flow_ids if flow_id not in self._queued]
+            if not new:
+                return 0
+            if self._executor is None:
+                # A new round: counts start over, so flows failed last time can be retried
+                self._executor = ThreadPoolExecutor(self._workers, thread_name_prefix="warmup")
+                self._started = time.time()
+                self._finished = None
+                self._total = self._done = self._loaded = 0
+                self._failed = {}
+            self._queued.update(new)
+            self._total += len(new)
+            for flow_id in new:
+                self._executor.submit(self._run, flow_id)
+        print(f"🔥 Warming up {len(new)} flow(s) with {self._workers} worker(s).")
+        return len(new)
+
+    def _run(self, flow_id: str) -> None:
+        try:
+            self._load(flow_id)
+            error = None
+        except Exception as e:
+            error = getattr(e, "detail", None) or str(e)
+        with self._lock:
+            self._queued.discard(flow_id)
+            self._done += 1
+            if error is None:
+                self._loaded += 1
+                self._failed.pop(flow_id, None)
+            else:
+                self._failed[flow_id] = error
+            # Counted per load, not per flow: a flow can be queued again within a round
+            if self._done == self._total:
+                self._finished = time.time()
+                executor, self._executor = self._executor, None
+                print(f"🔥 Warm-up done: {self._loaded} loaded, {len(self._failed)} failed "
+                      f"in {self._finished - self._started:.1f}s.")
+            else:
+                executor = None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    @property
+    def running(self) -> bool:
+        with self._lock:
+            return self._executor is not None
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            done = self._done
+            end = self._finished or time.time()
+            return {
+                "state": "running" if self._executor is not None else "done" if self._total else "idle",
+                "total": self._total,
+                "loaded": self._loaded,
+                "failed": dict(self._failed),
+                "pending": self._total - done,
+                "progress": done / self._total if self._total else 1.0,
+                "seconds": round(end - self._started, 3) if self._started else 0.0,
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)